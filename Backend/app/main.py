@@ -1,11 +1,32 @@
 import asyncio
+import hashlib
+import json
 import os
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+from fastapi import FastAPI, Header, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from app.services.compression import CompressionMiddleware
+from app.services.executor import run_blocking
+from app.services.metrics import MetricsMiddleware
 
 # --- APP SETUP ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Starts the popularity prefetcher (PREFETCH_ENABLED) and stops it on shutdown.
+    """
+    from app.services.prefetch import Prefetcher, PREFETCH_ENABLED
+
+    app.state.prefetcher = Prefetcher(_warm_analysis)
+    if PREFETCH_ENABLED:
+        app.state.prefetcher.start()
+    yield
+    await app.state.prefetcher.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",                
@@ -23,11 +44,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- COMPRESSION (gzip, or brotli when installed; streams pass through) ---
+app.add_middleware(CompressionMiddleware)
+
+# --- METRICS (outermost, so it times everything below) ---
+app.add_middleware(MetricsMiddleware)
+
+# --- STAGE TIMEOUTS (seconds) ---
+# A slow upstream degrades its own section instead of stalling the whole response.
+STAGE_TIMEOUTS = {
+    "history": float(os.getenv("HISTORY_TIMEOUT", "10")),
+    "news": float(os.getenv("NEWS_TIMEOUT", "12")),
+    "trend": float(os.getenv("TREND_TIMEOUT", "15")),
+    "llm": float(os.getenv("LLM_TIMEOUT", "20")),
+    "batch_history": float(os.getenv("BATCH_HISTORY_TIMEOUT", "30")),
+    "screener": float(os.getenv("SCREENER_TIMEOUT", "60")),
+}
+
+BATCH_MAX_TICKERS = int(os.getenv("BATCH_MAX_TICKERS", "50"))
+
+# Fire-and-forget refreshes; held here so they aren't garbage collected mid-run
+_background_tasks = set()
+
 # --- DATA MODELS ---
 class ChatRequest(BaseModel):
-    ticker: str
     question: str
-    context_data: dict 
+    session_id: Optional[str] = None
+    # Legacy stateless shape: the client re-posts the whole analyze response
+    ticker: Optional[str] = None
+    context_data: Optional[dict] = None
+
+class BatchAnalyzeRequest(BaseModel):
+    tickers: List[str]
 
 # --- ENDPOINTS ---
 
@@ -35,81 +83,600 @@ class ChatRequest(BaseModel):
 def read_root():
     return {"status": "TradeSentry System Online 🟢"}
 
+async def _analysis_stages(symbol, chart_format, since=None):
+    """
+    Shared analysis pipeline. Yields ("analysis", market data) as soon as
+    pivots and chart are ready, then ("signals", trend + sentiment).
+    With `since`, chart_data holds only new or updated bars.
+    Yields ("error", ...) and stops if the ticker has no data.
+    The LLM verdict is left to the caller (blocking or streamed).
+    """
+    # Lazy imports to keep startup fast
+    from app.services.history import (
+        fetch_history_frame, history_fetch_cost, derive_pivots, derive_trend_closes, derive_indicators,
+        build_chart_data, chart_etag, latest_bar_epoch
+    )
+    from app.services.ai_engine import analyze_signals    # Calls AWS (trend + news in one trip)
+    from app.services.news_agent import fetch_headlines
+    from app.services.yahoo import run_metered
+
+    # 1. Price History & News (Independent -> Concurrent)
+    # Two upstream pulls cover pivots and every chart timeframe. Yahoo stages
+    # wait for their rate-limit tokens before taking a pool thread.
+    daily_task = asyncio.create_task(run_metered(
+        fetch_history_frame, symbol, "daily", tokens=history_fetch_cost(symbol, "daily"),
+        timeout=STAGE_TIMEOUTS["history"], stage="history_daily"
+    ))
+    intraday_task = asyncio.create_task(run_metered(
+        fetch_history_frame, symbol, "intraday", tokens=history_fetch_cost(symbol, "intraday"),
+        timeout=STAGE_TIMEOUTS["history"], stage="history_intraday"
+    ))
+    news_task = asyncio.create_task(run_metered(
+        fetch_headlines, symbol,
+        timeout=STAGE_TIMEOUTS["news"], default=[], stage="news"
+    ))
+
+    history = {"symbol": symbol, "daily": await daily_task, "intraday": None}
+
+    # 2. Math (Local Calculation)
+    pivots = derive_pivots(history)
+    if not pivots:
+        intraday_task.cancel()
+        news_task.cancel()
+        yield "error", {"error": "Invalid Ticker or Data Unavailable"}
+        return
+
+    # 3. Trend + Sentiment Analysis (one AWS Lambda round-trip)
+    # We pass raw price data and unscored headlines to the remote AI service
+    closes = derive_trend_closes(history)
+
+    async def signals_stage():
+        headlines = await news_task
+        return await run_blocking(
+            analyze_signals, symbol, closes, headlines,
+            timeout=STAGE_TIMEOUTS["trend"],
+            default=({"signal": "NEUTRAL (Timeout)", "confidence": 0}, "Neutral (Timeout)"),
+            stage="ml_signals"
+        )
+
+    signals_task = asyncio.create_task(signals_stage())
+
+    history["intraday"] = await intraday_task
+    indicators = await run_blocking(derive_indicators, history, stage="indicators")
+    chart_data = await run_blocking(
+        build_chart_data, history, chart_format, since, default={}, stage="chart"
+    )
+    yield "analysis", {
+        "symbol": pivots['symbol'],
+        "price": pivots['current_price'],
+        "support_resistance": pivots,
+        "indicators": indicators,
+        "chart_data": chart_data,
+        "next_since": latest_bar_epoch(history),
+        "chart_etag": chart_etag(history, chart_format, since)
+    }
+
+    trend, sentiment = await signals_task
+    yield "signals", {"trend_signal": trend, "sentiment_signal": sentiment}
+
+async def _warm_analysis(symbol):
+    """
+    Prefetch: the full analysis and verdict with nothing returned, so the
+    bar, indicator, headline-score and verdict caches hold what a request reads.
+    """
+    from app.services.llm_engine import ai_verdict
+
+    result = {}
+    async for event, data in _analysis_stages(symbol, "rows"):
+        if event == "error":
+            return False
+        result.update(data)
+
+    await ai_verdict(
+        result['symbol'], result['price'], result['support_resistance'],
+        result['trend_signal'], result['sentiment_signal'], result['indicators'],
+        timeout=STAGE_TIMEOUTS["llm"], stage="prefetch_llm"
+    )
+    return True
+
+# --- CONDITIONAL GET ---
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    # Weak comparison: a compressed and an identity body share one validator
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def _parse_since_param(since):
+    from app.services.history import parse_since
+    try:
+        return parse_since(since), None
+    except ValueError:
+        return None, {"error": "Invalid 'since': use epoch seconds or an ISO-8601 time"}
+
 @app.get("/api/analyze/{ticker}")
-async def analyze_stock(ticker: str):
+async def analyze_stock(
+    ticker: str,
+    chart_format: Literal["rows", "columnar"] = Query("rows", alias="format"),
+    since: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Main Dashboard Endpoint.
     Orchestrates fetching data locally and calling AWS for AI analysis.
+    Independent stages run concurrently; only the LLM waits on its inputs.
+    `?format=columnar` returns chart_data as parallel arrays with epoch timestamps.
+    `?since=` (a previous response's next_since) sends only new or updated bars;
+    an unchanged response answers If-None-Match with 304.
     """
     print(f"🚀 Analyzing {ticker}...")
 
-    # Lazy imports to keep startup fast
-    from app.services.marketData import get_pivot_points, get_stock_data, get_full_chart_data
-    from app.services.ai_engine import predict_trend      # Now calls AWS
-    from app.services.news_agent import get_news_sentiment # Now calls AWS
-    from app.services.llm_engine import get_ai_verdict
-
-    # 1. Math & Chart Data (Local Calculation)
-    pivots = get_pivot_points(ticker)
-    if not pivots: 
-        return {"error": "Invalid Ticker or Data Unavailable"}
-   
-    chart_data = get_full_chart_data(ticker)
-
-    # 2. Trend Analysis (Calls AWS Lambda)
-    # We pass raw price data to the remote AI service
-    trend = {"signal": "NEUTRAL", "confidence": 0}
-    
-    if chart_data and '1Y' in chart_data and len(chart_data['1Y']) > 60:
-        closes = [item['close'] for item in chart_data['1Y'][-100:]]
-        trend = predict_trend(closes) 
-
-    # 3. Sentiment Analysis (Calls AWS Lambda)
-    sentiment = get_news_sentiment(pivots['symbol'])
-
-    # 4. LLM Verdict (Local Logic using Groq API)
-    ai_analysis = get_ai_verdict(
-        ticker, 
-        pivots['current_price'], 
-        pivots, 
-        trend, 
-        sentiment
+    from app.services.marketData import validate_indian_ticker
+    from app.services.llm_engine import ai_verdict
+    from app.services.question_agent import open_chat_session
+    from app.services.prefetch import popularity
+
+    since_ts, error = _parse_since_param(since)
+    if error:
+        return error
+
+    result = {}
+    async for event, data in _analysis_stages(validate_indian_ticker(ticker), chart_format, since_ts):
+        if event == "error":
+            return data
+        result.update(data)
+    popularity.record(result['symbol'])
+
+    # 4. LLM Verdict (Local Logic using Groq API; identical requests share one call)
+    ai_analysis = await ai_verdict(
+        result['symbol'],
+        result['price'],
+        result['support_resistance'],
+        result['trend_signal'],
+        result['sentiment_signal'],
+        result['indicators'],
+        timeout=STAGE_TIMEOUTS["llm"]
     )
-    
-    return {
-        "symbol": pivots['symbol'],
-        "price": pivots['current_price'],
-        "trend_signal": trend,
-        "sentiment_signal": sentiment,
-        "support_resistance": pivots,
+
+    session = open_chat_session(result['symbol'], result)
+    body = {
+        "symbol": result['symbol'],
+        "price": result['price'],
+        "trend_signal": result['trend_signal'],
+        "sentiment_signal": result['sentiment_signal'],
+        "support_resistance": result['support_resistance'],
+        "indicators": result['indicators'],
         "ai_analysis": ai_analysis,
-        "chart_data": chart_data
+        "next_since": result['next_since'],
     }
+    # Chart part from the last bars; the rest is small enough to hash whole.
+    # The chat session is per call, so it is left out and sent as a header.
+    digest = hashlib.sha1((result['chart_etag'] + json.dumps(body, sort_keys=True)).encode()).hexdigest()
+    headers = {"ETag": f'W/"{digest[:24]}"', "X-Session-Id": session.id, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    # Payload is plain JSON types already; skip the recursive jsonable_encoder pass
+    return JSONResponse({"session_id": session.id, **body, "chart_data": result['chart_data']}, headers=headers)
+
+# --- SERVER-SENT EVENTS ---
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_tokens(stream, timeout):
+    """
+    Relays LLM tokens as SSE; a stalled stream ends with an error event.
+    Returns the full text through the final 'done' event.
+    """
+    parts = []
+    try:
+        while True:
+            token = await asyncio.wait_for(stream.__anext__(), timeout)
+            parts.append(token)
+            yield _sse("token", {"text": token})
+    except StopAsyncIteration:
+        pass
+    except asyncio.TimeoutError:
+        yield _sse("error", {"error": "AI Error: stream timed out"})
+    except Exception as e:
+        # A shared verdict that failed in its blocking call already says so
+        text = str(e)
+        yield _sse("error", {"error": text if text.startswith("AI Error") else f"AI Error: {text}"})
+    finally:
+        await stream.aclose()
+    yield _sse("done", {"text": "".join(parts)})
+
+@app.get("/api/analyze/{ticker}/stream")
+async def analyze_stock_stream(
+    ticker: str,
+    chart_format: Literal["rows", "columnar"] = Query("rows", alias="format"),
+    since: Optional[str] = None
+):
+    """
+    Streaming Dashboard Endpoint (SSE).
+    Events: 'analysis' (pivots + indicators + chart), 'signals' (trend + sentiment + chat
+    session_id), 'token' (verdict text as it is generated), then 'done'.
+    `?since=` works as on /api/analyze.
+    """
+    from app.services.marketData import validate_indian_ticker
+    from app.services.llm_engine import astream_ai_verdict
+    from app.services.question_agent import open_chat_session
+    from app.services.prefetch import popularity
+
+    symbol = validate_indian_ticker(ticker)
+    since_ts, error = _parse_since_param(since)
+    if error:
+        return error
+    print(f"🚀 Streaming analysis for {symbol}...")
+
+    async def events():
+        result = {}
+        async for event, data in _analysis_stages(symbol, chart_format, since_ts):
+            if event == "analysis":
+                data.pop("chart_etag")
+                popularity.record(symbol)
+            if event == "signals":
+                result.update(data)
+                data = {**data, "session_id": open_chat_session(symbol, result).id}
+            yield _sse(event, data)
+            if event == "error":
+                return
+            result.update(data)
+
+        stream = astream_ai_verdict(
+            result['symbol'], result['price'], result['support_resistance'],
+            result['trend_signal'], result['sentiment_signal'], result['indicators']
+        )
+        async for chunk in _stream_tokens(stream, STAGE_TIMEOUTS["llm"]):
+            yield chunk
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/api/chart/{ticker}")
+async def chart(
+    ticker: str,
+    chart_format: Literal["rows", "columnar"] = Query("rows", alias="format"),
+    since: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Chart-only Endpoint for dashboard refreshes: no signals, no LLM.
+    The ETag comes from the last bar of each frame, so an unchanged chart
+    is answered with 304 before any candles are serialized.
+    """
+    from app.services.marketData import validate_indian_ticker
+    from app.services.history import (
+        fetch_history_frame, history_fetch_cost, build_chart_data, chart_etag, latest_bar_epoch
+    )
+    from app.services.yahoo import run_metered
+
+    symbol = validate_indian_ticker(ticker)
+    since_ts, error = _parse_since_param(since)
+    if error:
+        return error
+
+    daily, intraday = await asyncio.gather(
+        run_metered(fetch_history_frame, symbol, "daily", tokens=history_fetch_cost(symbol, "daily"),
+                    timeout=STAGE_TIMEOUTS["history"], stage="history_daily"),
+        run_metered(fetch_history_frame, symbol, "intraday", tokens=history_fetch_cost(symbol, "intraday"),
+                    timeout=STAGE_TIMEOUTS["history"], stage="history_intraday")
+    )
+    if daily is None and intraday is None:
+        return {"error": "Invalid Ticker or Data Unavailable"}
+
+    history = {"symbol": symbol, "daily": daily, "intraday": intraday}
+    headers = {"ETag": chart_etag(history, chart_format, since_ts), "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    chart_data = await run_blocking(
+        build_chart_data, history, chart_format, since_ts, default={}, stage="chart"
+    )
+    return JSONResponse({
+        "symbol": symbol,
+        "since": since,
+        "next_since": latest_bar_epoch(history),
+        "chart_data": chart_data
+    }, headers=headers)
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """
+    Watchlist Endpoint.
+    One multi-ticker download, vectorized pivots and a single batched ML call.
+    Streams one NDJSON line per ticker as soon as its news sentiment is in.
+    The LLM verdict and chart data are left to the per-ticker endpoint.
+    """
+    from app.services.marketData import (
+        validate_indian_ticker, get_batch_stock_data, compute_batch_pivots
+    )
+    from app.services.history import HISTORY_FETCHES, derive_trend_closes
+    from app.services.indicators import get_indicators
+    from app.services.ai_engine import predict_trend_batch
+    from app.services.news_agent import get_news_sentiment
+    from app.services.yahoo import run_metered
+
+    symbols = list(dict.fromkeys(validate_indian_ticker(t) for t in request.tickers))
+    if not symbols:
+        return {"error": "No tickers provided"}
+    if len(symbols) > BATCH_MAX_TICKERS:
+        return {"error": f"At most {BATCH_MAX_TICKERS} tickers per batch"}
+
+    print(f"🚀 Batch analyzing {len(symbols)} tickers...")
+
+    async def stream():
+        # News doesn't depend on prices, so it starts alongside the history pull
+        news_tasks = {
+            symbol: asyncio.create_task(run_metered(
+                get_news_sentiment, symbol,
+                timeout=STAGE_TIMEOUTS["news"], default="Neutral (Timeout)", stage="news"
+            ))
+            for symbol in symbols
+        }
+
+        spec = HISTORY_FETCHES["daily"]
+        frames = await run_blocking(
+            get_batch_stock_data, symbols, spec["period"], spec["interval"],
+            timeout=STAGE_TIMEOUTS["batch_history"], default={}, stage="batch_history"
+        )
+        pivots = compute_batch_pivots(frames)
+
+        for symbol in symbols:
+            if symbol not in pivots:
+                news_tasks.pop(symbol).cancel()
+                yield json.dumps({"symbol": symbol, "error": "Invalid Ticker or Data Unavailable"}) + "\n"
+
+        closes = {}
+        for symbol in pivots:
+            series = derive_trend_closes({"symbol": symbol, "daily": frames[symbol]})
+            if series:
+                closes[symbol] = series
+
+        trend_task = asyncio.create_task(run_blocking(
+            predict_trend_batch, closes,
+            timeout=STAGE_TIMEOUTS["trend"], default={}, stage="trend_batch"
+        ))
+
+        async def finish(symbol):
+            sentiment = await news_tasks[symbol]
+            trends = await trend_task
+            return {
+                "symbol": symbol,
+                "price": pivots[symbol]['current_price'],
+                "trend_signal": trends.get(symbol, {"signal": "NEUTRAL", "confidence": 0}),
+                "sentiment_signal": sentiment,
+                "support_resistance": pivots[symbol],
+                "indicators": get_indicators(symbol, frames[symbol])
+            }
+
+        for result in asyncio.as_completed([finish(symbol) for symbol in pivots]):
+            yield json.dumps(await result) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/api/screen")
+async def screen_universe(
+    near: str = "S1",
+    within: float = Query(0.5, gt=0, le=20),
+    method: Literal["classic", "camarilla", "fibonacci", "woodie"] = "classic",
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Universe Screener: symbols whose live price is within `within`% of a
+    pivot level, closest first. Served from a prebuilt index; stale prices
+    are refreshed in the background, never per query.
+    """
+    from app.services.screener import screener
+
+    if screener.index is None:
+        await run_blocking(screener.refresh, timeout=STAGE_TIMEOUTS["screener"], stage="screener_refresh")
+    elif screener.is_stale():
+        task = asyncio.create_task(run_blocking(
+            screener.refresh, False, timeout=STAGE_TIMEOUTS["screener"], stage="screener_refresh"
+        ))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    return screener.query(method, near.strip().lower(), within, limit)
+
+def _resolve_chat_session(request):
+    """
+    Returns (session, error). Legacy requests that re-post context_data get
+    (None, None) and are answered statelessly.
+    """
+    from app.services.chat_sessions import session_store
+
+    if request.session_id:
+        session = session_store.get(request.session_id)
+        if session is not None:
+            return session, None
+        if request.context_data is None:
+            return None, "Chat session expired. Please re-run the analysis."
+
+    if request.context_data is None or not request.ticker:
+        return None, "Provide a session_id (from /api/analyze) or ticker + context_data."
+    return None, None
 
 @app.post("/api/chat")
 async def chat_endpoint(request: ChatRequest):
-    from app.services.question_agent import get_chat_response
-    response = get_chat_response(request.ticker, request.question, request.context_data)
+    from app.services.question_agent import get_chat_response, get_session_chat_response
+
+    session, error = _resolve_chat_session(request)
+    if error:
+        return {"error": error}
+
+    if session is not None:
+        call = (get_session_chat_response, session, request.question)
+    else:
+        call = (get_chat_response, request.ticker, request.question, request.context_data)
+
+    response = await run_blocking(
+        *call,
+        timeout=STAGE_TIMEOUTS["llm"],
+        default="I am unable to process that question right now.",
+        stage="chat"
+    )
     return {"answer": response}
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streaming chat (SSE): 'token' events, then 'done' with the full answer.
+    """
+    from app.services.question_agent import astream_chat_response, astream_session_chat_response
+
+    session, error = _resolve_chat_session(request)
+    if error:
+        return {"error": error}
+
+    if session is not None:
+        stream = astream_session_chat_response(session, request.question)
+    else:
+        stream = astream_chat_response(request.ticker, request.question, request.context_data)
+    return StreamingResponse(
+        _stream_tokens(stream, STAGE_TIMEOUTS["llm"]),
+        media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """
+    Hit ratios for the in-process caches (the LLM verdict is the costly one).
+    """
+    from app.services.marketData import get_cache_stats
+    from app.services.news_agent import get_sentiment_cache_stats
+    from app.services.llm_engine import get_verdict_cache_stats
+    from app.services.indicators import get_indicator_cache_stats
+    from app.services.yahoo import scheduler
+
+    return {
+        "ohlcv": get_cache_stats(),
+        "headline_sentiment": get_sentiment_cache_stats(),
+        "llm_verdict": get_verdict_cache_stats(),
+        "indicators": get_indicator_cache_stats(),
+        "yahoo_negative": scheduler.negative.stats()
+    }
+
+@app.get("/metrics")
+def metrics_endpoint(request: Request):
+    """
+    Prometheus text format: request, stage and upstream metrics plus cache
+    hit ratios, websocket subscribers, ML circuit state and chat sessions.
+    """
+    from fastapi.responses import PlainTextResponse
+    from app.services.metrics import render, scrape_family
+    from app.services.marketData import get_cache_stats
+    from app.services.news_agent import get_sentiment_cache_stats
+    from app.services.llm_engine import get_verdict_cache_stats
+    from app.services.indicators import get_indicator_cache_stats
+    from app.services.chat_sessions import session_store
+    from app.services.executor import queue_depth
+    from app.services.ml_client import breaker
+    from app.services.price_hub import price_hub
+    from app.services import yahoo
+
+    caches = {s["name"]: s for s in (
+        get_cache_stats(), get_sentiment_cache_stats(), get_verdict_cache_stats(), get_indicator_cache_stats()
+    )}
+    scheduler = yahoo.get_stats()
+    lanes = scheduler["lanes"]
+    prefetch = request.app.state.prefetcher.stats()
+
+    def per_cache(field):
+        return {(name,): stats[field] for name, stats in caches.items()}
+
+    families = [
+        scrape_family("tradesentry_cache_hits_total", "Cache hits.", per_cache("hits"), ["cache"], "counter"),
+        scrape_family("tradesentry_cache_misses_total", "Cache misses.", per_cache("misses"), ["cache"], "counter"),
+        scrape_family("tradesentry_cache_evictions_total", "LRU evictions.", per_cache("evictions"), ["cache"], "counter"),
+        scrape_family("tradesentry_cache_hit_ratio", "Lifetime cache hit ratio.", per_cache("hit_ratio"), ["cache"]),
+        scrape_family("tradesentry_cache_entries", "Live cache entries.", per_cache("size"), ["cache"]),
+        scrape_family(
+            "tradesentry_llm_verdicts_coalesced_total", "Verdict requests that joined an in-flight call.",
+            {(): caches["llm_verdict"]["coalesced"]}, kind="counter"
+        ),
+        scrape_family("tradesentry_ws_subscribers", "Open live price websockets.", {(): price_hub.subscriber_count()}),
+        scrape_family("tradesentry_price_pollers", "Tickers being polled for live prices.", {(): price_hub.poller_count()}),
+        scrape_family(
+            "tradesentry_ml_circuit_state", "ML service circuit breaker state (1 = current).",
+            {(state,): int(breaker.state == state) for state in ("closed", "open", "half_open")}, ["state"]
+        ),
+        scrape_family("tradesentry_chat_sessions", "Live chat sessions.", {(): len(session_store)}),
+        scrape_family(
+            "tradesentry_blocking_queue_depth", "Blocking stages waiting for a pool thread.",
+            {(): queue_depth()}
+        ),
+        scrape_family("tradesentry_yahoo_rate", "Current Yahoo request rate limit (per second).", {(): scheduler["rate"]}),
+        scrape_family("tradesentry_yahoo_queued", "Yahoo requests waiting for a token.", {(): scheduler["queued"]}),
+        scrape_family(
+            "tradesentry_yahoo_rate_limited_total", "HTTP 429 responses from Yahoo.",
+            {(): scheduler["rate_limited"]}, kind="counter"
+        ),
+        scrape_family(
+            "tradesentry_yahoo_coalesced_total", "Yahoo requests that joined an identical in-flight call.",
+            {(): scheduler["coalesced"]}, kind="counter"
+        ),
+        scrape_family(
+            "tradesentry_yahoo_requests_total", "Yahoo requests admitted, by lane.",
+            {(lane,): s["calls"] for lane, s in lanes.items()}, ["lane"], "counter"
+        ),
+        scrape_family(
+            "tradesentry_yahoo_rejected_total", "Yahoo requests dropped after their max wait or stage timeout.",
+            {(lane,): s["rejected"] for lane, s in lanes.items()}, ["lane"], "counter"
+        ),
+        scrape_family("tradesentry_yahoo_negative_symbols", "Tickers cached as having no Yahoo data.",
+                      {(): scheduler["negative_symbols"]}),
+        scrape_family("tradesentry_prefetch_cycles_total", "Prefetch cycles run.", {(): prefetch["cycles"]}, kind="counter"),
+        scrape_family(
+            "tradesentry_prefetch_warmed_total", "Tickers warmed by the prefetcher.", {(): prefetch["warmed"]}, kind="counter"
+        ),
+        scrape_family(
+            "tradesentry_prefetch_upstream_calls_total", "Upstream calls spent on prefetching.",
+            {(): prefetch["upstream_calls"]}, kind="counter"
+        ),
+        scrape_family("tradesentry_prefetch_tracked_tickers", "Tickers with a live popularity score.",
+                      {(): prefetch["tracked"]}),
+    ]
+    return PlainTextResponse(render(families), media_type="text/plain; version=0.0.4")
+
 @app.websocket("/ws/price/{ticker}")
 async def websocket_endpoint(websocket: WebSocket, ticker: str):
     await websocket.accept()
-    from app.services.market_data import get_pivot_points
-    
-    try:
+    from app.services.marketData import validate_indian_ticker
+    from app.services.price_hub import price_hub, SLOW_CONSUMER
+
+    symbol = validate_indian_ticker(ticker)
+    queue = price_hub.subscribe(symbol)
+
+    async def send_updates():
         while True:
-            data = get_pivot_points(ticker)
-            if data:
-                await websocket.send_json({
-                    "price": data['current_price'],
-                    "symbol": data['symbol']
-                })
-            await asyncio.sleep(2)
-    except WebSocketDisconnect:
-        print(f"Disconnected client for {ticker}")
-    except Exception:
-        pass
+            message = await queue.get()
+            if message is SLOW_CONSUMER:
+                await websocket.close(code=1013)
+                return
+            await websocket.send_json(message)
+
+    async def watch_disconnect():
+        # Without this a client leaving a quiet ticker would never be noticed
+        while True:
+            event = await websocket.receive()
+            if event["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.create_task(send_updates()), asyncio.create_task(watch_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Retrieve every outcome so a failed send is logged, not lost
+        for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(outcome, Exception) and not isinstance(outcome, WebSocketDisconnect):
+                print(f"WebSocket error for {symbol}: {outcome!r}")
+        price_hub.unsubscribe(symbol, queue)
+        print(f"Disconnected client for {symbol}")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,35 +1,87 @@
-import os
-import requests
-import pandas as pd
+from app.services import ml_client
+from app.services.ml_client import MLServiceError
+from app.services.news_agent import split_cached_scores, store_headline_scores, aggregate_sentiment
 
-# This URL comes from your AWS API Gateway after deployment
-ML_SERVICE_URL = os.getenv("ML_SERVICE_URL") 
+NEUTRAL_TREND = {"signal": "NEUTRAL", "confidence": 0}
 
-def predict_trend(historical_prices):
+def _trend_fallback(error):
+    if not ml_client.is_configured():
+        print("⚠️ ML_SERVICE_URL not set. Skipping AI prediction.")
+        return {"signal": "NEUTRAL (No AI)", "confidence": 0}
+    print(f"ML Service Error: {error}")
+    # Open circuit = service known down/cold: fail fast to NEUTRAL
+    if ml_client.breaker.state == "open":
+        return {"signal": "NEUTRAL (AI Unavailable)", "confidence": 0}
+    return {"signal": "ERROR", "confidence": 0}
+
+def predict_trend(historical_prices, ticker=None):
     """
     Sends price history to AWS Lambda for LSTM processing.
+    With a ticker, the service can update its cached features incrementally.
     """
-    # 1. If no AWS URL is set, return Neutral (Safe Failover)
-    if not ML_SERVICE_URL:
-        print("⚠️ ML_SERVICE_URL not set. Skipping AI prediction.")
-        return {"signal": "NEUTRAL (No AI)", "confidence": 0}
+    # AWS expects: { "closes": [150.1, 152.3, ...] }
+    payload = {"closes": historical_prices}
+    if ticker:
+        payload["ticker"] = ticker
+
+    try:
+        result = ml_client.post(payload)
+        return result.get('trend', NEUTRAL_TREND)
+    except MLServiceError as e:
+        return _trend_fallback(e)
+
+
+def predict_trend_batch(closes_by_ticker):
+    """
+    Sends every ticker's price history to AWS Lambda in one request.
+    Returns {ticker: trend}; tickers missing from the reply fall back to NEUTRAL.
+    """
+    if not closes_by_ticker:
+        return {}
 
     try:
-        # 2. Prepare Payload
-        # AWS expects: { "closes": [150.1, 152.3, ...] }
-        payload = {"closes": historical_prices}
-        
-        # 3. Call AWS Lambda
-        # 10s timeout prevents Render from hanging if AWS is cold-starting
-        response = requests.post(ML_SERVICE_URL, json=payload, timeout=15)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result.get('trend', {"signal": "NEUTRAL", "confidence": 0})
+        # AWS expects: { "batch": { "RELIANCE.NS": [150.1, 152.3, ...], ... } }
+        trends = ml_client.post({"batch": closes_by_ticker}, read_timeout=30).get('trends', {})
+        return {ticker: trends.get(ticker, NEUTRAL_TREND) for ticker in closes_by_ticker}
+    except MLServiceError as e:
+        fallback = _trend_fallback(e)
+        return {ticker: fallback for ticker in closes_by_ticker}
+
+def analyze_signals(ticker, closes, headlines):
+    """
+    Trend and news sentiment from a single ML service round-trip.
+    Only headlines missing from the sentiment cache are sent.
+    Returns (trend, sentiment).
+    """
+    trend = NEUTRAL_TREND
+    sentiment = "Neutral (No News)"
+    payload = {}
+
+    if closes:
+        payload["closes"] = closes
+        payload["ticker"] = ticker
+
+    keys, scores, unseen = split_cached_scores(headlines or [])
+    if unseen:
+        payload["headlines"] = list(unseen.values())
+        payload["scores"] = True
+
+    result, error = {}, None
+    if payload:
+        try:
+            result = ml_client.post(payload)
+        except MLServiceError as e:
+            error = e
+
+    if closes:
+        trend = _trend_fallback(error) if error else result.get('trend', NEUTRAL_TREND)
+
+    if headlines:
+        if error and unseen:
+            sentiment = "Neutral" if ml_client.is_configured() else "Neutral (No AI)"
+        elif unseen and not store_headline_scores(unseen, result.get('headline_scores'), scores):
+            sentiment = "Neutral"
         else:
-            print(f"AWS Error: {response.status_code} - {response.text}")
-            return {"signal": "ERROR", "confidence": 0}
-            
-    except Exception as e:
-        print(f"Connection Error to ML Service: {e}")
-        return {"signal": "ERROR", "confidence": 0}
\ No newline at end of file
+            sentiment = aggregate_sentiment([scores[key] for key in keys])
+
+    return trend, sentiment
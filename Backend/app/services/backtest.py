@@ -0,0 +1,248 @@
+"""
+Historical replay of the verdict prompt's pivot rules over stored daily bars.
+
+    python -m app.services.backtest RELIANCE TCS INFY
+    python -m app.services.backtest --universe --workers 8 --json backtest.json
+    python -m app.services.backtest RELIANCE --fetch 10y      # fill the store first
+
+Each session is traded on its own, so the whole history is evaluated with
+array operations. Decisions use only what was known at the open: pivots
+from the previous session, the trend from the previous close.
+  trend UP,   open >= pivot -> BUY  (stop at S1/S2)
+  trend UP,   open <  pivot -> WAIT
+  trend DOWN, open <  pivot -> SELL (stop at R1/R2)
+  trend DOWN, open >= pivot -> WAIT
+Positions open at the session open and close at the stop or the close.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from app.services import bar_store
+from app.services.indicators import ema, pivot_levels
+
+TRADING_DAYS = 252
+STOP_LEVELS = {"s1": "r1", "s2": "r2"}      # long stop -> mirrored short stop
+
+# The LSTM trend can't be replayed per session, so the backtest uses a
+# price-vs-EMA proxy for "trend UP / DOWN"
+DEFAULT_TREND_SPAN = 50
+DEFAULT_COST_BPS = 5.0
+
+def pivot_rule_positions(open_, prev_high, prev_low, prev_close, trend_up, stop="s1"):
+    """
+    Vectorized rule set. Returns (position, long_stop, short_stop, wait_below_pivot):
+    position is +1 (BUY), -1 (SELL) or 0 (WAIT) per session.
+    """
+    levels = pivot_levels(prev_high, prev_low, prev_close)["classic"]
+    above_pivot = open_ >= levels["pivot"]
+
+    position = np.zeros(len(open_), dtype=np.int8)
+    position[trend_up & above_pivot] = 1
+    position[~trend_up & ~above_pivot] = -1
+    wait_below_pivot = trend_up & ~above_pivot
+    return position, levels[stop], levels[STOP_LEVELS[stop]], wait_below_pivot
+
+def simulate(bars, stop="s1", trend_span=DEFAULT_TREND_SPAN, cost_bps=DEFAULT_COST_BPS):
+    """
+    Per-session strategy returns for one symbol's BAR_DTYPE array.
+    Returns a dict of equal-length arrays (first `trend_span` sessions are warm-up).
+    """
+    open_, high, low, close = (np.asarray(bars[field], dtype=float) for field in ("open", "high", "low", "close"))
+    if len(close) <= trend_span + 1:
+        return None
+
+    # Everything a decision may see is shifted by one session
+    trend = ema(close, trend_span)
+    trend_up = close[:-1] > trend[:-1]
+    open_, high, low, close = open_[1:], high[1:], low[1:], close[1:]
+    position, long_stop, short_stop, waits = pivot_rule_positions(
+        open_, bars["high"][:-1], bars["low"][:-1], bars["close"][:-1], trend_up, stop
+    )
+
+    long_stopped = (position == 1) & (low <= long_stop)
+    short_stopped = (position == -1) & (high >= short_stop)
+    exit_price = close.copy()
+    # A gap through the stop fills at the open, not at the stop
+    exit_price[long_stopped] = np.minimum(open_, long_stop)[long_stopped]
+    exit_price[short_stopped] = np.maximum(open_, short_stop)[short_stopped]
+
+    returns = position * (exit_price - open_) / open_ - (position != 0) * cost_bps / 10_000
+    warmup = slice(trend_span, None)
+    return {
+        "time": np.asarray(bars["time"][1:])[warmup],
+        "position": position[warmup],
+        "returns": returns[warmup],
+        "stopped": (long_stopped | short_stopped)[warmup],
+        "waits": waits[warmup],
+        "buy_hold": close[-1] / open_[trend_span] - 1,
+    }
+
+def max_drawdown(returns):
+    equity = np.cumprod(1 + returns)
+    peaks = np.maximum.accumulate(np.concatenate([[1.0], equity]))[1:]
+    return float(np.max(1 - equity / peaks)) if len(equity) else 0.0
+
+def summarize(returns, position=None, stopped=None):
+    """
+    Total/annualized return, hit rate over traded sessions, max drawdown.
+    """
+    traded = position != 0 if position is not None else returns != 0
+    trades = int(traded.sum())
+    total = float(np.prod(1 + returns) - 1)
+    years = len(returns) / TRADING_DAYS
+    summary = {
+        "sessions": len(returns),
+        "trades": trades,
+        "total_return": round(total, 4),
+        "annualized_return": round((1 + total) ** (1 / years) - 1, 4) if years and total > -1 else None,
+        "hit_rate": round(float((returns[traded] > 0).mean()), 4) if trades else None,
+        "avg_trade_return": round(float(returns[traded].mean()), 5) if trades else None,
+        "max_drawdown": round(max_drawdown(returns), 4),
+    }
+    if position is not None:
+        summary["buys"] = int((position == 1).sum())
+        summary["sells"] = int((position == -1).sum())
+    if stopped is not None and trades:
+        summary["stop_rate"] = round(float(stopped.sum()) / trades, 4)
+    return summary
+
+def _date_mask(times, start, end):
+    mask = np.ones(len(times), dtype=bool)
+    if start is not None:
+        mask &= times >= start
+    if end is not None:
+        mask &= times < end
+    return mask
+
+def backtest_chunk(symbols, params):
+    """
+    Process-pool task: loads each symbol from the (memory-mapped) store and
+    simulates it. Only summaries and the return series travel back.
+    """
+    results = []
+    for symbol in symbols:
+        bars = bar_store.load_array(symbol, "1d", params["store_dir"])
+        if bars is not None:
+            bars = bars[_date_mask(bars["time"], params["start"], params["end"])]
+        run = simulate(bars, params["stop"], params["trend_span"], params["cost_bps"]) if bars is not None else None
+        if run is None:
+            results.append((symbol, None, None, None))
+            continue
+        summary = summarize(run["returns"], run["position"], run["stopped"])
+        summary["waits_below_pivot"] = int(run["waits"].sum())
+        summary["buy_hold_return"] = round(float(run["buy_hold"]), 4)
+        results.append((symbol, summary, run["time"], run["returns"].astype(np.float32)))
+    return results
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def run_backtest(symbols, workers=None, stop="s1", trend_span=DEFAULT_TREND_SPAN,
+                 cost_bps=DEFAULT_COST_BPS, start=None, end=None, store_dir=None):
+    """
+    Fans symbols out over a process pool (workers=1 runs inline) and adds an
+    equal-weight portfolio of every symbol's daily returns.
+    """
+    params = {
+        "store_dir": bar_store.STORE_DIR if store_dir is None else store_dir,
+        "stop": stop, "trend_span": trend_span, "cost_bps": cost_bps,
+        "start": pd.Timestamp(start, tz=bar_store.MARKET_TZ).value if start else None,
+        "end": pd.Timestamp(end, tz=bar_store.MARKET_TZ).value if end else None,
+    }
+    workers = workers or os.cpu_count() or 1
+    # A few chunks per worker keeps the pool busy without per-symbol IPC
+    chunks = _chunks(symbols, max(1, math.ceil(len(symbols) / (workers * 4))))
+
+    started = time.perf_counter()
+    if workers == 1:
+        outputs = [backtest_chunk(chunk, params) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(backtest_chunk, chunks, [params] * len(chunks)))
+
+    per_symbol, missing, series = {}, [], {}
+    for symbol, summary, times, returns in (row for output in outputs for row in output):
+        if summary is None:
+            missing.append(symbol)
+            continue
+        per_symbol[symbol] = summary
+        series[symbol] = pd.Series(returns, index=times)
+
+    portfolio = None
+    if series:
+        # Equal weight across the symbols that traded that session (flat days count as 0)
+        daily = pd.DataFrame(series).sort_index().mean(axis=1).to_numpy()
+        portfolio = summarize(daily)
+
+    return {
+        "params": {"stop": stop, "trend_span": trend_span, "cost_bps": cost_bps,
+                   "start": start, "end": end, "workers": workers},
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "portfolio": portfolio,
+        "symbols": per_symbol,
+        "missing": missing,
+    }
+
+def fetch_history(symbols, period):
+    """
+    Fills the bar store through the normal market data path (gap-filled).
+    """
+    from app.services.marketData import get_stock_data, validate_indian_ticker
+
+    for symbol in symbols:
+        df = get_stock_data(validate_indian_ticker(symbol), period=period, interval="1d")
+        print(f"{'✅' if df is not None else '❌'} {symbol}: {0 if df is None else len(df)} sessions")
+
+def _print_report(report, top):
+    portfolio = report["portfolio"] or {}
+    print(f"\n📈 {len(report['symbols'])} symbols in {report['elapsed_seconds']}s "
+          f"(stop={report['params']['stop']}, trend=EMA{report['params']['trend_span']})")
+    print(f"   Portfolio: return {portfolio.get('total_return')} | annualized {portfolio.get('annualized_return')} "
+          f"| hit rate {portfolio.get('hit_rate')} | max DD {portfolio.get('max_drawdown')}")
+    ranked = sorted(report["symbols"].items(), key=lambda item: -item[1]["total_return"])
+    for symbol, s in ranked[:top]:
+        print(f"   {symbol:<16} ret {s['total_return']:>8} | hit {s['hit_rate']} | DD {s['max_drawdown']} "
+              f"| trades {s['trades']} (stops {s.get('stop_rate')}) | buy&hold {s['buy_hold_return']}")
+    if report["missing"]:
+        print(f"   ⚠️ No stored history: {', '.join(report['missing'])}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the pivot + trend verdict rules on stored daily bars.")
+    parser.add_argument("symbols", nargs="*")
+    parser.add_argument("--universe", action="store_true", help="every symbol in the daily bar store")
+    parser.add_argument("--store", default=None, help="bar store directory (default OHLCV_STORE_DIR)")
+    parser.add_argument("--fetch", metavar="PERIOD", help="fill the store first, e.g. 5y or 10y")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--stop", choices=sorted(STOP_LEVELS), default="s1")
+    parser.add_argument("--trend-span", type=int, default=DEFAULT_TREND_SPAN)
+    parser.add_argument("--cost-bps", type=float, default=DEFAULT_COST_BPS, help="round-trip cost per trade")
+    parser.add_argument("--start", help="first session (YYYY-MM-DD)")
+    parser.add_argument("--end", help="stop before this session (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", help="write the full report here")
+    args = parser.parse_args()
+
+    if args.store is not None:
+        bar_store.STORE_DIR = args.store
+
+    from app.services.marketData import validate_indian_ticker
+    symbols = [validate_indian_ticker(s) for s in args.symbols]
+    if args.fetch:
+        fetch_history(symbols, args.fetch)
+    if args.universe:
+        symbols = list(dict.fromkeys(symbols + bar_store.stored_symbols("1d")))
+    if not symbols:
+        parser.error("give symbols or --universe")
+
+    report = run_backtest(
+        symbols, args.workers, args.stop, args.trend_span, args.cost_bps, args.start, args.end
+    )
+    _print_report(report, args.top)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
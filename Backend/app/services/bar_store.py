@@ -0,0 +1,124 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# --- ON-DISK OHLCV STORE ---
+# One .npy file per (symbol, interval) holding a structured array. Files are
+# memory-mapped on read, so serving stored history needs no parsing at all.
+# Set OHLCV_STORE_DIR="" to disable the store.
+STORE_DIR = os.getenv("OHLCV_STORE_DIR", os.path.join("data", "ohlcv"))
+
+BAR_DTYPE = np.dtype([
+    ("time", "<i8"),      # bar open, ns since epoch (UTC)
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+FIELD_COLUMNS = (("open", "Open"), ("high", "High"), ("low", "Low"), ("close", "Close"), ("volume", "Volume"))
+MARKET_TZ = "Asia/Kolkata"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def is_enabled():
+    return bool(STORE_DIR)
+
+def _path(symbol, interval):
+    return os.path.join(STORE_DIR, interval, f"{symbol}.npy")
+
+def _lock_for(symbol, interval):
+    with _locks_guard:
+        return _locks.setdefault((symbol, interval), threading.Lock())
+
+def frame_to_bars(df):
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    index = df.index if df.index.tz is not None else df.index.tz_localize(MARKET_TZ)
+    bars["time"] = index.asi8
+    for field, col in FIELD_COLUMNS:
+        bars[field] = df[col].to_numpy(dtype=float) if col in df.columns else np.nan
+    return bars
+
+def bars_to_frame(bars, interval):
+    index = pd.DatetimeIndex(bars["time"], tz="UTC").tz_convert(MARKET_TZ)
+    index.name = "Datetime" if interval[-1] in "mh" else "Date"
+    return pd.DataFrame({col: bars[field] for field, col in FIELD_COLUMNS}, index=index)
+
+def load_array(symbol, interval, store_dir=None):
+    """
+    Raw memory-mapped BAR_DTYPE array (no DataFrame), or None.
+    `store_dir` overrides OHLCV_STORE_DIR, e.g. in worker processes.
+    """
+    directory = STORE_DIR if store_dir is None else store_dir
+    path = os.path.join(directory, interval, f"{symbol}.npy")
+    if not directory or not os.path.exists(path):
+        return None
+    try:
+        bars = np.load(path, mmap_mode="r")
+    except Exception as e:
+        print(f"Bar Store Read Error ({symbol} {interval}): {e}")
+        return None
+    return bars if len(bars) else None
+
+def stored_symbols(interval, store_dir=None):
+    directory = os.path.join(STORE_DIR if store_dir is None else store_dir, interval)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".npy"))
+
+def load_bars(symbol, interval):
+    """
+    Stored bars as a DataFrame (IST index), or None if nothing is stored.
+    """
+    if not is_enabled():
+        return None
+
+    bars = load_array(symbol, interval)
+    return None if bars is None else bars_to_frame(bars, interval)
+
+def _to_market_tz(df):
+    """
+    Same index type on both sides of a merge: naive stamps are read as IST
+    (like frame_to_bars), aware ones are converted.
+    """
+    if df.index.tz is None:
+        return df.tz_localize(MARKET_TZ)
+    return df.tz_convert(MARKET_TZ)
+
+def merge_frames(stored, fresh):
+    """
+    Union of both frames by timestamp. Fresh rows win, which replaces the
+    stored copy of a bar that was still forming when it was saved.
+    """
+    if stored is None or stored.empty:
+        return fresh
+    if fresh is None or fresh.empty:
+        return stored
+
+    stored, fresh = _to_market_tz(stored), _to_market_tz(fresh)
+    merged = pd.concat([stored, fresh[stored.columns.intersection(fresh.columns)]])
+    merged = merged[~merged.index.duplicated(keep="last")]
+    return merged.sort_index()
+
+def save_bars(symbol, interval, df):
+    """
+    Atomically replaces the stored series for (symbol, interval).
+    """
+    if not is_enabled() or df is None or df.empty:
+        return
+
+    path = _path(symbol, interval)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+
+    with _lock_for(symbol, interval):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, frame_to_bars(df))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Bar Store Write Error ({symbol} {interval}): {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# --- CHAT SESSIONS ---
+# /api/analyze opens a session holding a compact context (no chart arrays)
+# and its rendered system prompt, so /api/chat only needs an id + question.
+SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "2000"))
+SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", "1800"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1200"))
+
+# Rough English average; good enough to keep prompts inside a budget
+CHARS_PER_TOKEN = 4
+
+CONTEXT_FIELDS = ("symbol", "price", "trend_signal", "sentiment_signal", "support_resistance", "indicators")
+
+def compact_context(analysis):
+    return {field: analysis.get(field) for field in CONTEXT_FIELDS}
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+class ChatSession:
+    def __init__(self, ticker, context, system_prompt):
+        self.id = uuid.uuid4().hex
+        self.ticker = ticker
+        self.context = context
+        self.system_prompt = system_prompt
+        self.history = []       # [(role, content)], oldest first
+        self.summary = []       # compacted one-line digests of older turns
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add_turn(self, question, answer, budget=HISTORY_TOKEN_BUDGET):
+        with self.lock:
+            self.history.append(("user", question))
+            self.history.append(("assistant", answer))
+            self._compact(budget)
+
+    def _compact(self, budget):
+        """
+        Folds the oldest turns into short digests until the verbatim history
+        fits the budget; digests are capped at a quarter of it.
+        """
+        def used():
+            return sum(estimate_tokens(text) for _, text in self.history)
+
+        while len(self.history) > 2 and used() > budget:
+            (_, question), (_, answer) = self.history[0], self.history[1]
+            del self.history[:2]
+            self.summary.append(f"Q: {_clip(question, 120)} | A: {_clip(answer, 200)}")
+
+        while self.summary and sum(estimate_tokens(line) for line in self.summary) > budget // 4:
+            self.summary.pop(0)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.summary), list(self.history)
+
+class SessionStore:
+    """
+    Bounded LRU of chat sessions with idle expiry.
+    """
+
+    def __init__(self, maxsize=SESSION_MAX, idle_ttl=SESSION_IDLE_TTL):
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, ticker, context, system_prompt):
+        session = ChatSession(ticker, context, system_prompt)
+        with self._lock:
+            self._sessions[session.id] = session
+            self._evict()
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.monotonic() - session.last_used > self.idle_ttl:
+                del self._sessions[session_id]
+                return None
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest-used first, so expired sessions sit at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) > self.maxsize or now - oldest.last_used > self.idle_ttl:
+                self._sessions.popitem(last=False)
+            else:
+                break
+
+    def __len__(self):
+        return len(self._sessions)
+
+session_store = SessionStore()
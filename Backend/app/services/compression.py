@@ -0,0 +1,94 @@
+import gzip
+import os
+from starlette.datastructures import Headers, MutableHeaders
+from app.services.executor import run_blocking
+
+try:
+    import brotli       # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# --- RESPONSE COMPRESSION ---
+# Only complete (single-message) bodies are compressed. Streamed responses
+# (SSE, NDJSON) pass through untouched so no event waits in a compressor buffer.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# Bodies above this are compressed on the blocking pool, off the event loop
+COMPRESS_OFFLOAD_BYTES = int(os.getenv("COMPRESS_OFFLOAD_BYTES", "262144"))
+
+def accepted_encodings(header):
+    accepted = set()
+    for item in header.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name)
+    return accepted
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """
+    ASGI middleware: brotli when installed and accepted, else gzip.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if not (message.get("more_body") or len(body) < self.minimum_size
+                    or "content-encoding" in headers):
+                if len(body) >= COMPRESS_OFFLOAD_BYTES:
+                    compressed = await run_blocking(compress, body, encoding, stage="compress")
+                else:
+                    compressed = compress(body, encoding)
+                if compressed is not None:
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    message = {**message, "body": compressed}
+            headers.add_vary_header("Accept-Encoding")
+
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- BLOCKING WORK POOL ---
+# yfinance, requests and the Groq client are all synchronous. Running them
+# directly inside an `async def` endpoint freezes the whole event loop, so every
+# blocking stage is pushed onto this bounded pool instead.
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+
+blocking_pool = ThreadPoolExecutor(
+    max_workers=BLOCKING_POOL_SIZE,
+    thread_name_prefix="sentry-io"
+)
+
+# Monotonic time a stage's caller stops waiting (set by run_blocking when it
+# has a timeout), so work inside it can give up on waits that no longer matter
+stage_deadline = contextvars.ContextVar("stage_deadline", default=None)
+
+# Stages submitted but not yet running on a pool thread
+_queued = 0
+_queued_lock = threading.Lock()
+
+def queue_depth():
+    """
+    Blocking stages waiting for a pool thread.
+    """
+    return _queued
+
+def _enter_queue():
+    global _queued
+    with _queued_lock:
+        _queued += 1
+    return [True]
+
+def _leave_queue(waiting):
+    global _queued
+    with _queued_lock:
+        if waiting[0]:
+            waiting[0] = False
+            _queued -= 1
+
+# Called as observer(stage, seconds, outcome) after every run_blocking call,
+# with outcome "ok", "timeout" or "error" (benchmarks, metrics).
+stage_observers = []
+
+def observe(stage, started, outcome):
+    elapsed = time.perf_counter() - started
+    for observer in stage_observers:
+        observer(stage, elapsed, outcome)
+
+async def run_blocking(func, *args, timeout=None, default=None, stage=None, **kwargs):
+    """
+    Runs a blocking call on the shared pool without stalling the event loop.
+    Returns `default` if the stage times out or raises (partial degradation).
+    """
+    stage = stage or getattr(func, "__name__", "stage")
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    # Carry the caller's context (request metrics spans) into the worker thread
+    context = contextvars.copy_context()
+    if timeout is not None:
+        context.run(stage_deadline.set, time.monotonic() + timeout)
+    call = functools.partial(func, *args, **kwargs)
+    waiting = _enter_queue()
+
+    def run():
+        _leave_queue(waiting)
+        return context.run(call)
+
+    try:
+        future = loop.run_in_executor(blocking_pool, run)
+        result = await asyncio.wait_for(future, timeout)
+        observe(stage, started, "ok")
+        return result
+    except asyncio.TimeoutError:
+        observe(stage, started, "timeout")
+        print(f"⏱️ Stage '{stage}' timed out after {timeout}s")
+        return default
+    except Exception as e:
+        observe(stage, started, "error")
+        print(f"Stage '{stage}' failed: {e}")
+        return default
+    finally:
+        # A stage cancelled or timed out before it started never runs
+        _leave_queue(waiting)
@@ -0,0 +1,159 @@
+import hashlib
+import pandas as pd
+from app.services.bar_store import MARKET_TZ
+from app.services.marketData import (
+    validate_indian_ticker, get_stock_data, get_session_pivots, is_stock_data_cached, CHART_FORMATS
+)
+from app.services.indicators import get_indicators
+from app.services.metrics import span
+
+# --- MINIMAL FETCH SET ---
+# One analysis needs exactly two upstream pulls. Everything else is derived:
+#   daily    -> pivots (last two sessions) + 1Y chart + trend closes + indicators
+#   intraday -> 1D chart (last session) + 5D chart (resampled to 15m) + VWAP
+HISTORY_FETCHES = {
+    "daily": {"period": "1y", "interval": "1d"},
+    "intraday": {"period": "5d", "interval": "1m"},
+}
+
+# A bar can still change until its interval ends; `since` deltas resend it
+CHART_BAR_WIDTH = {
+    "1D": pd.Timedelta(minutes=1), "5D": pd.Timedelta(minutes=15), "1Y": pd.Timedelta(days=1)
+}
+
+OHLCV_AGGREGATION = {
+    "Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"
+}
+
+def fetch_history_frame(ticker, kind):
+    spec = HISTORY_FETCHES[kind]
+    return get_stock_data(ticker, period=spec["period"], interval=spec["interval"])
+
+def history_fetch_cost(ticker, kind):
+    """
+    Yahoo tokens a fetch_history_frame call should reserve: none when the
+    frame is cached.
+    """
+    spec = HISTORY_FETCHES[kind]
+    return 0 if is_stock_data_cached(ticker, spec["period"], spec["interval"]) else 1
+
+def get_history(ticker):
+    """
+    Fetches the minimal bar set for a ticker (sequentially; the API fetches
+    both frames concurrently through fetch_history_frame).
+    """
+    symbol = validate_indian_ticker(ticker)
+    return {
+        "symbol": symbol,
+        "daily": fetch_history_frame(symbol, "daily"),
+        "intraday": fetch_history_frame(symbol, "intraday"),
+    }
+
+def resample_ohlcv(df, rule):
+    """
+    Vectorized OHLCV downsampling (e.g. 1m -> 15m). Bins are anchored to
+    midnight IST, so 15m buckets line up with the 09:15 NSE open.
+    """
+    agg = {col: how for col, how in OHLCV_AGGREGATION.items() if col in df.columns}
+    out = df.resample(rule, label="left", closed="left").agg(agg)
+    return out.dropna(subset=["Close"])
+
+def last_session_slice(df):
+    last_active_date = df.index[-1].date()
+    return df[df.index.date == last_active_date]
+
+def _bars_since(df, since, timeframe):
+    return df[df.index > since - CHART_BAR_WIDTH[timeframe]]
+
+def derive_chart_frames(history, since=None):
+    """
+    Chart frames per timeframe. With `since`, only bars that are new or may
+    have changed since then (the bar containing `since` onwards).
+    """
+    frames = {}
+    intraday = history.get("intraday")
+    daily = history.get("daily")
+
+    if intraday is not None and not intraday.empty:
+        one_day = last_session_slice(intraday)
+        if since is not None:
+            one_day = _bars_since(one_day, since, "1D")
+            # Only resample the 15m buckets that can have changed
+            intraday = intraday[intraday.index >= since.floor("15min")]
+        frames["1D"] = one_day
+        frames["5D"] = resample_ohlcv(intraday, "15min")
+
+    if daily is not None and not daily.empty:
+        frames["1Y"] = daily if since is None else _bars_since(daily, since, "1Y")
+
+    return frames
+
+def derive_pivots(history):
+    """
+    The session's cached levels with the latest bar's close as current price.
+    """
+    daily = history.get("daily")
+    if daily is None or daily.empty:
+        return None
+    pivots = get_session_pivots(history["symbol"], daily)
+    if pivots is None:
+        return None
+    return {**pivots, "current_price": round(float(daily["Close"].iat[-1]), 2)}
+
+def derive_indicators(history):
+    return get_indicators(history["symbol"], history.get("daily"), history.get("intraday"))
+
+def derive_trend_closes(history, lookback=100):
+    daily = history.get("daily")
+    if daily is None or len(daily) <= 60:
+        return None
+    return daily["Close"].to_numpy()[-lookback:].tolist()
+
+def build_chart_data(history, chart_format="rows", since=None):
+    serialize = CHART_FORMATS[chart_format]
+    charts = {}
+    for timeframe, df in derive_chart_frames(history, since).items():
+        with span(f"chart_{timeframe}"):
+            charts[timeframe] = serialize(df)
+    return charts
+
+# --- CONDITIONAL / DELTA CHARTS ---
+def parse_since(value):
+    """
+    Epoch seconds (as in the columnar format) or ISO-8601 (naive = IST).
+    Raises ValueError for anything else.
+    """
+    if value is None or not str(value).strip():
+        return None
+    text = str(value).strip()
+    try:
+        float(text)
+        return pd.Timestamp(float(text), unit="s", tz="UTC")
+    except ValueError:
+        ts = pd.Timestamp(text)
+    if pd.isna(ts):
+        raise ValueError(f"Invalid timestamp: {value}")
+    return ts.tz_localize(MARKET_TZ) if ts.tzinfo is None else ts
+
+def chart_etag(history, chart_format, since=None):
+    """
+    Weak validator built from the last bar of each raw frame: every chart
+    timeframe is derived from these two, so no chart has to be built to check it.
+    """
+    parts = [chart_format, "" if since is None else str(since.value)]
+    for kind in ("daily", "intraday"):
+        df = history.get(kind)
+        if df is None or df.empty:
+            parts.append(f"{kind}:-")
+            continue
+        last = ",".join(repr(float(df[col].iat[-1])) for col in ("Open", "High", "Low", "Close"))
+        parts.append(f"{kind}:{len(df)}:{df.index[0].value}:{df.index[-1].value}:{last}")
+    return 'W/"' + hashlib.sha1("|".join(parts).encode()).hexdigest()[:24] + '"'
+
+def latest_bar_epoch(history):
+    """
+    Epoch seconds of the newest bar: the `since` for a client's next delta.
+    """
+    stamps = [df.index[-1].value for df in (history.get("daily"), history.get("intraday"))
+              if df is not None and not df.empty]
+    return max(stamps) // 10**9 if stamps else None
@@ -0,0 +1,201 @@
+import os
+import numpy as np
+import pandas as pd
+from app.services.cache import TTLCache
+from app.services.market_calendar import current_session_day
+
+# --- INDICATOR ENGINE ---
+# Everything is derived from the daily/intraday frames the analysis already
+# fetched: adding an indicator never adds an upstream call. Kernels work on
+# NumPy arrays (scalars or one value per ticker for the pivot levels).
+RSI_PERIOD = 14             # same SMA-style RSI as the trend model's features
+ATR_PERIOD = 14
+SMA_WINDOWS = (20, 50, 200)
+EMA_WINDOWS = (20, 50)
+SESSIONS_PER_YEAR = 252
+
+# Results are immutable for a given last bar, so the key carries the last
+# bar's timestamp and close; the TTL only bounds memory.
+indicator_cache = TTLCache(
+    "indicators",
+    maxsize=int(os.getenv("INDICATOR_CACHE_SIZE", "512")),
+    default_ttl=int(os.getenv("INDICATOR_CACHE_TTL", "21600"))
+)
+
+# --- PIVOT FAMILIES ---
+def pivot_levels(high, low, close):
+    """
+    Classic, Camarilla, Fibonacci and Woodie levels from the previous
+    session's high/low/close. Accepts scalars or arrays (one entry per ticker).
+    """
+    high, low, close = (np.asarray(x, dtype=float) for x in (high, low, close))
+    span = high - low
+    pivot = (high + low + close) / 3
+    woodie = (high + low + 2 * close) / 4
+
+    return {
+        "classic": {
+            "pivot": pivot,
+            "r1": 2 * pivot - low, "r2": pivot + span, "r3": high + 2 * (pivot - low),
+            "s1": 2 * pivot - high, "s2": pivot - span, "s3": low - 2 * (high - pivot),
+        },
+        "camarilla": {
+            "r1": close + span * 1.1 / 12, "r2": close + span * 1.1 / 6,
+            "r3": close + span * 1.1 / 4, "r4": close + span * 1.1 / 2,
+            "s1": close - span * 1.1 / 12, "s2": close - span * 1.1 / 6,
+            "s3": close - span * 1.1 / 4, "s4": close - span * 1.1 / 2,
+        },
+        "fibonacci": {
+            "pivot": pivot,
+            "r1": pivot + 0.382 * span, "r2": pivot + 0.618 * span, "r3": pivot + span,
+            "s1": pivot - 0.382 * span, "s2": pivot - 0.618 * span, "s3": pivot - span,
+        },
+        "woodie": {
+            "pivot": woodie,
+            "r1": 2 * woodie - low, "r2": woodie + span,
+            "s1": 2 * woodie - high, "s2": woodie - span,
+        },
+    }
+
+# --- SERIES KERNELS (1-D) ---
+def sma(values, window):
+    values = np.asarray(values, dtype=float)
+    out = np.full_like(values, np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(np.insert(values, 0, 0.0))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+def ema(values, span):
+    return pd.Series(values, dtype=float).ewm(span=span, adjust=False).mean().to_numpy()
+
+def rsi(closes, period=RSI_PERIOD):
+    closes = np.asarray(closes, dtype=float)
+    delta = np.diff(closes, prepend=closes[:1])
+    gains = sma(np.where(delta > 0, delta, 0.0), period)
+    losses = sma(np.where(delta < 0, -delta, 0.0), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + gains / losses))
+
+def true_range(high, low, close):
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def atr(high, low, close, period=ATR_PERIOD):
+    """
+    Wilder's average true range.
+    """
+    tr = true_range(high, low, close)
+    return pd.Series(tr).ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+
+def session_vwap(intraday):
+    """
+    Volume-weighted average price of the latest intraday session.
+    None for volume-less series (indices).
+    """
+    if intraday is None or intraday.empty or "Volume" not in intraday:
+        return None
+    session = intraday[intraday.index.date == intraday.index[-1].date()]
+    volume = session["Volume"].to_numpy(dtype=float)
+    if volume.sum() <= 0:
+        return None
+    typical = session[["High", "Low", "Close"]].to_numpy(dtype=float).mean(axis=1)
+    return float(np.dot(typical, volume) / volume.sum())
+
+def session_basis_position(df, session_day=None):
+    """
+    Row of the bar pivots are computed from: the last one dated before the
+    session day. Until Yahoo publishes the session's own daily bar (pre-open,
+    just after 09:15) that is the last row, not the second-to-last.
+    """
+    session_day = current_session_day() if session_day is None else session_day
+    before = np.flatnonzero(np.asarray(df.index.date) < session_day)
+    return int(before[-1]) if len(before) else None
+
+# --- SNAPSHOT ---
+def _round(value, digits=2):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+def _rounded_levels(levels):
+    return {method: {name: _round(v) for name, v in values.items()} for method, values in levels.items()}
+
+def compute_indicators(daily, intraday=None, session_day=None):
+    """
+    One pass over the daily (and optional intraday) bars. Pivots come from the
+    same basis bar as compute_pivots(); everything else uses the latest bar.
+    """
+    if daily is None or len(daily) < 2:
+        return None
+
+    high = daily["High"].to_numpy(dtype=float)
+    low = daily["Low"].to_numpy(dtype=float)
+    close = daily["Close"].to_numpy(dtype=float)
+    price = close[-1]
+
+    year_high = high[-SESSIONS_PER_YEAR:].max()
+    year_low = low[-SESSIONS_PER_YEAR:].min()
+    year_span = year_high - year_low
+    vwap = session_vwap(intraday)
+    basis = session_basis_position(daily, session_day)
+
+    return {
+        "pivots": _rounded_levels(pivot_levels(high[basis], low[basis], close[basis])) if basis is not None else None,
+        "atr_14": _round(atr(high, low, close)[-1]),
+        "rsi_14": _round(rsi(close)[-1]),
+        "vwap": _round(vwap) if vwap is not None else None,
+        "sma": {str(w): _round(sma(close, w)[-1]) for w in SMA_WINDOWS},
+        "ema": {str(w): _round(ema(close, w)[-1]) for w in EMA_WINDOWS},
+        "range_52w": {
+            "high": _round(year_high),
+            "low": _round(year_low),
+            "position_pct": _round((price - year_low) / year_span * 100, 1) if year_span else None,
+        },
+    }
+
+def _bar_key(df):
+    if df is None or df.empty:
+        return None
+    return (df.index[-1].value, float(df["Close"].iat[-1]))
+
+def get_indicators(symbol, daily, intraday=None):
+    """
+    Memoized compute_indicators() per (ticker, session day, last daily bar,
+    last intraday bar). The returned dict is shared; callers must not mutate it.
+    """
+    session_day = current_session_day()
+    key = (symbol, session_day, _bar_key(daily), _bar_key(intraday))
+    cached = indicator_cache.get(key)
+    if cached is not None:
+        return cached
+
+    indicators = compute_indicators(daily, intraday, session_day)
+    if indicators is not None:
+        indicator_cache.set(key, indicators)
+    return indicators
+
+def get_indicator_cache_stats():
+    return indicator_cache.stats()
+
+# --- PROMPT TEXT ---
+def describe_indicators(indicators):
+    """
+    Compact plain-text lines for LLM prompts (no braces: prompts are templates).
+    """
+    if not indicators:
+        return "- Not available"
+
+    def levels(method, names):
+        values = (indicators["pivots"] or {}).get(method, {})
+        return ", ".join(f"{name.upper()} {values[name]}" for name in names if name in values)
+
+    year = indicators["range_52w"]
+    return "\n".join([
+        f"- RSI(14): {indicators['rsi_14']} | ATR(14): {indicators['atr_14']} | Session VWAP: {indicators['vwap']}",
+        "- SMA " + ", ".join(f"{w}: {v}" for w, v in indicators["sma"].items())
+        + " | EMA " + ", ".join(f"{w}: {v}" for w, v in indicators["ema"].items()),
+        f"- 52W Range: {year['low']} - {year['high']} (at {year['position_pct']}% of range)",
+        f"- Camarilla: {levels('camarilla', ('s4', 's3', 'r3', 'r4'))}",
+        f"- Fibonacci: {levels('fibonacci', ('s2', 's1', 'r1', 'r2'))}",
+        f"- Woodie: {levels('woodie', ('pivot', 's1', 'r1'))}",
+    ])
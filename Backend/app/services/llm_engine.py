@@ -1,7 +1,14 @@
+import asyncio
+import bisect
 import os
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
+from app.services.cache import TTLCache
+from app.services.executor import run_blocking
+from app.services.indicators import describe_indicators
+from app.services.market_calendar import seconds_until_bar_close
+from app.services.metrics import track_upstream
 
 # 1. Load Environment Variables
 load_dotenv()
@@ -16,7 +23,172 @@ llm = ChatGroq(
     max_tokens=500
 )
 
-def get_ai_verdict(ticker, price_data, pivot_data, trend_signal, sentiment_signal):
+# 3. Verdict Cache
+# The verdict only changes when its inputs change materially, so it is keyed
+# on quantized inputs and expires at the next bar boundary.
+VERDICT_BAR_SECONDS = int(os.getenv("VERDICT_BAR_SECONDS", "900"))
+VERDICT_PRICE_BUCKET = float(os.getenv("VERDICT_PRICE_BUCKET", "0.0025"))   # 0.25% of pivot
+VERDICT_CONFIDENCE_BAND = float(os.getenv("VERDICT_CONFIDENCE_BAND", "10"))
+
+verdict_cache = TTLCache("llm_verdict", maxsize=int(os.getenv("VERDICT_CACHE_SIZE", "1024")))
+
+VERDICT_TIMED_OUT = "AI Error: Verdict timed out"
+
+def _sentiment_label(sentiment_signal):
+    words = str(sentiment_signal).split()
+    return words[0].lower() if words else "neutral"
+
+def _rsi_zone(indicators):
+    rsi = (indicators or {}).get('rsi_14')
+    if rsi is None:
+        return None
+    return "oversold" if rsi < 30 else "overbought" if rsi > 70 else "neutral"
+
+def verdict_key(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators=None):
+    """
+    (ticker, pivot, zone between S2..R2, price bucket vs pivot, signal,
+    confidence band, sentiment label, RSI zone)
+    """
+    pivot = pivot_data.get('pivot_point') or 0
+    levels = sorted(level for level in (
+        pivot_data.get('support', {}).get('stop_2'),
+        pivot_data.get('support', {}).get('stop_1'),
+        pivot,
+        pivot_data.get('resistance', {}).get('target_1'),
+        pivot_data.get('resistance', {}).get('target_2'),
+    ) if level is not None)
+
+    price = float(price_data or 0)
+    zone = bisect.bisect_right(levels, price)
+    bucket = round((price / pivot - 1) / VERDICT_PRICE_BUCKET) if pivot else 0
+    band = int((trend_signal.get('confidence') or 0) // VERDICT_CONFIDENCE_BAND)
+
+    return (ticker.upper(), pivot, zone, bucket, trend_signal.get('signal'), band,
+            _sentiment_label(sentiment_signal), _rsi_zone(indicators))
+
+def get_ai_verdict(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators=None):
+    """
+    Memoized verdict (blocking; errors are never cached). The API goes
+    through ai_verdict(), which also shares in-flight calls.
+    """
+    key = verdict_key(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators)
+    verdict = verdict_cache.get(key)
+    if verdict is not None:
+        return verdict
+
+    fresh = _invoke_ai_verdict(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators)
+    if not fresh.startswith("AI Error"):
+        verdict_cache.set(key, fresh, ttl=seconds_until_bar_close(VERDICT_BAR_SECONDS))
+    return fresh
+
+# 4. In-Flight Verdicts
+# Concurrent requests with the same verdict key (blocking or streamed) share
+# one LLM call, coordinated on the event loop: followers hold no pool thread.
+class InFlightVerdict:
+    """
+    One verdict being generated. Followers replay the chunks so far, then
+    wait for the rest; the producer runs as its own task, so a caller
+    that leaves doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def push(self, part):
+        self.parts.append(part)
+        self._wake()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self):
+        sent = 0
+        while True:
+            while sent < len(self.parts):
+                yield self.parts[sent]
+                sent += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+    async def text(self):
+        return "".join([part async for part in self.follow()])
+
+verdict_flights = {}    # verdict key -> InFlightVerdict
+verdict_coalesced = 0
+
+def _join_verdict(key, produce):
+    """
+    The in-flight verdict for `key`, starting `produce(flight)` as a task if
+    there is none.
+    """
+    global verdict_coalesced
+    flight = verdict_flights.get(key)
+    if flight is not None:
+        verdict_coalesced += 1
+        return flight
+
+    flight = verdict_flights[key] = InFlightVerdict()
+
+    async def run():
+        try:
+            await produce(flight)
+            flight.finish()
+        except Exception as e:
+            flight.finish(e)
+        finally:
+            if verdict_flights.get(key) is flight:
+                del verdict_flights[key]
+
+    asyncio.create_task(run())
+    return flight
+
+async def ai_verdict(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators=None,
+                     timeout=None, stage="llm"):
+    """
+    Memoized verdict text. One pool thread runs the LLM call per verdict key;
+    concurrent callers (and streams) with that key wait on the event loop.
+    Errors come back as "AI Error: ..." text.
+    """
+    key = verdict_key(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators)
+    cached = verdict_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def produce(flight):
+        text = await run_blocking(
+            get_ai_verdict, ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators,
+            timeout=timeout, default=VERDICT_TIMED_OUT, stage=stage
+        )
+        if text.startswith("AI Error"):
+            raise RuntimeError(text)
+        flight.push(text)
+
+    try:
+        return await asyncio.wait_for(_join_verdict(key, produce).text(), timeout)
+    except asyncio.TimeoutError:
+        return VERDICT_TIMED_OUT
+    except Exception as e:
+        text = str(e)
+        return text if text.startswith("AI Error") else f"AI Error: {text}"
+
+def get_verdict_cache_stats():
+    stats = verdict_cache.stats()
+    stats["coalesced"] = verdict_coalesced
+    return stats
+
+def _build_verdict_chain(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators=None):
     """
     Synthesizes Technicals + AI Trend + News Sentiment into a final trading decision.
     """
@@ -41,6 +213,9 @@ def get_ai_verdict(ticker, price_data, pivot_data, trend_signal, sentiment_signa
     - Resistance (Target): {pivot_data.get('resistance', {}).get('target_1')}
     - Support (Stop Loss): {pivot_data.get('support', {}).get('stop_1')}
     
+    [1b. INDICATORS]
+    {describe_indicators(indicators)}
+    
     [2. PREDICTIVE MODELS (AI)]
     - LSTM Trend Model: {trend_signal.get('signal')} (Confidence: {trend_signal.get('confidence')}%)
     - News Sentiment: {sentiment_signal}
@@ -56,14 +231,42 @@ def get_ai_verdict(ticker, price_data, pivot_data, trend_signal, sentiment_signa
         ("user", user_prompt)
     ])
     
-    chain = prompt | llm
+    return prompt | llm
+
+def _invoke_ai_verdict(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators=None):
+    chain = _build_verdict_chain(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators)
     
     try:
-        response = chain.invoke({})
+        with track_upstream("groq", "verdict"):
+            response = chain.invoke({})
         return response.content
     except Exception as e:
         return f"AI Error: {str(e)}"
 
+async def astream_ai_verdict(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators=None):
+    """
+    Token stream of the verdict. A cached verdict is replayed as one chunk;
+    an identical verdict already in flight is followed instead of starting
+    another LLM call; a completed stream is written back to the verdict cache.
+    """
+    key = verdict_key(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators)
+    cached = verdict_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    async def produce(flight):
+        chain = _build_verdict_chain(ticker, price_data, pivot_data, trend_signal, sentiment_signal, indicators)
+        with track_upstream("groq", "verdict_stream"):
+            async for chunk in chain.astream({}):
+                if chunk.content:
+                    flight.push(chunk.content)
+        if flight.parts:
+            verdict_cache.set(key, "".join(flight.parts), ttl=seconds_until_bar_close(VERDICT_BAR_SECONDS))
+
+    async for part in _join_verdict(key, produce).follow():
+        yield part
+
 def get_chat_response(ticker, query, context_data):
     """
     Handles follow-up questions (The Chatbot).
@@ -1,14 +1,13 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import os
-
-# --- CACHE CLEANUP ---
-if os.path.exists('yfinance.cache.sqlite'):
-    try:
-        os.remove('yfinance.cache.sqlite')
-    except Exception:
-        pass
+from app.services import bar_store, yahoo
+from app.services.cache import TTLCache
+from app.services.indicators import session_basis_position
+from app.services.market_calendar import (
+    is_market_open, seconds_until_next_open, seconds_until_close, current_session_day, previous_trading_day
+)
+from app.services.yahoo import YahooThrottled
 
 def validate_indian_ticker(ticker):
     ticker = ticker.upper().strip().replace(" ", "")
@@ -16,37 +15,176 @@ def validate_indian_ticker(ticker):
         ticker = f"{ticker}.NS"
     return ticker
 
+# --- OHLCV CACHE ---
+# Keyed by (ticker, period, interval). While the market is closed no bar can
+# change, so entries live until the next NSE session opens.
+ohlcv_cache = TTLCache("ohlcv", maxsize=int(os.getenv("OHLCV_CACHE_SIZE", "512")))
+
+# TTL for the still-forming bar while the session is live
+LIVE_BAR_TTL = {
+    "1m": 10, "2m": 15, "5m": 30, "15m": 60, "30m": 90,
+    "60m": 120, "90m": 120, "1h": 120, "1d": 60,
+}
+DEFAULT_LIVE_TTL = 300
+
+# An empty answer for these is remembered as "no such ticker"; a short
+# intraday window can legitimately be empty (new listing, halted symbol)
+NEGATIVE_CACHE_INTERVALS = ("1d", "5d", "1wk", "1mo", "3mo")
+
+def ohlcv_ttl(interval, now=None):
+    if not is_market_open(now):
+        return seconds_until_next_open(now)
+    ttl = LIVE_BAR_TTL.get(interval, DEFAULT_LIVE_TTL)
+    # Refetch right after the close so the final bar replaces the live one
+    return min(ttl, seconds_until_close(now) + 5)
+
+def _cache_key(ticker, period, interval):
+    return (validate_indian_ticker(ticker), period.lower().strip(), interval.lower().strip())
+
+def invalidate_stock_data(ticker=None, period=None, interval=None):
+    """
+    Drops cached bars. Omitted arguments act as wildcards.
+    """
+    symbol = validate_indian_ticker(ticker) if ticker else None
+
+    def match(key):
+        return ((symbol is None or key[0] == symbol)
+                and (period is None or key[1] == period.lower())
+                and (interval is None or key[2] == interval.lower()))
+
+    return ohlcv_cache.invalidate(match=match)
+
+def get_cache_stats():
+    return ohlcv_cache.stats()
+
 def get_stock_data(ticker, period="2y", interval="1d"):
+    """
+    Cached entry point for OHLCV history. Callers must treat the frame as read-only.
+    """
+    key = _cache_key(ticker, period, interval)
+    df = ohlcv_cache.get(key)
+    if df is not None:
+        return df
+
+    df = _fetch_with_store(*key)
+    if df is not None:
+        ohlcv_cache.set(key, df, ttl=ohlcv_ttl(key[2]))
+    return df
+
+def is_stock_data_cached(ticker, period="2y", interval="1d"):
+    """
+    True if get_stock_data would be served from memory (no Yahoo call).
+    """
+    return ohlcv_cache.peek(_cache_key(ticker, period, interval))
+
+# --- PERSISTENT STORE + GAP FILL ---
+PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6), "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+# Oldest last-bar age (days) Yahoo will still gap-fill with `start=` per interval
+MAX_GAP_DAYS = {"1m": 6, "2m": 55, "5m": 55, "15m": 55, "30m": 55, "60m": 700, "90m": 55, "1h": 700}
+# Intraday history kept on disk; daily and slower bars are kept forever
+STORE_RETENTION_DAYS = {"1m": 30, "2m": 60, "5m": 60, "15m": 60, "30m": 60, "90m": 60}
+# Weekends and holidays between the period cutoff and the first stored bar
+COVERAGE_SLACK = pd.Timedelta(days=5)
+
+def _session_count(period):
+    # "5d" means five sessions to Yahoo, not five calendar days
+    if period.endswith("d") and period[:-1].isdigit():
+        return int(period[:-1])
+    return None
+
+def _period_supported(period):
+    return _session_count(period) is not None or period in PERIOD_OFFSETS
+
+def _slice_period(df, period):
+    sessions = _session_count(period)
+    if sessions is not None:
+        dates = np.unique(df.index.date)
+        return df[df.index.date >= dates[-sessions]] if len(dates) > sessions else df
+    return df[df.index > df.index[-1] - PERIOD_OFFSETS[period]]
+
+def _covers(stored, period, interval):
+    if pd.Timestamp.now(tz=stored.index.tz) - stored.index[-1] > pd.Timedelta(days=MAX_GAP_DAYS.get(interval, 3650)):
+        return False
+    sessions = _session_count(period)
+    if sessions is not None:
+        return len(np.unique(stored.index.date)) >= sessions
+    cutoff = pd.Timestamp.now(tz=stored.index.tz) - PERIOD_OFFSETS[period]
+    return stored.index[0] <= cutoff + COVERAGE_SLACK
+
+def _fetch_with_store(ticker, period, interval):
+    """
+    Serves history from the on-disk store, fetching only bars newer than the
+    last stored one. Falls back to a full-period fetch when the store is cold
+    or too old to gap-fill, and to stored bars alone if Yahoo fails.
+    """
+    if not bar_store.is_enabled() or not _period_supported(period):
+        return _fetch_stock_data(ticker, period, interval)
+
+    stored = bar_store.load_bars(ticker, interval)
+
+    if stored is not None and _covers(stored, period, interval):
+        # Restart at the last stored session so a partial bar gets replaced
+        start = stored.index[-1].date()
+        fresh = _fetch_stock_data(ticker, period, interval, start=start)
+    else:
+        fresh = _fetch_stock_data(ticker, period, interval)
+
+    if fresh is None and stored is None:
+        return None
+
+    merged = bar_store.merge_frames(stored, fresh)
+    if fresh is not None:
+        if interval in STORE_RETENTION_DAYS:
+            retention = pd.Timedelta(days=STORE_RETENTION_DAYS[interval])
+            merged = merged[merged.index >= merged.index[-1] - retention]
+        bar_store.save_bars(ticker, interval, merged)
+
+    return _slice_period(merged, period)
+
+def _fetch_stock_data(ticker, period="2y", interval="1d", start=None):
     """
     Robust fetcher using Ticker.history first (more stable), then download as fallback.
+    With `start`, only bars from that date onward are requested (gap fill).
     """
     ticker = validate_indian_ticker(ticker)
+    window = {"start": start} if start is not None else {"period": period}
     
+    if yahoo.scheduler.is_invalid(ticker):
+        return None
+
     try:
         # ATTEMPT 1: Use Ticker.history (Often bypasses bot checks better)
-        stock = yf.Ticker(ticker)
-        df = stock.history(period=period, interval=interval)
+        df = yahoo.history(ticker, interval, **window)
         
         # ATTEMPT 2: Fallback to yf.download if history returns empty
         if df.empty:
             print(f"⚠️ Ticker.history empty for {ticker}, trying direct download...")
             try:
-                df = yf.download(
+                df = yahoo.download(
                     ticker, 
-                    period=period, 
                     interval=interval, 
                     progress=False,
-                    multi_level_index=False
+                    multi_level_index=False,
+                    **window
                 )
             except TypeError:
                 # Handle older yfinance versions that don't support multi_level_index
-                df = yf.download(
+                df = yahoo.download(
                     ticker, 
-                    period=period, 
                     interval=interval, 
-                    progress=False
+                    progress=False,
+                    **window
                 )
 
+        if df.empty and start is None and interval in NEGATIVE_CACHE_INTERVALS:
+            # Both endpoints agree there is nothing for a full daily window
+            yahoo.scheduler.mark_invalid(ticker)
+
         if df.empty:
             return None
 
@@ -71,56 +209,152 @@ def get_stock_data(ticker, period="2y", interval="1d"):
             
         return df[available_cols]
 
+    except YahooThrottled as e:
+        print(f"Data Fetch Deferred ({ticker}): {e}")
+        return None
     except Exception as e:
         print(f"Data Fetch Error: {e}")
         return None
 
-def get_full_chart_data(ticker):
-    ticker = validate_indian_ticker(ticker)
-    datasets = {}
-    
-    # 1. Intraday (1D)
-    df_intra = get_stock_data(ticker, period="5d", interval="1m")
-    if df_intra is not None and not df_intra.empty:
-        last_active_date = df_intra.index[-1].date()
-        daily_mask = df_intra.index.date == last_active_date
-        df_1d_clean = df_intra[daily_mask]
-        
-        datasets['1D'] = df_1d_clean.reset_index().apply(lambda x: {
-            "time": x.iloc[0].isoformat(), 
-            "open": x['Open'], "high": x['High'], "low": x['Low'], "close": x['Close']
-        }, axis=1).tolist()
-        
-    # 2. Weekly (5D)
-    df_5d = get_stock_data(ticker, period="5d", interval="15m")
-    if df_5d is not None:
-        datasets['5D'] = df_5d.reset_index().apply(lambda x: {
-            "time": x.iloc[0].isoformat(), 
-            "open": x['Open'], "high": x['High'], "low": x['Low'], "close": x['Close']
-        }, axis=1).tolist()
-
-    # 3. Yearly (1Y)
-    df_1y = get_stock_data(ticker, period="1y", interval="1d")
-    if df_1y is not None:
-        datasets['1Y'] = df_1y.reset_index().apply(lambda x: {
-            "time": x.iloc[0].isoformat(), 
-            "open": x['Open'], "high": x['High'], "low": x['Low'], "close": x['Close']
-        }, axis=1).tolist()
-        
-    return datasets
+def _split_batch_frame(data, symbols):
+    """
+    Splits a grouped multi-ticker download into one cleaned frame per symbol.
+    """
+    frames = {}
+    required_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
 
-def get_pivot_points(ticker):
-    ticker = validate_indian_ticker(ticker)
-    df = get_stock_data(ticker, period="10d", interval="1d")
-    
-    if df is None or len(df) < 2:
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            df = data[symbol]
+        elif len(symbols) == 1:
+            df = data
+        else:
+            continue
+
+        # Symbols trade on different days (halts, new listings); drop their empty rows
+        df = df.dropna(subset=['Close'])
+        available_cols = [col for col in required_cols if col in df.columns]
+        if df.empty or not available_cols:
+            continue
+        frames[symbol] = df[available_cols]
+
+    return frames
+
+def get_batch_stock_data(tickers, period="1y", interval="1d"):
+    """
+    History for many tickers with a single multi-ticker yf.download.
+    Cached symbols are served locally; fresh frames are written back to the cache.
+    Returns {symbol: DataFrame}; symbols without data are omitted.
+    """
+    frames = {}
+    missing = []
+
+    for ticker in tickers:
+        key = _cache_key(ticker, period, interval)
+        df = ohlcv_cache.get(key)
+        if df is not None:
+            frames[key[0]] = df
+        elif key[0] not in missing and not yahoo.scheduler.is_invalid(key[0]):
+            missing.append(key[0])
+
+    if not missing:
+        return frames
+
+    try:
+        data = yahoo.download(
+            missing,
+            operation="batch_download",
+            period=period,
+            interval=interval,
+            group_by='ticker',
+            auto_adjust=True,     # match Ticker.history()
+            ignore_tz=False,      # keep IST-aware index like the single-ticker path
+            threads=True,
+            progress=False
+        )
+    except Exception as e:
+        print(f"Batch Fetch Error: {e}")
+        return frames
+
+    if data is None or data.empty:
+        return frames
+
+    ttl = ohlcv_ttl(interval.lower())
+    fetched = _split_batch_frame(data, missing)
+    for symbol, df in fetched.items():
+        ohlcv_cache.set(_cache_key(symbol, period, interval), df, ttl=ttl)
+        frames[symbol] = df
+
+    if interval in NEGATIVE_CACHE_INTERVALS:
+        # Only symbols Yahoo answered for; a chunk cut short by throttling has no columns
+        answered = data.columns.get_level_values(0) if isinstance(data.columns, pd.MultiIndex) else missing
+        for symbol in missing:
+            if symbol not in fetched and symbol in answered:
+                yahoo.scheduler.mark_invalid(symbol)
+
+    return frames
+
+# --- CHART SERIALIZATION ---
+# Built straight from the column arrays; no per-row pandas calls.
+CANDLE_FIELDS = (("open", "Open"), ("high", "High"), ("low", "Low"), ("close", "Close"))
+
+def _iso_times(index):
+    if index.tz is None:
+        return index.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+    # '%z' renders +0530; isoformat() expects +05:30
+    return [stamp[:-2] + ':' + stamp[-2:] for stamp in index.strftime('%Y-%m-%dT%H:%M:%S%z')]
+
+def _column_lists(df):
+    return [df[col].to_numpy(dtype=float).tolist() for _, col in CANDLE_FIELDS]
+
+def frame_to_candles(df):
+    """
+    Row layout (default): [{"time": ISO-8601, "open": .., "high": .., "low": .., "close": ..}, ...]
+    """
+    opens, highs, lows, closes = _column_lists(df)
+    return [
+        {"time": t, "open": o, "high": h, "low": l, "close": c}
+        for t, o, h, l, c in zip(_iso_times(df.index), opens, highs, lows, closes)
+    ]
+
+def frame_to_columns(df):
+    """
+    Columnar layout: parallel arrays with epoch-second timestamps.
+    """
+    columns = {"time": (df.index.asi8 // 10**9).tolist()}
+    for (name, _), values in zip(CANDLE_FIELDS, _column_lists(df)):
+        columns[name] = values
+    return columns
+
+CHART_FORMATS = {
+    "rows": frame_to_candles,
+    "columnar": frame_to_columns,
+}
+
+def get_full_chart_data(ticker, chart_format="rows"):
+    """
+    1D / 5D / 1Y candles, all derived from the shared history fetch.
+    """
+    from app.services.history import get_history, build_chart_data
+    return build_chart_data(get_history(ticker), chart_format)
+
+def compute_pivots(df, ticker, session_day=None):
+    """
+    Classic floor pivots from the previous session; current price from the latest bar.
+    """
+    if df is None or df.empty:
         return None
 
     try:
         today_candle = df.iloc[-1]
         today_close = float(today_candle['Close'])
 
-        last_candle = df.iloc[-2]
+        basis = session_basis_position(df, session_day)
+        if basis is None:
+            return None
+        last_candle = df.iloc[basis]
         
         high = float(last_candle['High'])
         low = float(last_candle['Low'])
@@ -142,6 +376,113 @@ def get_pivot_points(ticker):
     except Exception:
         return None
 
+def compute_batch_pivots(frames):
+    """
+    Classic pivots for many symbols in one vectorized pass.
+    Same formulas and output shape as compute_pivots().
+    """
+    session_day = current_session_day()
+    basis = {
+        symbol: session_basis_position(df, session_day)
+        for symbol, df in frames.items() if df is not None and not df.empty
+    }
+    symbols = [symbol for symbol, position in basis.items() if position is not None]
+    if not symbols:
+        return {}
+
+    # rows: [prev_high, prev_low, prev_close, last_close]
+    bars = np.array([
+        [frames[s]['High'].iat[basis[s]], frames[s]['Low'].iat[basis[s]],
+         frames[s]['Close'].iat[basis[s]], frames[s]['Close'].iat[-1]]
+        for s in symbols
+    ], dtype=float)
+    high, low, close, today_close = bars.T
+
+    pivot = (high + low + close) / 3
+    spread = high - low
+    levels = np.round(np.column_stack([
+        today_close, pivot, 2 * pivot - low, pivot + spread, 2 * pivot - high, pivot - spread
+    ]), 2).tolist()
+
+    return {
+        symbol: {
+            "symbol": symbol,
+            "current_price": price,
+            "pivot_point": p,
+            "resistance": {"target_1": r1, "target_2": r2},
+            "support": {"stop_1": s1, "stop_2": s2}
+        }
+        for symbol, (price, p, r1, r2, s1, s2) in zip(symbols, levels)
+    }
+
+# --- SESSION PIVOTS ---
+# Levels come from the previous session, so they can't change while the
+# current one trades: computed once per (ticker, session day).
+session_pivot_cache = TTLCache("session_pivots", maxsize=int(os.getenv("SESSION_PIVOT_CACHE_SIZE", "2048")))
+
+def get_session_pivots(ticker, daily=None):
+    """
+    `daily` is the 1Y daily frame if the caller already has it. Levels are
+    pinned for the day only once they come from the previous trading day;
+    a series that doesn't reach it yet is retried like a live bar.
+    """
+    ticker = validate_indian_ticker(ticker)
+    session_day = current_session_day()
+    key = (ticker, session_day)
+    pivots = session_pivot_cache.get(key)
+    if pivots is None:
+        # Same pull as the 1Y chart, so this is normally a cache hit
+        df = daily if daily is not None else get_stock_data(ticker, period="1y", interval="1d")
+        pivots = compute_pivots(df, ticker, session_day)
+        if pivots is not None:
+            basis_day = df.index[session_basis_position(df, session_day)].date()
+            complete = basis_day == previous_trading_day(session_day)
+            session_pivot_cache.set(key, pivots, ttl=seconds_until_next_open() if complete else ohlcv_ttl("1d"))
+    return pivots
+
+def get_pivot_points(ticker):
+    """
+    Session pivots with the current price from a live quote.
+    """
+    pivots = get_session_pivots(ticker)
+    if pivots is None:
+        return None
+    quote = get_live_price(pivots["symbol"])
+    return {**pivots, "current_price": quote["price"]} if quote else pivots
+
+# --- LIVE QUOTES ---
+def get_live_price(ticker):
+    """
+    Latest trade price from a single-bar request: the forming daily bar's
+    close. (fast_info.last_price would pull a year of daily bars.)
+    Falls back to the cached intraday pull if the quote fails.
+    """
+    ticker = validate_indian_ticker(ticker)
+    if yahoo.scheduler.is_invalid(ticker):
+        return None
+    try:
+        df = yahoo.quote(ticker)
+        if not df.empty and not np.isnan(df['Close'].iloc[-1]):
+            return {"symbol": ticker, "price": round(float(df['Close'].iloc[-1]), 2)}
+    except YahooThrottled as e:
+        print(f"Live Quote Deferred ({ticker}): {e}")
+        return None
+    except Exception as e:
+        print(f"Live Quote Error ({ticker}): {e}")
+    with yahoo.priority(yahoo.LIVE):
+        return get_latest_price(ticker)
+
+def get_latest_price(ticker):
+    """
+    Last traded price from the 1m intraday pull (shared with the 1D chart cache).
+    """
+    ticker = validate_indian_ticker(ticker)
+    df = get_stock_data(ticker, period="5d", interval="1m")
+
+    if df is None or df.empty:
+        return None
+    return {"symbol": ticker, "price": round(float(df['Close'].iloc[-1]), 2)}
+
 if __name__ == "__main__":
     # Test the "Snap-to-Last-Day" logic
     print("Testing Pivot Points for RELIANCE...")
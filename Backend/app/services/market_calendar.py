@@ -0,0 +1,114 @@
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+# --- NSE SESSION ---
+# India has no DST, so a fixed offset avoids depending on the system tz database.
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+
+def now_ist():
+    return datetime.now(IST)
+
+def _to_ist(now):
+    if now is None:
+        return now_ist()
+    if now.tzinfo is None:
+        return now.replace(tzinfo=IST)
+    return now.astimezone(IST)
+
+# --- NSE TRADING HOLIDAYS ---
+# Weekday closures from the exchange's yearly circulars. NSE_HOLIDAYS_FILE
+# (one YYYY-MM-DD per line, '#' comments) replaces this list, e.g. for a
+# new year or a late-announced closure.
+NSE_HOLIDAYS_FILE = os.getenv("NSE_HOLIDAYS_FILE", "")
+
+DEFAULT_HOLIDAYS = {
+    # 2025
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14",
+    "2025-04-18", "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02",
+    "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
+    # 2026
+    "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03",
+    "2026-04-14", "2026-05-01", "2026-05-28", "2026-06-26", "2026-09-14",
+    "2026-10-02", "2026-10-20", "2026-11-10", "2026-11-24", "2026-12-25",
+}
+
+def load_holidays(path=NSE_HOLIDAYS_FILE):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            entries = [line.split("#")[0].strip() for line in f]
+    else:
+        entries = DEFAULT_HOLIDAYS
+    return frozenset(date.fromisoformat(entry) for entry in entries if entry)
+
+HOLIDAYS = load_holidays()
+HOLIDAYS_THROUGH = max((day.year for day in HOLIDAYS), default=0)
+_uncovered_years = set()
+
+def _check_coverage(day):
+    # Past the list every weekday counts as a session; say so once per year
+    if day.year > HOLIDAYS_THROUGH and day.year not in _uncovered_years:
+        _uncovered_years.add(day.year)
+        print(f"⚠️ NSE holiday calendar ends in {HOLIDAYS_THROUGH}; {day.year} holidays are unknown. "
+              f"Set NSE_HOLIDAYS_FILE to this year's circular.")
+
+def is_trading_day(day):
+    _check_coverage(day)
+    return day.weekday() < 5 and day not in HOLIDAYS
+
+def previous_trading_day(day):
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+def current_session_day(now=None):
+    """
+    The latest session that has started: today once the market has opened,
+    otherwise the previous trading day.
+    """
+    now = _to_ist(now)
+    day = now.date()
+    if is_trading_day(day) and now.time() >= MARKET_OPEN:
+        return day
+    return previous_trading_day(day)
+
+def is_market_open(now=None):
+    now = _to_ist(now)
+    return is_trading_day(now.date()) and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+def next_session_open(now=None):
+    """
+    Start of the next regular session strictly after `now`.
+    """
+    now = _to_ist(now)
+    day = now.date()
+    if now.time() >= MARKET_OPEN:
+        day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return datetime.combine(day, MARKET_OPEN, tzinfo=IST)
+
+def seconds_until_next_open(now=None):
+    now = _to_ist(now)
+    return (next_session_open(now) - now).total_seconds()
+
+def seconds_until_close(now=None):
+    now = _to_ist(now)
+    close = datetime.combine(now.date(), MARKET_CLOSE, tzinfo=IST)
+    return max((close - now).total_seconds(), 0.0)
+
+def seconds_until_bar_close(bar_seconds, now=None):
+    """
+    Seconds until the current session-aligned bar closes; while the market
+    is closed, until the next session opens.
+    """
+    now = _to_ist(now)
+    if not is_market_open(now):
+        return seconds_until_next_open(now)
+
+    session_start = datetime.combine(now.date(), MARKET_OPEN, tzinfo=IST)
+    elapsed = (now - session_start).total_seconds()
+    remaining = bar_seconds - (elapsed % bar_seconds)
+    return min(remaining, seconds_until_close(now))
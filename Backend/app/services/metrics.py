@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app.services.executor import stage_observers
+
+# --- METRICS ---
+# Minimal Prometheus-text registry (no client library): counters and
+# histograms live here, point-in-time gauges are rendered at scrape time.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "3"))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = _labels(self.labelnames, labels, ("le", _number(float(bound))))
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+def scrape_family(name, help, samples, labelnames=(), kind="gauge"):
+    """
+    A metric read at scrape time: `samples` maps label tuples (or ()) to values.
+    """
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples.items():
+        lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+    return lines
+
+REQUEST_SECONDS = Histogram(
+    "tradesentry_request_duration_seconds", "End-to-end HTTP request latency.", ["route"]
+)
+REQUESTS = Counter("tradesentry_requests_total", "HTTP requests by route and status.", ["route", "status"])
+STAGE_SECONDS = Histogram(
+    "tradesentry_stage_duration_seconds", "Wall time of each pipeline stage.", ["stage"]
+)
+STAGE_OUTCOMES = Counter(
+    "tradesentry_stage_total", "Pipeline stages by outcome (ok, timeout, error).", ["stage", "outcome"]
+)
+UPSTREAM_SECONDS = Histogram(
+    "tradesentry_upstream_duration_seconds", "Latency of calls to Yahoo, the ML service and Groq.",
+    ["dependency", "operation"]
+)
+UPSTREAM_CALLS = Counter(
+    "tradesentry_upstream_calls_total", "Upstream calls by dependency, operation and outcome.",
+    ["dependency", "operation", "outcome"]
+)
+
+REGISTRY = [REQUEST_SECONDS, REQUESTS, STAGE_SECONDS, STAGE_OUTCOMES, UPSTREAM_SECONDS, UPSTREAM_CALLS]
+
+def render(extra=()):
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for family in extra:
+        lines.extend(family)
+    return "\n".join(lines) + "\n"
+
+# --- SPANS ---
+# Per-request list of (name, seconds, outcome), shared with child tasks and
+# (via run_blocking's copied context) worker threads.
+current_spans = ContextVar("current_spans", default=None)
+
+def _add_span(name, seconds, outcome):
+    spans = current_spans.get()
+    if spans is not None:
+        spans.append((name, seconds, outcome))
+
+def observe_stage(stage, seconds, outcome):
+    STAGE_SECONDS.observe(seconds, stage)
+    STAGE_OUTCOMES.inc(stage, outcome)
+    _add_span(stage, seconds, outcome)
+
+stage_observers.append(observe_stage)
+
+@contextmanager
+def span(name):
+    """
+    Times an in-process step as a stage (e.g. one chart timeframe).
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        observe_stage(name, time.perf_counter() - start, outcome)
+
+def record_upstream(dependency, operation, seconds, outcome):
+    UPSTREAM_SECONDS.observe(seconds, dependency, operation)
+    UPSTREAM_CALLS.inc(dependency, operation, outcome)
+    _add_span(f"{dependency}.{operation}", seconds, outcome)
+
+@contextmanager
+def track_upstream(dependency, operation):
+    """
+    Times one upstream call; exceptions are counted (timeout/error) and re-raised.
+    """
+    start = time.perf_counter()
+    outcome = "cancelled"
+    try:
+        yield
+        outcome = "ok"
+    except Exception as e:
+        outcome = "timeout" if "timeout" in type(e).__name__.lower() else "error"
+        raise
+    finally:
+        record_upstream(dependency, operation, time.perf_counter() - start, outcome)
+
+# --- REQUEST MIDDLEWARE ---
+class MetricsMiddleware:
+    """
+    ASGI middleware: end-to-end latency per route template (streaming bodies
+    included), status counters, and a slow-request log with the stage spans.
+    """
+
+    def __init__(self, app, slow_seconds=SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        spans = []
+        token = current_spans.set(spans)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_spans.reset(token)
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            if template != "/metrics":
+                REQUEST_SECONDS.observe(elapsed, template)
+                REQUESTS.inc(template, str(status))
+                if elapsed >= self.slow_seconds:
+                    log_slow_request(scope["path"], template, status, elapsed, spans)
+
+def log_slow_request(path, route, status, seconds, spans):
+    print(json.dumps({
+        "event": "slow_request",
+        "path": path,
+        "route": route,
+        "status": status,
+        "total_ms": round(seconds * 1000, 1),
+        "stages": [
+            {"name": name, "ms": round(s * 1000, 1), "outcome": outcome}
+            for name, s, outcome in sorted(spans, key=lambda span: -span[1])
+        ]
+    }))
@@ -0,0 +1,116 @@
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from app.services.metrics import record_upstream
+
+# This URL comes from your AWS API Gateway after deployment
+ML_SERVICE_URL = os.getenv("ML_SERVICE_URL")
+
+ML_CONNECT_TIMEOUT = float(os.getenv("ML_CONNECT_TIMEOUT", "3"))
+ML_READ_TIMEOUT = float(os.getenv("ML_READ_TIMEOUT", "15"))
+ML_RETRIES = int(os.getenv("ML_RETRIES", "2"))
+ML_BACKOFF = float(os.getenv("ML_BACKOFF", "0.25"))
+ML_POOL_SIZE = int(os.getenv("ML_POOL_SIZE", "16"))
+
+# Lambda throttling / API Gateway hiccups are worth a retry; 4xx are not
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class MLServiceError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast for
+    `reset_timeout` seconds. Then lets a single trial call through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"🔌 ML service circuit opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("ML_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.getenv("ML_BREAKER_RESET", "30"))
+)
+
+# One keep-alive pool for every caller: no TLS handshake per request
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=ML_POOL_SIZE))
+session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=ML_POOL_SIZE))
+
+def is_configured():
+    return bool(ML_SERVICE_URL)
+
+def post(payload, read_timeout=ML_READ_TIMEOUT):
+    """
+    POSTs one request to the ML service with jittered retries.
+    Raises MLServiceError when unconfigured, the circuit is open, or all attempts fail.
+    """
+    if not ML_SERVICE_URL:
+        raise MLServiceError("ML_SERVICE_URL not set")
+    if not breaker.allow():
+        record_upstream("ml_service", "post", 0.0, "circuit_open")
+        raise MLServiceError("circuit open")
+
+    last_error = None
+    for attempt in range(ML_RETRIES + 1):
+        if attempt:
+            # Full jitter keeps retries from many workers from arriving in lockstep
+            time.sleep(random.uniform(0, ML_BACKOFF * (2 ** attempt)))
+        started = time.perf_counter()
+        try:
+            response = session.post(
+                ML_SERVICE_URL, json=payload,
+                timeout=(ML_CONNECT_TIMEOUT, read_timeout)
+            )
+        except requests.RequestException as e:
+            outcome = "timeout" if isinstance(e, requests.Timeout) else "error"
+            record_upstream("ml_service", "post", time.perf_counter() - started, outcome)
+            last_error = f"Connection Error: {e}"
+            continue
+
+        outcome = "ok" if response.status_code == 200 else f"http_{response.status_code}"
+        record_upstream("ml_service", "post", time.perf_counter() - started, outcome)
+        if response.status_code == 200:
+            breaker.record_success()
+            return response.json()
+
+        last_error = f"AWS Error: {response.status_code} - {response.text[:200]}"
+        if response.status_code not in RETRYABLE_STATUS:
+            # The service answered; the request itself was bad
+            breaker.record_success()
+            raise MLServiceError(last_error)
+
+    breaker.record_failure()
+    raise MLServiceError(last_error)
@@ -1,8 +1,94 @@
-import yfinance as yf
-import requests
+import hashlib
 import os
+from app.services import ml_client, yahoo
+from app.services.cache import TTLCache
+from app.services.ml_client import MLServiceError
 
-ML_SERVICE_URL = os.getenv("ML_SERVICE_URL")
+# --- HEADLINE SENTIMENT CACHE ---
+# FinBERT {label, score} per headline, keyed by a content hash. Market-wide
+# headlines show up under many tickers, so this is shared across all of them.
+sentiment_cache = TTLCache(
+    "headline_sentiment",
+    maxsize=int(os.getenv("SENTIMENT_CACHE_SIZE", "4096")),
+    default_ttl=float(os.getenv("SENTIMENT_CACHE_TTL", "21600"))
+)
+
+def headline_key(headline):
+    normalized = " ".join(headline.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def fetch_headlines(ticker, limit=5):
+    """
+    Top news headlines for a ticker (lightweight, runs locally).
+    """
+    if yahoo.scheduler.is_invalid(ticker):
+        return []
+    news = yahoo.news(ticker)
+
+    headlines = []
+    if news:
+        for item in news[:limit]:
+            title = item.get('title') or item.get('content', {}).get('title')
+            if title: headlines.append(title)
+    return headlines
+
+def aggregate_sentiment(scores):
+    """
+    Same weighting as the ML service: the top headline counts double.
+    """
+    score = 0
+    for i, res in enumerate(scores):
+        weight = 2 if i == 0 else 1
+        if res['label'] == 'positive': score += weight
+        elif res['label'] == 'negative': score -= weight
+    if score > 0: return "Positive 🟢"
+    elif score < 0: return "Negative 🔴"
+    else: return "Neutral ⚪"
+
+def split_cached_scores(headlines):
+    """
+    Returns (keys, scores, unseen): cache keys in input order, {key: cached
+    score or None}, and {key: headline} still needing inference (deduped).
+    """
+    keys = [headline_key(h) for h in headlines]
+    scores = {key: sentiment_cache.get(key) for key in set(keys)}
+
+    unseen = {}
+    for key, headline in zip(keys, headlines):
+        if scores[key] is None and key not in unseen:
+            unseen[key] = headline
+    return keys, scores, unseen
+
+def store_headline_scores(unseen, fresh, scores):
+    """
+    Caches the service's per-headline results. False if they don't line up.
+    """
+    if not fresh or len(fresh) != len(unseen):
+        return False
+
+    for key, result in zip(unseen, fresh):
+        scores[key] = result
+        sentiment_cache.set(key, result)
+    return True
+
+def score_headlines(headlines):
+    """
+    Per-headline scores in input order. Only headlines missing from the cache
+    are sent to AWS. Returns None if the service could not score them.
+    """
+    keys, scores, unseen = split_cached_scores(headlines)
+
+    if unseen:
+        payload = {"headlines": list(unseen.values()), "scores": True}
+        try:
+            result = ml_client.post(payload)
+        except MLServiceError as e:
+            print(f"News/AWS Error: {e}")
+            return None
+        if not store_headline_scores(unseen, result.get('headline_scores'), scores):
+            return None
+
+    return [scores[key] for key in keys]
 
 def get_news_sentiment(ticker):
     """
@@ -10,32 +96,24 @@ def get_news_sentiment(ticker):
     """
     try:
         # 1. Fetch News (This is light, Render can handle it)
-        stock = yf.Ticker(ticker)
-        news = stock.news
-        
-        headlines = []
-        if news:
-            for item in news[:5]:
-                title = item.get('title') or item.get('content', {}).get('title')
-                if title: headlines.append(title)
-        
+        headlines = fetch_headlines(ticker)
+
         if not headlines:
             return "Neutral (No News)"
 
         # 2. If no AWS, stop here
-        if not ML_SERVICE_URL:
+        if not ml_client.is_configured():
             return "Neutral (No AI)"
 
-        # 3. Send Headlines to AWS
-        payload = {"headlines": headlines}
-        response = requests.post(ML_SERVICE_URL, json=payload, timeout=15)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result.get('sentiment', "Neutral")
-        else:
+        # 3. Score unseen headlines on AWS, recompose from cached scores
+        scores = score_headlines(headlines)
+        if scores is None:
             return "Neutral"
+        return aggregate_sentiment(scores)
 
     except Exception as e:
         print(f"News/AWS Error: {e}")
-        return "Neutral"
\ No newline at end of file
+        return "Neutral"
+
+def get_sentiment_cache_stats():
+    return sentiment_cache.stats()
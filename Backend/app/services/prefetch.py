@@ -0,0 +1,183 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from app.services import yahoo
+from app.services.market_calendar import is_market_open, seconds_until_bar_close, seconds_until_next_open
+from app.services.marketData import validate_indian_ticker
+from app.services.metrics import current_spans
+
+# --- POPULARITY PREFETCH ---
+# Analyses record which tickers people open. Just after each bar closes during
+# the session, the most popular ones are run through the analysis pipeline in
+# the background (bars, indicators, ML signals, verdict), so the first user
+# after a bar close reads warm caches instead of paying the cold path.
+# Off by default: every cycle spends Yahoo and paid LLM calls.
+# No cycle runs while the market is closed: OHLCV and verdict TTLs then end
+# at the next open, so anything warmed would expire unread at 09:15.
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "20"))
+PREFETCH_HALF_LIFE = float(os.getenv("PREFETCH_HALF_LIFE", "14400"))
+# Below this decayed score a ticker isn't worth an upstream call
+PREFETCH_MIN_SCORE = float(os.getenv("PREFETCH_MIN_SCORE", "1"))
+# Upstream calls (Yahoo, ML service, Groq) one cycle may spend
+PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", "60"))
+# Worst case for a cold ticker: 4 Yahoo pulls, 2 ML calls, 1 LLM call
+PREFETCH_TICKER_COST = int(os.getenv("PREFETCH_TICKER_COST", "7"))
+PREFETCH_BAR_SECONDS = int(os.getenv("PREFETCH_BAR_SECONDS", "900"))
+PREFETCH_BAR_DELAY = float(os.getenv("PREFETCH_BAR_DELAY", "20"))
+# Comma-separated tickers ranked from startup (the tracker is in-memory)
+PREFETCH_SEED = os.getenv("PREFETCH_SEED", "")
+
+UPSTREAM_DEPENDENCIES = ("yahoo", "ml_service", "groq")
+# Scores under this are forgotten (about 6.6 half-lives without a hit)
+FORGET_SCORE = 0.01
+
+class PopularityTracker:
+    """
+    Exponentially decaying access counts: a hit is worth 1 now and half
+    that after `half_life` seconds.
+    """
+
+    def __init__(self, half_life=PREFETCH_HALF_LIFE, clock=time.monotonic):
+        self.decay_rate = math.log(2) / half_life
+        self.clock = clock
+        self._scores = {}        # symbol -> (score, as of)
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, since, now):
+        return score * math.exp(-self.decay_rate * (now - since))
+
+    def record(self, symbol, weight=1.0):
+        now = self.clock()
+        with self._lock:
+            score, since = self._scores.get(symbol, (0.0, now))
+            self._scores[symbol] = (self._decayed(score, since, now) + weight, now)
+
+    def top(self, n, min_score=0.0):
+        """
+        Up to n (symbol, score) pairs, most popular first.
+        """
+        now = self.clock()
+        with self._lock:
+            scores = {symbol: self._decayed(score, since, now) for symbol, (score, since) in self._scores.items()}
+            for symbol, score in scores.items():
+                if score < FORGET_SCORE:
+                    del self._scores[symbol]
+        ranked = sorted((item for item in scores.items() if item[1] >= min_score), key=lambda item: -item[1])
+        return ranked[:n]
+
+    def __len__(self):
+        return len(self._scores)
+
+popularity = PopularityTracker()
+for _seed in PREFETCH_SEED.split(","):
+    if _seed.strip():
+        popularity.record(validate_indian_ticker(_seed), weight=PREFETCH_MIN_SCORE)
+
+def upstream_calls(spans):
+    """
+    Upstream calls among a request's spans (an open ML circuit sends nothing).
+    """
+    return sum(
+        1 for name, _, outcome in spans
+        if name.split(".")[0] in UPSTREAM_DEPENDENCIES and outcome != "circuit_open"
+    )
+
+class Prefetcher:
+    """
+    Background warm-up loop. `warm` is an async callable (symbol -> bool) that
+    runs the same pipeline as a request; its Yahoo calls use the background lane.
+    """
+
+    def __init__(self, warm, tracker=popularity, top_n=PREFETCH_TOP_N, budget=PREFETCH_BUDGET,
+                 ticker_cost=PREFETCH_TICKER_COST, bar_seconds=PREFETCH_BAR_SECONDS,
+                 bar_delay=PREFETCH_BAR_DELAY):
+        self.warm = warm
+        self.tracker = tracker
+        self.top_n = top_n
+        self.budget = budget
+        self.ticker_cost = ticker_cost
+        self.bar_seconds = bar_seconds
+        self.bar_delay = bar_delay
+        self.cycles = 0
+        self.warmed = 0
+        self.upstream_spent = 0
+        self.last_cycle = None
+        self._task = None
+
+    def seconds_until_next_cycle(self, now=None):
+        """
+        Just after the current bar closes while the market is open; otherwise
+        just after the first bar of the next session.
+        """
+        if is_market_open(now):
+            return seconds_until_bar_close(self.bar_seconds, now) + self.bar_delay
+        return seconds_until_next_open(now) + self.bar_seconds + self.bar_delay
+
+    async def warm_cycle(self):
+        """
+        Warms the most popular tickers in rank order while a cold ticker's
+        worst-case cost still fits the upstream budget.
+        """
+        if yahoo.scheduler.paused_until > time.monotonic():
+            print("⏸️ Yahoo is rate limiting; skipping this prefetch cycle")
+            return []
+
+        spent, warmed = 0, []
+        for symbol, _ in self.tracker.top(self.top_n, PREFETCH_MIN_SCORE):
+            if spent + self.ticker_cost > self.budget:
+                break
+            spans = []
+            token = current_spans.set(spans)
+            try:
+                if await self.warm(symbol):
+                    warmed.append(symbol)
+            except Exception as e:
+                print(f"⚠️ Prefetch failed for {symbol}: {e}")
+            finally:
+                current_spans.reset(token)
+            spent += upstream_calls(spans)
+
+        self.cycles += 1
+        self.warmed += len(warmed)
+        self.upstream_spent += spent
+        self.last_cycle = {"at": time.time(), "warmed": warmed, "upstream_calls": spent}
+        print(f"🔥 Prefetched {len(warmed)} tickers with {spent}/{self.budget} upstream calls")
+        return warmed
+
+    async def _run(self):
+        # This task's own context: every Yahoo call it makes queues behind users
+        yahoo.current_lane.set(yahoo.BACKGROUND)
+        while True:
+            await asyncio.sleep(self.seconds_until_next_cycle())
+            try:
+                await self.warm_cycle()
+            except Exception as e:
+                print(f"⚠️ Prefetch cycle failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self):
+        return {
+            "running": self._task is not None,
+            "tracked": len(self.tracker),
+            "cycles": self.cycles,
+            "warmed": self.warmed,
+            "upstream_calls": self.upstream_spent,
+            "next_cycle_in": round(self.seconds_until_next_cycle(), 1),
+            "last_cycle": self.last_cycle,
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from app.services.executor import run_blocking
+from app.services.market_calendar import is_market_open, next_session_open, seconds_until_next_open
+
+# --- LIVE PRICE FAN-OUT ---
+# One poller per subscribed ticker, shared by every websocket watching it.
+PRICE_POLL_INTERVAL = float(os.getenv("PRICE_POLL_INTERVAL", "2"))
+PRICE_QUEUE_SIZE = int(os.getenv("PRICE_QUEUE_SIZE", "8"))
+
+# Pushed to a subscriber that was dropped for falling behind
+SLOW_CONSUMER = None
+
+def market_closed_message(symbol, last=None):
+    return {
+        "symbol": symbol,
+        "price": last["price"] if last else None,
+        "status": "market_closed",
+        "next_open": next_session_open().isoformat(),
+    }
+
+class PriceHub:
+    """
+    Pub/sub hub for live prices. Sends only when the price or status changes,
+    drops subscribers whose bounded queue fills up, and stops a ticker's
+    poller with its last subscriber.
+    Outside market hours one quote is sent and polling waits for the next open.
+    """
+
+    def __init__(self, fetch_price, poll_interval=PRICE_POLL_INTERVAL, queue_size=PRICE_QUEUE_SIZE,
+                 market_open=is_market_open, run=run_blocking):
+        self.fetch_price = fetch_price
+        self.run = run
+        self.market_open = market_open
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscribers = {}   # symbol -> set[asyncio.Queue]
+        self._pollers = {}       # symbol -> asyncio.Task
+        self._last = {}          # symbol -> last message sent
+
+    def subscribe(self, symbol):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(symbol, set()).add(queue)
+
+        # Late joiners get the current price straight away
+        if symbol in self._last:
+            queue.put_nowait(self._last[symbol])
+
+        if symbol not in self._pollers:
+            self._pollers[symbol] = asyncio.create_task(self._poll(symbol))
+        return queue
+
+    def unsubscribe(self, symbol, queue):
+        subscribers = self._subscribers.get(symbol)
+        if subscribers is None:
+            return
+
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[symbol]
+            self._last.pop(symbol, None)
+            poller = self._pollers.pop(symbol, None)
+            if poller:
+                poller.cancel()
+
+    def subscriber_count(self, symbol=None):
+        if symbol is not None:
+            return len(self._subscribers.get(symbol, ()))
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def poller_count(self):
+        return len(self._pollers)
+
+    def _publish(self, symbol, message):
+        self._last[symbol] = message
+
+        for queue in list(self._subscribers.get(symbol, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                print(f"🐢 Dropping slow price subscriber for {symbol}")
+                self._drop(symbol, queue)
+
+    def _drop(self, symbol, queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(SLOW_CONSUMER)
+        self.unsubscribe(symbol, queue)
+
+    async def _poll(self, symbol):
+        while True:
+            message = await self.run(
+                self.fetch_price, symbol,
+                timeout=max(self.poll_interval * 4, 5), stage="live_price"
+            )
+            last = self._last.get(symbol)
+            if self.market_open():
+                # A quote equal to the market_closed price still reopens the feed
+                if message and (last is None or (message["price"], message.get("status"))
+                                != (last["price"], last.get("status"))):
+                    self._publish(symbol, message)
+                await asyncio.sleep(self.poll_interval)
+            else:
+                # Nothing trades until the next session (weekends, holidays,
+                # overnight): say so, with the last price if there is one
+                if message or last is None:
+                    self._publish(symbol, market_closed_message(symbol, message or last))
+                await asyncio.sleep(seconds_until_next_open())
+
+def _fetch_live_price(symbol):
+    from app.services.marketData import get_live_price
+    return get_live_price(symbol)
+
+async def _run_live(func, *args, **kwargs):
+    # Quotes wait for their Yahoo token on the event loop, in the live lane
+    from app.services import yahoo
+    return await yahoo.run_metered(func, *args, lane=yahoo.LIVE, **kwargs)
+
+price_hub = PriceHub(_fetch_live_price, run=_run_live)
@@ -1,7 +1,11 @@
 import os
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_groq import ChatGroq
+from app.services.chat_sessions import compact_context, session_store
+from app.services.indicators import describe_indicators
+from app.services.metrics import track_upstream
 
 # 1. Load Environment Variables
 load_dotenv()
@@ -20,13 +24,7 @@ except Exception as e:
     print(f"Error initializing ChatGroq: {e}")
     llm = None
 
-def get_chat_response(ticker, query, context_data):
-    """
-    Handles follow-up questions (The Chatbot).
-    """
-    if llm is None:
-        return "Error: LLM client not initialized. Check API Key."
-
+def render_system_prompt(ticker, context_data):
     stock_context = f"""
     STOCK: {ticker}
     LIVE MARKET DATA:
@@ -37,6 +35,8 @@ def get_chat_response(ticker, query, context_data):
     - Resistance (Target): {context_data.get('support_resistance', {}).get('resistance', {}).get('target_1')}
     - Support (Stop Loss): {context_data.get('support_resistance', {}).get('support', {}).get('stop_1')}
     - News Sentiment: {context_data.get('sentiment_signal')}
+    INDICATORS:
+    {describe_indicators(context_data.get('indicators'))}
     """
 
     system_prompt = f"""You are a helpful financial assistant for the TradeSentry platform.
@@ -50,21 +50,105 @@ def get_chat_response(ticker, query, context_data):
     2. Keep answers short, factual, and professional.
     3. If the user asks for advice, refer them to the specific Support/Resistance levels.
     """
-    
+    return system_prompt
+
+def _build_chat_chain(ticker, context_data):
     prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
+        ("system", render_system_prompt(ticker, context_data)),
         ("user", "{input}")
     ])
     
-    chain = prompt | llm
+    return prompt | llm
+
+def get_chat_response(ticker, query, context_data):
+    """
+    Handles follow-up questions (The Chatbot).
+    """
+    if llm is None:
+        return "Error: LLM client not initialized. Check API Key."
+
+    chain = _build_chat_chain(ticker, context_data)
     
     try:
-        response = chain.invoke({"input": query})
+        with track_upstream("groq", "chat"):
+            response = chain.invoke({"input": query})
         return response.content
     except Exception as e:
         print(f"LLM Invocation Error: {str(e)}")
         return f"Error: {str(e)}"
 
+async def astream_chat_response(ticker, query, context_data):
+    """
+    Streaming variant of get_chat_response: yields answer tokens as they arrive.
+    """
+    if llm is None:
+        yield "Error: LLM client not initialized. Check API Key."
+        return
+
+    chain = _build_chat_chain(ticker, context_data)
+    with track_upstream("groq", "chat_stream"):
+        async for chunk in chain.astream({"input": query}):
+            if chunk.content:
+                yield chunk.content
+
+# --- SESSION CHAT ---
+def open_chat_session(ticker, analysis):
+    """
+    Creates a server-side chat session from an analyze response.
+    The system prompt is rendered once here, not on every message.
+    """
+    context = compact_context(analysis)
+    return session_store.create(ticker, context, render_system_prompt(ticker, context))
+
+def _history_messages(session):
+    summary, history = session.snapshot()
+    messages = []
+    if summary:
+        messages.append(SystemMessage(content="Earlier in this conversation:\n" + "\n".join(summary)))
+    for role, content in history:
+        messages.append(HumanMessage(content=content) if role == "user" else AIMessage(content=content))
+    return messages
+
+def _build_session_chain(session):
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", session.system_prompt),
+        MessagesPlaceholder("history"),
+        ("user", "{input}")
+    ])
+    return prompt | llm
+
+def get_session_chat_response(session, query):
+    if llm is None:
+        return "Error: LLM client not initialized. Check API Key."
+
+    chain = _build_session_chain(session)
+
+    try:
+        with track_upstream("groq", "chat"):
+            answer = chain.invoke({"input": query, "history": _history_messages(session)}).content
+    except Exception as e:
+        print(f"LLM Invocation Error: {str(e)}")
+        return f"Error: {str(e)}"
+
+    session.add_turn(query, answer)
+    return answer
+
+async def astream_session_chat_response(session, query):
+    if llm is None:
+        yield "Error: LLM client not initialized. Check API Key."
+        return
+
+    chain = _build_session_chain(session)
+    parts = []
+    with track_upstream("groq", "chat_stream"):
+        async for chunk in chain.astream({"input": query, "history": _history_messages(session)}):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+
+    if parts:
+        session.add_turn(query, "".join(parts))
+
 # --- TEST ---
 if __name__ == "__main__":
     fake_context = {
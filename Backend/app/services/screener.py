@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from app.services import bar_store, yahoo
+from app.services.indicators import pivot_levels
+from app.services.market_calendar import current_session_day, is_market_open, previous_trading_day
+from app.services.marketData import validate_indian_ticker, get_batch_stock_data
+
+# --- UNIVERSE SCREENER ---
+# Pivot levels for every symbol are computed once per session day in one
+# vectorized pass; live prices are refreshed in bulk (multi-ticker
+# downloads) and each (method, level) keeps its distance-to-level sorted,
+# so a query is two binary searches.
+# Yahoo charges one token per ticker, so a refresh only re-prices a slice:
+# the symbols tried longest ago. Every symbol keeps its own quote time, and
+# results say which prices are live and how old they are.
+SCREENER_UNIVERSE = os.getenv("SCREENER_UNIVERSE", "")            # comma-separated
+SCREENER_UNIVERSE_FILE = os.getenv("SCREENER_UNIVERSE_FILE", "")  # one symbol per line
+SCREENER_PRICE_TTL = float(os.getenv("SCREENER_PRICE_TTL", "30"))
+# Last price comes from the forming bar; 5m bars keep the bulk download small
+SCREENER_PRICE_INTERVAL = os.getenv("SCREENER_PRICE_INTERVAL", "5m")
+# Share of the Yahoo rate the screener may use; sets the default slice size
+SCREENER_RATE_SHARE = float(os.getenv("SCREENER_RATE_SHARE", "0.25"))
+SCREENER_SLICE_SIZE = int(os.getenv("SCREENER_SLICE_SIZE", "0")) or max(
+    1, int(yahoo.YAHOO_RATE * SCREENER_PRICE_TTL * SCREENER_RATE_SHARE)
+)
+
+def load_universe():
+    """
+    SCREENER_UNIVERSE, else SCREENER_UNIVERSE_FILE, else every symbol with
+    daily bars in the on-disk store.
+    """
+    if SCREENER_UNIVERSE:
+        raw = SCREENER_UNIVERSE.split(",")
+    elif SCREENER_UNIVERSE_FILE and os.path.exists(SCREENER_UNIVERSE_FILE):
+        with open(SCREENER_UNIVERSE_FILE) as f:
+            raw = [line.split("#")[0] for line in f]
+    else:
+        raw = bar_store.stored_symbols("1d")
+    return list(dict.fromkeys(validate_indian_ticker(s) for s in raw if s.strip()))
+
+def _session_dates(times):
+    return pd.DatetimeIndex(np.asarray(times), tz="UTC").tz_convert(bar_store.MARKET_TZ).date
+
+def _basis_bar(times, highs, lows, closes, session_day, strict=True):
+    """
+    (high, low, close, last close) of the last session before `session_day`.
+    With `strict`, None if that isn't the previous trading day (a stale
+    store series); otherwise the last completed bar is used as is, which
+    also covers holidays missing from the calendar.
+    """
+    dates = _session_dates(times)
+    before = np.flatnonzero(dates < session_day)
+    if not len(before) or (strict and dates[before[-1]] != previous_trading_day(session_day)):
+        return None
+    i = before[-1]
+    return highs[i], lows[i], closes[i], closes[-1]
+
+class LevelIndex:
+    """
+    Immutable snapshot: per (method, level), signed distances
+    (price / level - 1, in %) sorted ascending with the matching symbol order.
+    `quoted_at` holds each price's monotonic quote time (NaN: previous close).
+    """
+
+    def __init__(self, symbols, prices, quoted_at, levels, built_at):
+        self.symbols = np.asarray(symbols)
+        self.prices = prices
+        self.quoted_at = quoted_at
+        self.levels = levels
+        self.built_at = built_at
+        self._sorted = {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for method, named in levels.items():
+                for name, values in named.items():
+                    distance = (prices / values - 1) * 100
+                    valid = np.flatnonzero(np.isfinite(distance))
+                    order = valid[np.argsort(distance[valid], kind="stable")]
+                    self._sorted[(method, name)] = (distance[order], order)
+
+    def near(self, method, level, within, limit):
+        distances, order = self._sorted[(method, level)]
+        lo = np.searchsorted(distances, -within, side="left")
+        hi = np.searchsorted(distances, within, side="right")
+        hits, gaps = order[lo:hi], distances[lo:hi]
+        closest = np.argsort(np.abs(gaps), kind="stable")[:limit]
+        values = self.levels[method][level]
+        now = time.monotonic()
+        return [
+            {
+                "symbol": str(self.symbols[hits[i]]),
+                "price": round(float(self.prices[hits[i]]), 2),
+                "live": bool(np.isfinite(self.quoted_at[hits[i]])),
+                "price_age_seconds": self.price_age(hits[i], now),
+                "level": round(float(values[hits[i]]), 2),
+                "distance_pct": round(float(gaps[i]), 3),
+            }
+            for i in closest
+        ], int(hi - lo)
+
+    def price_age(self, i, now):
+        quoted_at = self.quoted_at[i]
+        return round(float(now - quoted_at), 1) if np.isfinite(quoted_at) else None
+
+    def freshness(self):
+        """
+        How many prices are live quotes, and the oldest quote's age.
+        """
+        live = np.isfinite(self.quoted_at)
+        oldest = float(time.monotonic() - self.quoted_at[live].min()) if live.any() else None
+        return {
+            "live_prices": int(live.sum()),
+            "close_prices": int(len(live) - live.sum()),
+            "oldest_price_seconds": round(oldest, 1) if oldest is not None else None,
+        }
+
+class PivotScreener:
+    def __init__(self, universe_loader=load_universe, price_ttl=SCREENER_PRICE_TTL, slice_size=SCREENER_SLICE_SIZE):
+        self.universe_loader = universe_loader
+        self.price_ttl = price_ttl
+        self.slice_size = slice_size
+        self.session_day = None
+        self.symbols = []
+        self.levels = {}
+        self.prices = None
+        self.quoted_at = None     # monotonic quote time per symbol, NaN until quoted
+        self.tried_at = None      # last re-price attempt per symbol (rotation order)
+        self.index = None
+        self._lock = threading.Lock()
+
+    def _load_basis(self, symbols, session_day):
+        """
+        Previous-session bars from the store; symbols missing there (or stale)
+        come from one multi-ticker download.
+        """
+        basis = {}
+        for symbol in symbols:
+            bars = bar_store.load_array(symbol, "1d")
+            if bars is not None:
+                row = _basis_bar(bars["time"], bars["high"], bars["low"], bars["close"], session_day)
+                if row is not None:
+                    basis[symbol] = row
+
+        missing = [s for s in symbols if s not in basis]
+        if missing:
+            for symbol, df in get_batch_stock_data(missing, period="5d", interval="1d").items():
+                # Freshest data there is: take its last completed bar
+                row = _basis_bar(
+                    df.index.asi8, df["High"].to_numpy(), df["Low"].to_numpy(), df["Close"].to_numpy(),
+                    session_day, strict=False
+                )
+                if row is not None:
+                    basis[symbol] = row
+        return basis
+
+    def _rebuild_levels(self, session_day):
+        universe = self.universe_loader()
+        basis = self._load_basis(universe, session_day)
+        self.symbols = [s for s in universe if s in basis]
+        rows = np.array([basis[s] for s in self.symbols], dtype=float).reshape(-1, 4)
+        # Same classic formulas as get_pivot_points, plus the other families
+        self.levels = pivot_levels(rows[:, 0], rows[:, 1], rows[:, 2])
+        self.prices = rows[:, 3].copy()
+        self.quoted_at = np.full(len(self.symbols), np.nan)
+        self.tried_at = np.full(len(self.symbols), -np.inf)
+        self.session_day = session_day
+        print(f"📐 Screener levels for {session_day}: {len(self.symbols)}/{len(universe)} symbols")
+
+    def _refresh_prices(self):
+        """
+        Re-prices the `slice_size` symbols tried longest ago. Symbols a
+        throttled or timed-out download missed keep their previous price
+        and quote time.
+        """
+        if not is_market_open() or not self.symbols:
+            return
+        chosen = np.argsort(self.tried_at, kind="stable")[:self.slice_size]
+        self.tried_at[chosen] = time.monotonic()
+        frames = get_batch_stock_data(
+            [self.symbols[i] for i in chosen], period="1d", interval=SCREENER_PRICE_INTERVAL
+        )
+        now = time.monotonic()
+        for i in chosen:
+            df = frames.get(self.symbols[i])
+            if df is not None and not df.empty:
+                self.prices[i] = float(df["Close"].iat[-1])
+                self.quoted_at[i] = now
+
+    def is_stale(self):
+        index = self.index
+        return (index is None
+                or self.session_day != current_session_day()
+                or (is_market_open() and time.monotonic() - index.built_at > self.price_ttl))
+
+    def refresh(self, wait=True):
+        """
+        Recomputes levels on a new session day and re-indexes after pricing
+        the next slice of symbols. With wait=False, returns at once if another refresh is running, and
+        its Yahoo calls queue behind interactive traffic.
+        """
+        if not self._lock.acquire(blocking=wait):
+            return False
+        try:
+            if not self.is_stale():
+                return True
+            with yahoo.priority(yahoo.INTERACTIVE if wait else yahoo.BACKGROUND):
+                session_day = current_session_day()
+                if session_day != self.session_day:
+                    self._rebuild_levels(session_day)
+                self._refresh_prices()
+                self.index = LevelIndex(
+                    self.symbols, self.prices.copy(), self.quoted_at.copy(), self.levels, time.monotonic()
+                )
+            return True
+        finally:
+            self._lock.release()
+
+    def query(self, method, level, within, limit=50):
+        index = self.index
+        if index is None:
+            return {"error": "Screener index not built yet"}
+        if method not in index.levels or level not in index.levels[method]:
+            return {"error": f"Unknown level '{level}' for {method} pivots. "
+                             f"Use one of: {', '.join(sorted(index.levels.get(method, {})))}"}
+
+        matches, total = index.near(method, level, within, limit)
+        return {
+            "session_day": str(self.session_day),
+            "refreshed_seconds_ago": round(time.monotonic() - index.built_at, 1),
+            **index.freshness(),
+            "universe": len(index.symbols),
+            "method": method,
+            "near": level.upper(),
+            "within_pct": within,
+            "total": total,
+            "matches": matches,
+        }
+
+screener = PivotScreener()
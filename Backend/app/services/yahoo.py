@@ -0,0 +1,427 @@
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import pandas as pd
+import requests
+import yfinance as yf
+from app.services.cache import TTLCache, SingleFlight
+from app.services.executor import observe, run_blocking, stage_deadline
+from app.services.metrics import track_upstream
+
+# --- YAHOO SCHEDULER ---
+# Every Yahoo Finance request goes through one scheduler:
+#   - a token bucket shared by all callers (YAHOO_RATE/s, bursts of YAHOO_BURST);
+#     a request costs one token per ticker it fetches
+#   - weighted lanes: live quotes, interactive analysis and background work share
+#     the rate YAHOO_LANE_WEIGHTS to one another while all are busy, so no lane
+#     starves; an idle lane's share goes to the others
+#   - stages reserve their tokens on the event loop before taking a pool thread
+#     (run_metered), and give up at their own stage timeout
+#   - single-flight: identical in-flight requests share one call
+#   - a negative cache for symbols Yahoo has no data for
+#   - 429s pause all traffic with exponential backoff and halve the rate;
+#     successful calls restore it step by step
+LIVE, INTERACTIVE, BACKGROUND = 0, 1, 2
+LANE_NAMES = ("live", "interactive", "background")
+
+YAHOO_RATE = float(os.getenv("YAHOO_RATE", "4"))
+YAHOO_BURST = float(os.getenv("YAHOO_BURST", "8"))
+YAHOO_MIN_RATE = float(os.getenv("YAHOO_MIN_RATE", "0.5"))
+YAHOO_MAX_BACKOFF = float(os.getenv("YAHOO_MAX_BACKOFF", "120"))
+YAHOO_NEGATIVE_TTL = float(os.getenv("YAHOO_NEGATIVE_TTL", "900"))
+# Longest a request may queue, per lane, before failing fast
+YAHOO_MAX_WAIT = (
+    float(os.getenv("YAHOO_LIVE_MAX_WAIT", "5")),
+    float(os.getenv("YAHOO_INTERACTIVE_MAX_WAIT", "20")),
+    float(os.getenv("YAHOO_BACKGROUND_MAX_WAIT", "120")),
+)
+# Live, interactive and background share of the rate when every lane is queued
+YAHOO_LANE_WEIGHTS = tuple(float(w) for w in os.getenv("YAHOO_LANE_WEIGHTS", "6,3,1").split(","))
+# How often an event-loop reservation re-checks the queue
+RESERVE_POLL_SECONDS = 0.05
+# Empty answers right after a 429 may be throttling in disguise; don't
+# remember them as invalid tickers
+NEGATIVE_GRACE_SECONDS = 60
+
+class YahooThrottled(Exception):
+    pass
+
+# Lane for calls that don't pass one; carried into worker threads by run_blocking
+current_lane = ContextVar("yahoo_lane", default=INTERACTIVE)
+# Tokens a stage reserved before it started ([count], spent by acquire)
+current_prepaid = ContextVar("yahoo_prepaid", default=None)
+
+@contextmanager
+def priority(lane):
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+def _is_empty(result):
+    if result is None:
+        return True
+    empty = getattr(result, "empty", None)
+    return empty if isinstance(empty, bool) else not result
+
+class YahooScheduler:
+    """
+    Token bucket with start-time fair queuing across lanes: each lane keeps a
+    virtual clock advanced by cost / weight per grant, and the queued lane
+    with the earliest clock goes next. Within a lane requests are FIFO.
+    """
+
+    def __init__(self, rate=YAHOO_RATE, burst=YAHOO_BURST, min_rate=YAHOO_MIN_RATE,
+                 max_backoff=YAHOO_MAX_BACKOFF, max_wait=YAHOO_MAX_WAIT, weights=YAHOO_LANE_WEIGHTS,
+                 clock=time.monotonic):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.min_rate = min_rate
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+        self.weights = weights
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = self.clock()
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.last_throttled = float("-inf")
+        self.rate_limited = 0
+        self.calls = [0, 0, 0]
+        self.wait_seconds = [0.0, 0.0, 0.0]
+        self.rejected = [0, 0, 0]
+        self._lanes = (deque(), deque(), deque())    # tickets: (lane, cost, queued at, seq)
+        self._vtime = [0.0, 0.0, 0.0]
+        self._vclock = 0.0
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.flight = SingleFlight()
+        self.negative = TTLCache(
+            "yahoo_negative", maxsize=int(os.getenv("YAHOO_NEGATIVE_SIZE", "4096")), default_ttl=YAHOO_NEGATIVE_TTL
+        )
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # --- QUEUE (callers hold self._cond) ---
+    def _enqueue(self, lane, cost, now):
+        if not self._lanes[lane]:
+            # A lane back from idle doesn't get credit for the time it sat out
+            self._vtime[lane] = max(self._vtime[lane], self._vclock)
+        self._seq += 1
+        ticket = (lane, cost, now, self._seq)
+        self._lanes[lane].append(ticket)
+        return ticket
+
+    def _abandon(self, ticket):
+        lane = ticket[0]
+        self._lanes[lane].remove(ticket)
+        self.rejected[lane] += 1
+
+    def _try_grant(self, ticket, now):
+        """
+        None while another ticket is ahead; otherwise seconds until this one
+        can be served, where 0.0 means its tokens were just taken.
+        """
+        self._refill(now)
+        head = min((lane for lane in range(3) if self._lanes[lane]), key=lambda lane: (self._vtime[lane], lane))
+        if self._lanes[head][0] != ticket:
+            return None
+
+        lane, cost, queued_at, _ = ticket
+        needed = min(cost, self.burst)
+        ready_at = max(self.paused_until, now + max(0.0, needed - self.tokens) / self.rate)
+        if ready_at > now:
+            return ready_at - now
+
+        self._lanes[lane].popleft()
+        self.tokens -= cost
+        self._vclock = self._vtime[lane]
+        self._vtime[lane] += cost / self.weights[lane]
+        self.calls[lane] += 1
+        self.wait_seconds[lane] += now - queued_at
+        return 0.0
+
+    def acquire(self, lane, cost=1):
+        """
+        Blocks until this request's turn comes and `cost` tokens are available,
+        spending tokens the stage reserved first. Raises YahooThrottled past
+        the lane's max wait or the calling stage's deadline.
+        """
+        prepaid = current_prepaid.get()
+        with self._cond:
+            if prepaid:
+                spent = min(prepaid[0], cost)
+                prepaid[0] -= spent
+                cost -= spent
+            if cost <= 0:
+                return
+
+            started = self.clock()
+            deadline = started + self.max_wait[lane]
+            if stage_deadline.get() is not None:
+                deadline = min(deadline, stage_deadline.get())
+            ticket = self._enqueue(lane, cost, started)
+            try:
+                while True:
+                    now = self.clock()
+                    wait = self._try_grant(ticket, now)
+                    if wait == 0.0:
+                        return
+                    if now >= deadline or (wait is not None and now + wait > deadline):
+                        break
+                    self._cond.wait(deadline - now if wait is None else wait)
+
+                self._abandon(ticket)
+                raise YahooThrottled(f"Yahoo queue wait exceeded for the {LANE_NAMES[lane]} lane")
+            finally:
+                # The next head re-evaluates its wait
+                self._cond.notify_all()
+
+    async def reserve(self, lane, cost, timeout=None):
+        """
+        Waits on the event loop (not a pool thread) for `cost` tokens.
+        True once they are taken; False past `timeout` or the lane's max wait.
+        """
+        started = self.clock()
+        deadline = started + min(self.max_wait[lane], math.inf if timeout is None else timeout)
+        with self._cond:
+            ticket = self._enqueue(lane, cost, started)
+        granted = False
+        try:
+            while True:
+                with self._cond:
+                    now = self.clock()
+                    wait = self._try_grant(ticket, now)
+                    if wait == 0.0:
+                        granted = True
+                        self._cond.notify_all()
+                        return True
+                    if now >= deadline or (wait is not None and now + wait > deadline):
+                        return False
+                await asyncio.sleep(min(RESERVE_POLL_SECONDS if wait is None else wait,
+                                        RESERVE_POLL_SECONDS, deadline - now))
+        finally:
+            # Also reached when the waiting request is cancelled
+            if not granted:
+                with self._cond:
+                    self._abandon(ticket)
+                    self._cond.notify_all()
+
+    def refund(self, prepaid):
+        """
+        Returns a stage's unspent reserved tokens (cache hits, coalesced calls,
+        or a stage that timed out before reaching Yahoo).
+        """
+        with self._cond:
+            unspent, prepaid[0] = prepaid[0], 0
+            if unspent > 0:
+                self._refill(self.clock())
+                self.tokens = min(self.burst, self.tokens + unspent)
+                self._cond.notify_all()
+
+    def throttled(self, retry_after=None):
+        """
+        A 429 was seen: pause everyone and halve the sustained rate.
+        """
+        with self._cond:
+            self.rate_limited += 1
+            self.last_throttled = self.clock()
+            self.backoff = min(self.max_backoff, max(1.0, self.backoff * 2))
+            pause = retry_after or self.backoff * random.uniform(0.8, 1.2)
+            self.paused_until = max(self.paused_until, self.last_throttled + pause)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+        print(f"🐌 Yahoo rate limited: pausing {pause:.1f}s, rate now {self.rate:.2f}/s")
+
+    def _succeeded(self):
+        with self._cond:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+            self.backoff = self.backoff / 2 if self.backoff > 1 else 0.0
+
+    def call(self, key, fn, operation="request", lane=None, cost=1):
+        """
+        Runs fn() under the rate limit, sharing one execution per key.
+        An empty result while a 429 came back raises YahooThrottled (so
+        callers don't fall back to a second request or cache a false negative).
+        """
+        lane = current_lane.get() if lane is None else lane
+
+        def run():
+            self.acquire(lane, cost)
+            seen = self.rate_limited
+            with track_upstream("yahoo", operation):
+                result = fn()
+            if self.rate_limited != seen:
+                if _is_empty(result):
+                    raise YahooThrottled(f"Yahoo rate limited ({operation})")
+            else:
+                self._succeeded()
+            return result
+
+        return self.flight.do(key, run)
+
+    # --- NEGATIVE CACHE ---
+    def is_invalid(self, symbol):
+        return self.negative.get(symbol) is not None
+
+    def mark_invalid(self, symbol):
+        if self.clock() - self.last_throttled < NEGATIVE_GRACE_SECONDS:
+            return
+        print(f"🚫 No Yahoo data for {symbol}; skipping it for {YAHOO_NEGATIVE_TTL:.0f}s")
+        self.negative.set(symbol, True)
+
+    def stats(self):
+        with self._cond:
+            now = self.clock()
+            self._refill(now)
+            return {
+                "rate": round(self.rate, 3),
+                "base_rate": self.base_rate,
+                "tokens": round(self.tokens, 2),
+                "paused_for": round(max(0.0, self.paused_until - now), 2),
+                "queued": sum(len(queue) for queue in self._lanes),
+                "rate_limited": self.rate_limited,
+                "coalesced": self.flight.coalesced,
+                "negative_symbols": len(self.negative),
+                "lanes": {
+                    name: {
+                        "weight": self.weights[i],
+                        "queued": len(self._lanes[i]),
+                        "calls": self.calls[i],
+                        "rejected": self.rejected[i],
+                        "avg_wait_ms": round(self.wait_seconds[i] / self.calls[i] * 1000, 1) if self.calls[i] else 0.0,
+                    }
+                    for i, name in enumerate(LANE_NAMES)
+                },
+            }
+
+scheduler = YahooScheduler()
+
+# yfinance remembers each symbol's exchange timezone in a SQLite cache; keep
+# it in a writable directory that survives restarts instead of refetching
+# every timezone on each start
+YF_CACHE_DIR = os.getenv("YF_CACHE_DIR", os.path.join("data", "yfinance"))
+try:
+    os.makedirs(YF_CACHE_DIR, exist_ok=True)
+    yf.set_tz_cache_location(YF_CACHE_DIR)
+except OSError as e:
+    print(f"⚠️ yfinance cache dir {YF_CACHE_DIR} unavailable ({e}); using yfinance's default")
+
+# One HTTP session for every yfinance call (yfinance keeps it as its shared
+# session); its response hook is how 429s reach the scheduler.
+session = requests.Session()
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+def _on_response(response, *args, **kwargs):
+    if response.status_code == 429:
+        scheduler.throttled(_retry_after(response))
+
+session.hooks["response"].append(_on_response)
+
+# --- OPERATIONS ---
+def _window_key(window):
+    return tuple(sorted((k, str(v)) for k, v in window.items()))
+
+def history(symbol, interval, **window):
+    key = ("history", symbol, interval, _window_key(window))
+    return scheduler.call(
+        key, lambda: yf.Ticker(symbol, session=session).history(interval=interval, **window), "history"
+    )
+
+def _chunks(items, size):
+    """
+    Splits items into the fewest near-equal chunks of at most `size`.
+    """
+    count = math.ceil(len(items) / size)
+    step = len(items) / count
+    return [items[round(i * step):round((i + 1) * step)] for i in range(count)]
+
+def download(tickers, operation="download", **kwargs):
+    """
+    yf.download charged one token per ticker (yfinance fetches each one
+    separately). Lists longer than the burst go out in chunks, one token
+    acquire per chunk; if throttling stops a later chunk, the chunks already
+    fetched are returned.
+    """
+    if isinstance(tickers, str) or len(tickers) <= scheduler.burst:
+        symbols = tickers if isinstance(tickers, str) else tuple(tickers)
+        key = (operation, symbols, _window_key(kwargs))
+        cost = 1 if isinstance(tickers, str) else max(1, len(symbols))
+        return scheduler.call(key, lambda: yf.download(tickers, session=session, **kwargs), operation, cost=cost)
+
+    frames = []
+    for chunk in _chunks(list(tickers), int(scheduler.burst)):
+        try:
+            frame = download(chunk, operation, **kwargs)
+        except YahooThrottled:
+            if not frames:
+                raise
+            print(f"⚠️ Yahoo throttled {operation} after {len(frames)} chunks; returning partial data")
+            break
+        if frame is None or frame.empty:
+            continue
+        if not isinstance(frame.columns, pd.MultiIndex):
+            # yfinance flattens single-ticker results; restore the ticker level
+            frame = pd.concat({chunk[0]: frame}, axis=1)
+            if kwargs.get("group_by") != "ticker":
+                frame = frame.swaplevel(axis=1)
+        frames.append(frame)
+    return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+def quote(symbol):
+    """
+    Single-bar request whose close is the latest trade price.
+    """
+    return scheduler.call(
+        ("quote", symbol),
+        lambda: yf.Ticker(symbol, session=session).history(period="1d", interval="1d"),
+        "quote", lane=LIVE
+    )
+
+def news(symbol):
+    return scheduler.call(("news", symbol), lambda: yf.Ticker(symbol, session=session).news, "news")
+
+async def run_metered(func, *args, lane=None, tokens=1, timeout=None, default=None, stage=None, **kwargs):
+    """
+    executor.run_blocking for a stage that calls Yahoo. Its `tokens` are
+    reserved on the event loop first, so a stage queued behind the rate limit
+    holds no pool thread, and one that waits out its timeout spends nothing.
+    Tokens the stage didn't use are refunded.
+    """
+    lane = current_lane.get() if lane is None else lane
+    stage = stage or getattr(func, "__name__", "stage")
+    started = time.perf_counter()
+    if tokens and not await scheduler.reserve(lane, tokens, timeout):
+        observe(stage, started, "timeout")
+        print(f"⏱️ Stage '{stage}' gave up waiting for Yahoo tokens")
+        return default
+
+    prepaid = [tokens]
+    lane_token = current_lane.set(lane)
+    prepaid_token = current_prepaid.set(prepaid)
+    try:
+        if timeout is not None:
+            timeout = max(0.0, timeout - (time.perf_counter() - started))
+        return await run_blocking(func, *args, timeout=timeout, default=default, stage=stage, **kwargs)
+    finally:
+        current_prepaid.reset(prepaid_token)
+        current_lane.reset(lane_token)
+        scheduler.refund(prepaid)
+
+def get_stats():
+    return scheduler.stats()
@@ -0,0 +1,162 @@
+"""
+OHLCV and news fixtures for the offline benchmark.
+
+Synthetic fixtures are deterministic per symbol. Recorded fixtures are real
+Yahoo pulls saved once with:
+
+    python -m bench.fixtures record RELIANCE TCS INFY --out bench/fixtures
+
+and used with `python -m bench.run --fixtures bench/fixtures`. No recorded
+set ships with the repo (it needs live Yahoo access); without one, every
+symbol falls back to the synthetic generators.
+"""
+import argparse
+import json
+import os
+import threading
+import zlib
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+IST = "Asia/Kolkata"
+DAILY_SESSIONS = 260           # ~1y of NSE sessions
+INTRADAY_SESSIONS = 5
+MINUTES_PER_SESSION = 375      # 09:15 - 15:30
+
+# Market-wide stories show up under every ticker (exercises headline dedupe)
+MARKET_HEADLINES = [
+    "Sensex, Nifty end higher as banks rally",
+    "FIIs turn net sellers for third straight session",
+]
+TICKER_HEADLINES = [
+    "{name} shares rally after strong quarterly results",
+    "{name} profit falls short of estimates",
+    "{name} board to consider fundraising proposal",
+    "Brokerages raise target price on {name}",
+    "{name} faces regulatory probe over disclosures",
+]
+
+def _rng(symbol, salt=""):
+    return np.random.default_rng(zlib.crc32(f"{symbol}{salt}".encode()))
+
+def _ohlcv(rng, n, start_price, vol):
+    close = start_price * np.exp(np.cumsum(rng.normal(0, vol, n)))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    spread = np.abs(rng.normal(0, vol, n)) * close
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(10_000, 2_000_000, n).astype(float)
+    })
+
+def _session_days(count):
+    end = pd.Timestamp.now(tz=IST).normalize() - timedelta(days=1)
+    return pd.bdate_range(end=end.tz_localize(None), periods=count)
+
+def synthetic_frame(symbol, interval):
+    """
+    Daily (1d) or intraday (1m) bars on NSE session timestamps, IST-aware
+    like Ticker.history().
+    """
+    rng = _rng(symbol)
+    base = float(rng.uniform(100, 3000))
+
+    if interval == "1d":
+        df = _ohlcv(rng, DAILY_SESSIONS, base, 0.015)
+        df.index = _session_days(DAILY_SESSIONS).tz_localize(IST)
+    else:
+        days = _session_days(INTRADAY_SESSIONS)
+        minutes = pd.to_timedelta(np.arange(MINUTES_PER_SESSION), unit="min") + pd.Timedelta(hours=9, minutes=15)
+        index = pd.DatetimeIndex([day + m for day in days for m in minutes]).tz_localize(IST)
+        df = _ohlcv(_rng(symbol, interval), len(index), base, 0.0008)
+        df.index = index
+
+    df.index.name = "Datetime" if interval != "1d" else "Date"
+    return df
+
+def synthetic_headlines(symbol, limit=5):
+    name = symbol.split(".")[0].title()
+    picks = _rng(symbol, "news").permutation(len(TICKER_HEADLINES))[:max(limit - len(MARKET_HEADLINES), 0)]
+    return MARKET_HEADLINES + [TICKER_HEADLINES[i].format(name=name) for i in picks]
+
+class FixtureStore:
+    """
+    Frames and headlines per symbol: recorded files when present, otherwise
+    synthetic. Generated frames are memoized; callers get copies.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._frames = {}
+        self._news = None
+        self._lock = threading.Lock()
+
+    def _recorded_frame(self, symbol, interval):
+        if not self.directory:
+            return None
+        path = os.path.join(self.directory, f"{symbol}_{interval}.csv")
+        if not os.path.exists(path):
+            return None
+        df = pd.read_csv(path, index_col=0)
+        df.index = pd.to_datetime(df.index, utc=True).tz_convert(IST)
+        return df
+
+    def frame(self, symbol, interval, start=None):
+        key = (symbol, interval)
+        with self._lock:
+            df = self._frames.get(key)
+            if df is None:
+                df = self._recorded_frame(symbol, interval)
+                if df is None:
+                    df = synthetic_frame(symbol, interval)
+                self._frames[key] = df
+        if start is not None:
+            start = pd.Timestamp(start)
+            df = df[df.index >= (start.tz_localize(IST) if start.tzinfo is None else start)]
+        return df.copy()
+
+    def headlines(self, symbol, limit=5):
+        if self._news is None:
+            path = os.path.join(self.directory or "", "news.json")
+            self._news = {}
+            if self.directory and os.path.exists(path):
+                with open(path) as f:
+                    self._news = json.load(f)
+        return (self._news.get(symbol) or synthetic_headlines(symbol, limit))[:limit]
+
+# --- RECORDING ---
+def record(symbols, out):
+    """
+    Saves the daily/intraday pulls and headlines the analyze path makes.
+    """
+    import yfinance as yf
+    from app.services.marketData import validate_indian_ticker
+
+    os.makedirs(out, exist_ok=True)
+    news = {}
+    for raw in symbols:
+        symbol = validate_indian_ticker(raw)
+        stock = yf.Ticker(symbol)
+        for period, interval in (("1y", "1d"), ("5d", "1m")):
+            df = stock.history(period=period, interval=interval)
+            if not df.empty:
+                df[["Open", "High", "Low", "Close", "Volume"]].to_csv(os.path.join(out, f"{symbol}_{interval}.csv"))
+        news[symbol] = [
+            item.get("title") or item.get("content", {}).get("title")
+            for item in (stock.news or [])[:5]
+        ]
+        print(f"✅ Recorded {symbol}")
+
+    with open(os.path.join(out, "news.json"), "w") as f:
+        json.dump(news, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record benchmark fixtures from Yahoo Finance.")
+    parser.add_argument("command", choices=["record"])
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "fixtures"))
+    args = parser.parse_args()
+    record(args.symbols, args.out)
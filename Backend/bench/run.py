@@ -0,0 +1,394 @@
+"""
+Offline benchmark for /api/analyze, /api/chat and /ws/price.
+
+    cd Backend
+    python -m bench.run --concurrency 16 --requests 200 --output bench-results.json
+    python -m bench.run --scenarios analyze --baseline bench-results.json
+
+Yahoo Finance, the ML service and Groq are replaced by the stubs in
+bench/stubs.py (latencies below); the app itself runs unmodified under
+uvicorn on a local port, so numbers include HTTP and JSON costs. Pass
+--ml-url to use a real ml-service/server.py instead of the ML stub.
+
+Results are JSON: per scenario p50/p95/p99 latency, throughput, upstream
+call counts, cache hit ratios and a per-stage (run_blocking) breakdown.
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import numpy as np
+
+UNIVERSE = [
+    "RELIANCE", "TCS", "INFY", "HDFCBANK", "ICICIBANK", "SBIN", "ITC", "LT",
+    "BHARTIARTL", "KOTAKBANK", "AXISBANK", "HINDUNILVR", "ASIANPAINT", "MARUTI",
+    "TITAN", "SUNPHARMA", "WIPRO", "ULTRACEMCO", "NESTLEIND", "TATASTEEL",
+    "BAJFINANCE", "HCLTECH", "ONGC", "NTPC", "POWERGRID", "ADANIENT",
+    "JSWSTEEL", "COALINDIA", "TECHM", "DRREDDY"
+]
+
+CHAT_QUESTIONS = [
+    "Where is the nearest support?",
+    "Is this a good entry for a swing trade?",
+    "What does the sentiment say?",
+    "Where should I place a stop loss?",
+]
+
+# --- MEASUREMENT ---
+def summarize(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    data = np.asarray(samples_ms)
+    return {
+        "count": int(data.size),
+        "mean": round(float(data.mean()), 2),
+        "p50": round(float(np.percentile(data, 50)), 2),
+        "p95": round(float(np.percentile(data, 95)), 2),
+        "p99": round(float(np.percentile(data, 99)), 2),
+        "max": round(float(data.max()), 2)
+    }
+
+class StageRecorder:
+    """
+    run_blocking observer: wall time and outcome per stage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.samples = defaultdict(list)
+            self.outcomes = defaultdict(Counter)
+
+    def __call__(self, stage, seconds, outcome):
+        with self._lock:
+            self.samples[stage].append(seconds * 1000)
+            self.outcomes[stage][outcome] += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                stage: {**summarize(samples), "outcomes": dict(self.outcomes[stage])}
+                for stage, samples in sorted(self.samples.items())
+            }
+
+def _diff_counts(before, after):
+    return {k: after.get(k, 0) - before.get(k, 0) for k in sorted(after) if after.get(k, 0) != before.get(k, 0)}
+
+def _cache_delta(before, after):
+    out = {}
+    for name, stats in after.items():
+        hits = stats["hits"] - before[name]["hits"]
+        misses = stats["misses"] - before[name]["misses"]
+        lookups = hits + misses
+        out[name] = {"hits": hits, "misses": misses, "hit_ratio": round(hits / lookups, 4) if lookups else 0.0}
+    return out
+
+# --- LOCAL SERVER ---
+class LocalServer:
+    """
+    The real app under uvicorn on an ephemeral port, in a background thread.
+    """
+
+    def __init__(self, app):
+        import uvicorn
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [self.socket]}, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+# --- DRIVERS ---
+async def _drive(total, concurrency, request):
+    """
+    `concurrency` workers issue `total` requests; request(i) -> ok.
+    """
+    latencies, errors = [], 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < total:
+            start = time.perf_counter()
+            try:
+                ok = await request(i)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round((total - errors) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(latencies)
+    }
+
+async def run_analyze(client, symbols, args):
+    async def request(i):
+        response = await client.get(f"/api/analyze/{symbols[i % len(symbols)]}", params={"format": args.format})
+        return response.status_code == 200 and "error" not in response.json()
+    return await _drive(args.requests, args.concurrency, request)
+
+async def open_sessions(client, symbols, concurrency):
+    sessions = {}
+    gate = asyncio.Semaphore(concurrency)
+
+    async def open_one(symbol):
+        async with gate:
+            response = await client.get(f"/api/analyze/{symbol}")
+            sessions[symbol] = response.json().get("session_id")
+    await asyncio.gather(*(open_one(s) for s in symbols))
+    return [sid for sid in sessions.values() if sid]
+
+async def run_chat(client, session_ids, args):
+    async def request(i):
+        response = await client.post("/api/chat", json={
+            "session_id": session_ids[i % len(session_ids)],
+            "question": CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)]
+        })
+        body = response.json()
+        return response.status_code == 200 and "answer" in body and "error" not in body
+    return await _drive(args.requests, args.concurrency, request)
+
+async def run_ws(port, symbols, args):
+    """
+    `concurrency` sockets spread over the symbols for `ws_duration` seconds.
+    Latency is publish-to-receive lag of each price update.
+    """
+    import websockets
+
+    async def client(i):
+        symbol = symbols[i % len(symbols)]
+        start = time.perf_counter()
+        first, lags, received = None, [], 0
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws/price/{symbol}") as ws:
+            deadline = start + args.ws_duration
+            while (remaining := deadline - time.perf_counter()) > 0:
+                try:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), remaining))
+                except asyncio.TimeoutError:
+                    break
+                if first is None:
+                    first = (time.perf_counter() - start) * 1000
+                if "ts" in message:
+                    lags.append((time.time() - message["ts"]) * 1000)
+                received += 1
+        return first, lags, received
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client(i) for i in range(args.concurrency)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if not isinstance(r, Exception) and r[0] is not None]
+    messages = sum(r[2] for r in ok)
+    return {
+        "connections": args.concurrency,
+        "errors": len(results) - len(ok),
+        "duration_s": round(elapsed, 3),
+        "messages": messages,
+        "throughput_msgs": round(messages / elapsed, 2) if elapsed else 0.0,
+        "first_message_ms": summarize([r[0] for r in ok]),
+        "latency_ms": summarize([lag for r in ok for lag in r[1]])
+    }
+
+# --- ORCHESTRATION ---
+def _reset_caches():
+    from app.services.chat_sessions import session_store
+    from app.services.indicators import indicator_cache
+    from app.services.llm_engine import verdict_cache
+    from app.services.marketData import ohlcv_cache, session_pivot_cache
+    from app.services.news_agent import sentiment_cache
+    from app.services.yahoo import scheduler
+
+    for cache in (ohlcv_cache, session_pivot_cache, sentiment_cache, verdict_cache, indicator_cache, scheduler.negative):
+        cache.invalidate()
+    session_store._sessions.clear()
+
+async def run_scenarios(app, upstream, recorder, symbols, args):
+    import httpx
+
+    report = {}
+    with LocalServer(app) as server:
+        limits = httpx.Limits(max_connections=args.concurrency * 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}", timeout=120, limits=limits) as client:
+            for scenario in args.scenarios.split(","):
+                if not args.warm:
+                    _reset_caches()
+
+                session_ids = await open_sessions(client, symbols, args.concurrency) if scenario == "chat" else None
+
+                recorder.reset()
+                calls_before = upstream.snapshot()
+                caches_before = (await client.get("/api/cache/stats")).json()
+
+                if scenario == "analyze":
+                    result = await run_analyze(client, symbols, args)
+                elif scenario == "chat":
+                    result = await run_chat(client, session_ids, args)
+                elif scenario == "ws":
+                    result = await run_ws(server.port, symbols, args)
+                else:
+                    raise SystemExit(f"unknown scenario: {scenario}")
+
+                caches_after = (await client.get("/api/cache/stats")).json()
+                result["upstream_calls"] = _diff_counts(calls_before, upstream.snapshot())
+                result["caches"] = _cache_delta(caches_before, caches_after)
+                result["stages"] = recorder.summary()
+                report[scenario] = result
+    return report
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+# --- REPORTING ---
+def print_report(report, out):
+    for name, result in report["scenarios"].items():
+        latency = result["latency_ms"]
+        rate = result.get("throughput_rps", result.get("throughput_msgs"))
+        unit = "msg/s" if "throughput_msgs" in result else "req/s"
+        print(
+            f"{name:8} p50 {latency.get('p50', 0):9.1f}ms  p95 {latency.get('p95', 0):9.1f}ms  "
+            f"p99 {latency.get('p99', 0):9.1f}ms  {rate:8.1f} {unit}  errors {result['errors']}",
+            file=out
+        )
+        print(f"{'':8} upstream {result['upstream_calls']}", file=out)
+        for stage, stats in result["stages"].items():
+            print(f"{'':8} {stage:18} n={stats['count']:<5} p50 {stats.get('p50', 0):8.1f}ms  p95 {stats.get('p95', 0):8.1f}ms", file=out)
+
+def compare(report, baseline, threshold):
+    """
+    Regressions vs. a previous run: latency percentiles up or throughput down
+    by more than `threshold` percent.
+    """
+    regressions = []
+    for name, result in report["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        for pct in ("p50", "p95", "p99"):
+            before, after = old["latency_ms"].get(pct), result["latency_ms"].get(pct)
+            if before and after and (after - before) / before * 100 > threshold:
+                regressions.append(f"{name} latency {pct}: {before}ms -> {after}ms")
+        key = "throughput_msgs" if name == "ws" else "throughput_rps"
+        before, after = old.get(key), result.get(key)
+        if before and after is not None and (before - after) / before * 100 > threshold:
+            regressions.append(f"{name} throughput: {before} -> {after}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="analyze,chat,ws")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="requests per HTTP scenario")
+    parser.add_argument("--tickers", type=int, default=10, help="size of the ticker universe")
+    parser.add_argument("--format", default="rows", choices=["rows", "columnar"])
+    parser.add_argument("--fixtures", help="recorded fixtures directory (bench.fixtures record)")
+    parser.add_argument("--ml-url", help="real ML service instead of the stub")
+    parser.add_argument("--yf-latency", type=float, default=0.15)
+    parser.add_argument("--ml-latency", type=float, default=0.12)
+    parser.add_argument("--llm-latency", type=float, default=0.35, help="time to first token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.005)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+- fraction applied to every latency")
+    parser.add_argument("--ws-duration", type=float, default=5.0)
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="PRICE_POLL_INTERVAL for the run")
+    parser.add_argument("--warm", action="store_true", help="keep caches between scenarios")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own logging")
+    args = parser.parse_args()
+
+    # Must be set before the app modules read them
+    os.environ.setdefault("GROQ_API_KEY", "bench-stub")
+    os.environ.setdefault("OHLCV_STORE_DIR", "")
+    # A prefetch cycle landing mid-run would skew the cold/warm numbers
+    os.environ.setdefault("PREFETCH_ENABLED", "0")
+    os.environ["PRICE_POLL_INTERVAL"] = str(args.poll_interval)
+
+    from app.main import app
+    from app.services.executor import stage_observers
+    from bench import stubs
+    from bench.fixtures import FixtureStore
+
+    upstream = stubs.Upstream({
+        "yf": args.yf_latency,
+        "ml": args.ml_latency,
+        "llm_first_token": args.llm_latency,
+        "llm_token": args.llm_token_latency
+    }, jitter=args.jitter)
+    stubs.install(upstream, FixtureStore(args.fixtures), ml_url=args.ml_url)
+
+    recorder = StageRecorder()
+    stage_observers.append(recorder)
+    symbols = UNIVERSE[:max(1, min(args.tickers, len(UNIVERSE)))]
+
+    out = sys.stdout
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        scenarios = asyncio.run(run_scenarios(app, upstream, recorder, symbols, args))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "verbose")}
+        },
+        "scenarios": scenarios
+    }
+    print_report(report, out)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Wrote {args.output}", file=out)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"⚠️ Regression: {line}", file=out)
+        if not regressions:
+            print(f"✅ No regressions beyond {args.threshold}%", file=out)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
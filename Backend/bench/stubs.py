@@ -0,0 +1,203 @@
+"""
+Stand-ins for Yahoo Finance, the ML service and Groq with configurable
+latency. Every upstream call is counted so a run shows how much traffic
+the caches and batching actually saved.
+"""
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Iterator
+import pandas as pd
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class Upstream:
+    """
+    Latency model (base seconds +- jitter fraction) and call counters.
+    """
+
+    def __init__(self, latencies, jitter=0.2, seed=7):
+        self.latencies = latencies
+        self.jitter = jitter
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def hit(self, name, latency_key=None):
+        with self._lock:
+            self.calls[name] += 1
+            base = self.latencies.get(latency_key or name, 0.0)
+            delay = base * (1 + self._random.uniform(-self.jitter, self.jitter)) if base else 0.0
+        if delay:
+            time.sleep(delay)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.calls[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.calls)
+
+# --- YAHOO FINANCE ---
+class StubTicker:
+    def __init__(self, upstream, fixtures, symbol):
+        self._upstream = upstream
+        self._fixtures = fixtures
+        self.ticker = symbol
+
+    def history(self, period=None, interval="1d", start=None, **_):
+        self._upstream.hit("yf_history", "yf")
+        return self._fixtures.frame(self.ticker, interval, start)
+
+    @property
+    def news(self):
+        self._upstream.hit("yf_news", "yf")
+        return [{"title": title} for title in self._fixtures.headlines(self.ticker)]
+
+def stub_download(upstream, fixtures):
+    def download(tickers, period=None, interval="1d", start=None, group_by="column", **_):
+        upstream.hit("yf_download", "yf")
+        if isinstance(tickers, str):
+            return fixtures.frame(tickers, interval, start)
+        # One multi-ticker call: (ticker, field) columns like group_by='ticker'
+        return pd.concat({t: fixtures.frame(t, interval, start) for t in tickers}, axis=1)
+    return download
+
+# --- ML SERVICE ---
+def _stub_trend(closes):
+    if len(closes) < 60:
+        return {"signal": "INSUFFICIENT_DATA", "confidence": 0}
+    change = closes[-1] / closes[-10] - 1
+    confidence = round(min(50 + abs(change) * 1000, 95), 2)
+    return {"signal": "BULLISH" if change >= 0 else "BEARISH", "confidence": confidence}
+
+def _stub_score(headline):
+    text = headline.lower()
+    if any(word in text for word in ("rally", "raise", "higher", "strong")):
+        return {"label": "positive", "score": 0.91}
+    if any(word in text for word in ("falls", "probe", "sellers", "short")):
+        return {"label": "negative", "score": 0.88}
+    return {"label": "neutral", "score": 0.8}
+
+class StubResponse:
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+    def json(self):
+        return json.loads(self.text)
+
+def stub_ml_post(upstream):
+    """
+    Replacement for ml_client.session.post honouring the lambda_handler contract.
+    """
+    from app.services.news_agent import aggregate_sentiment
+
+    def post(url, json=None, timeout=None, **_):
+        payload = json or {}
+        upstream.hit("ml_post", "ml")
+        body = {}
+        if "closes" in payload:
+            body["trend"] = _stub_trend(payload["closes"])
+        if "batch" in payload:
+            body["trends"] = {t: _stub_trend(c) for t, c in payload["batch"].items()}
+        if "headlines" in payload:
+            upstream.count("ml_headlines_scored", len(payload["headlines"]))
+            scores = [_stub_score(h) for h in payload["headlines"]]
+            body["sentiment"] = aggregate_sentiment(scores) if scores else "Neutral"
+            if payload.get("scores"):
+                body["headline_scores"] = scores
+        return StubResponse(body)
+    return post
+
+def counting_post(upstream, post):
+    def wrapped(*args, **kwargs):
+        upstream.count("ml_post")
+        return post(*args, **kwargs)
+    return wrapped
+
+# --- LLM ---
+VERDICT_TEXT = (
+    "Verdict: WAIT. Price is trading between the pivot and R1 with a mixed trend "
+    "signal; wait for a close above R1 before adding exposure."
+)
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model with Groq-like timing: the upstream's llm_first_token latency
+    (queueing + prompt processing), then `per_token` seconds per word.
+    """
+
+    upstream: Any
+    per_token: float = 0.01
+    text: str = VERDICT_TEXT
+
+    @property
+    def _llm_type(self):
+        return "bench-stub"
+
+    def _words(self, messages):
+        # Vary the answer with the prompt so verdict caching is exercised honestly
+        digest = hashlib.sha1(str([m.content for m in messages]).encode()).hexdigest()[:8]
+        return (self.text + f" (ref {digest})").split(" ")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.upstream.hit("llm_invoke", "llm_first_token")
+        words = self._words(messages)
+        time.sleep(self.per_token * len(words))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(words)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        self.upstream.hit("llm_stream", "llm_first_token")
+        for i, word in enumerate(self._words(messages)):
+            if i:
+                time.sleep(self.per_token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+# --- LIVE PRICE ---
+def stub_latest_price(upstream, fixtures):
+    """
+    Ticking last price; `ts` lets the websocket driver measure delivery lag.
+    """
+    ticks = {}
+    counter = itertools.count()
+
+    def get_latest_price(symbol):
+        upstream.hit("yf_live_price", "yf")
+        base = ticks.setdefault(symbol, float(fixtures.frame(symbol, "1d")["Close"].iloc[-1]))
+        step = next(counter)
+        return {"symbol": symbol, "price": round(base * (1 + 0.0005 * (step % 7 - 3)), 2), "ts": time.time()}
+    return get_latest_price
+
+def install(upstream, fixtures, ml_url=None):
+    """
+    Patches the upstream clients in place. Call after importing app.main.
+    """
+    import yfinance
+    from app.services import llm_engine, ml_client, question_agent
+    from app.services.price_hub import price_hub
+
+    yfinance.Ticker = lambda symbol, *a, **k: StubTicker(upstream, fixtures, symbol)
+    yfinance.download = stub_download(upstream, fixtures)
+
+    if ml_url:
+        # A real ML server (ml-service/server.py); only count the traffic
+        ml_client.ML_SERVICE_URL = ml_url
+        ml_client.session.post = counting_post(upstream, ml_client.session.post)
+    else:
+        ml_client.ML_SERVICE_URL = "http://ml-stub.invalid"
+        ml_client.session.post = stub_ml_post(upstream)
+
+    llm = StubChatModel(upstream=upstream, per_token=upstream.latencies.get("llm_token", 0.01))
+    llm_engine.llm = llm
+    question_agent.llm = llm
+
+    price_hub.fetch_price = stub_latest_price(upstream, fixtures)
+    # The hub idles outside NSE hours; the benchmark ticks regardless of the clock
+    price_hub.market_open = lambda: True
@@ -0,0 +1,26 @@
+"""
+Backend unit tests (no network: Yahoo, the ML service and Groq are never called).
+
+    cd Backend && python -m pytest tests
+"""
+import os
+
+# Set before any app module is imported
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("PREFETCH_ENABLED", "0")
+
+import pytest
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import history as history_module
+from bench.fixtures import synthetic_frame
+
+@pytest.fixture
+def frames(monkeypatch):
+    frames = {"daily": synthetic_frame("TEST.NS", "1d"), "intraday": synthetic_frame("TEST.NS", "1m")}
+    monkeypatch.setattr(history_module, "fetch_history_frame", lambda symbol, kind: frames[kind])
+    monkeypatch.setattr(history_module, "history_fetch_cost", lambda symbol, kind: 0)
+    return frames
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def add_minute_bar(frames):
+    intraday = frames["intraday"]
+    bar = intraday.iloc[[-1]].copy()
+    bar.index = bar.index + pd.Timedelta(minutes=1)
+    frames["intraday"] = pd.concat([intraday, bar])
+
+def test_unchanged_chart_answers_304(frames, client):
+    first = client.get("/api/chart/TEST")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    again = client.get("/api/chart/TEST", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+def test_etag_match_is_weak_and_accepts_lists(frames, client):
+    etag = client.get("/api/chart/TEST").headers["etag"]
+    strong = etag.removeprefix("W/")
+    response = client.get("/api/chart/TEST", headers={"If-None-Match": f'"other", {strong}'})
+    assert response.status_code == 304
+
+def test_new_bar_changes_the_etag(frames, client):
+    etag = client.get("/api/chart/TEST").headers["etag"]
+    add_minute_bar(frames)
+    response = client.get("/api/chart/TEST", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_etag_depends_on_format_and_since(frames, client):
+    rows = client.get("/api/chart/TEST").json()
+    tags = {
+        client.get("/api/chart/TEST").headers["etag"],
+        client.get("/api/chart/TEST?format=columnar").headers["etag"],
+        client.get(f"/api/chart/TEST?since={rows['next_since']}").headers["etag"],
+    }
+    assert len(tags) == 3
+
+def test_since_sends_only_new_or_changed_bars(frames, client):
+    full = client.get("/api/chart/TEST?format=columnar").json()
+    since = full["next_since"]
+    assert len(full["chart_data"]["1D"]["time"]) > 300
+
+    delta = client.get(f"/api/chart/TEST?format=columnar&since={since}").json()
+    # The bar containing `since` may still change, so it is resent
+    assert delta["chart_data"]["1D"]["time"] == [since]
+
+    add_minute_bar(frames)
+    delta = client.get(f"/api/chart/TEST?format=columnar&since={since}").json()
+    assert delta["chart_data"]["1D"]["time"] == [since, since + 60]
+    assert delta["next_since"] == since + 60
+
+def test_invalid_since_is_rejected(frames, client):
+    response = client.get("/api/chart/TEST?since=yesterday-ish")
+    assert "error" in response.json()
@@ -0,0 +1,46 @@
+from datetime import date, datetime
+from app.services.market_calendar import (
+    IST, current_session_day, is_market_open, is_trading_day, next_session_open,
+    previous_trading_day, seconds_until_bar_close, seconds_until_next_open,
+)
+
+def ist(*args):
+    return datetime(*args, tzinfo=IST)
+
+def test_weekends_and_holidays_are_not_sessions():
+    assert is_trading_day(date(2026, 10, 16))          # Friday
+    assert not is_trading_day(date(2026, 10, 17))      # Saturday
+    assert not is_trading_day(date(2026, 10, 2))       # Gandhi Jayanti (Friday)
+
+def test_previous_trading_day_skips_weekends_and_holidays():
+    assert previous_trading_day(date(2026, 10, 19)) == date(2026, 10, 16)   # Monday -> Friday
+    assert previous_trading_day(date(2026, 10, 5)) == date(2026, 10, 1)     # skips Oct 2 holiday
+
+def test_session_boundaries():
+    assert not is_market_open(ist(2026, 10, 16, 9, 14, 59))
+    assert is_market_open(ist(2026, 10, 16, 9, 15))
+    assert is_market_open(ist(2026, 10, 16, 15, 29, 59))
+    assert not is_market_open(ist(2026, 10, 16, 15, 30))
+    assert not is_market_open(ist(2026, 10, 2, 11, 0))
+
+def test_current_session_day_flips_at_the_open():
+    assert current_session_day(ist(2026, 10, 16, 9, 14)) == date(2026, 10, 15)
+    assert current_session_day(ist(2026, 10, 16, 9, 15)) == date(2026, 10, 16)
+    assert current_session_day(ist(2026, 10, 18, 12, 0)) == date(2026, 10, 16)     # Sunday
+
+def test_naive_and_foreign_times_are_read_as_ist():
+    assert current_session_day(datetime(2026, 10, 16, 9, 15)) == date(2026, 10, 16)
+    utc_open = datetime.fromisoformat("2026-10-16T03:45:00+00:00")
+    assert is_market_open(utc_open)
+
+def test_next_open_over_a_weekend_and_holiday():
+    assert next_session_open(ist(2026, 10, 16, 16, 0)) == ist(2026, 10, 19, 9, 15)
+    assert next_session_open(ist(2026, 10, 1, 16, 0)) == ist(2026, 10, 5, 9, 15)
+    assert next_session_open(ist(2026, 10, 16, 8, 0)) == ist(2026, 10, 16, 9, 15)
+    assert seconds_until_next_open(ist(2026, 10, 16, 9, 0)) == 15 * 60
+
+def test_bar_close_is_session_aligned_and_capped_at_the_close():
+    assert seconds_until_bar_close(900, ist(2026, 10, 16, 9, 20)) == 10 * 60
+    assert seconds_until_bar_close(900, ist(2026, 10, 16, 15, 25)) == 5 * 60
+    # Closed: until the next open
+    assert seconds_until_bar_close(900, ist(2026, 10, 16, 9, 0)) == 15 * 60
@@ -0,0 +1,37 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.indicators import compute_indicators, session_basis_position
+from app.services.marketData import compute_pivots
+
+def daily_bars(last_day, sessions=30):
+    index = pd.bdate_range(end=last_day, periods=sessions).tz_localize("Asia/Kolkata")
+    close = 100 + np.cumsum(np.random.default_rng(3).standard_normal(sessions))
+    return pd.DataFrame(
+        {"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000.0}, index=index
+    )
+
+@pytest.mark.parametrize("last_day, expected", [
+    ("2026-10-16", -2),     # the session's own bar is published: basis is the one before
+    ("2026-10-15", -1),     # not yet published (pre-open, just after 09:15)
+])
+def test_basis_is_the_last_bar_before_the_session(last_day, expected):
+    df = daily_bars(last_day)
+    assert session_basis_position(df, date(2026, 10, 16)) == len(df) + expected
+
+def test_basis_missing_when_no_earlier_bar():
+    df = daily_bars("2026-10-16", sessions=1)
+    assert session_basis_position(df, date(2026, 10, 16)) is None
+
+@pytest.mark.parametrize("last_day", ["2026-10-15", "2026-10-16"])
+def test_indicator_pivots_match_support_resistance(last_day):
+    df = daily_bars(last_day)
+    session_day = date(2026, 10, 16)
+    pivots = compute_pivots(df, "TEST.NS", session_day)
+    classic = compute_indicators(df, None, session_day)["pivots"]["classic"]
+
+    assert classic["pivot"] == pivots["pivot_point"]
+    assert classic["r1"] == pivots["resistance"]["target_1"]
+    assert classic["s1"] == pivots["support"]["stop_1"]
+    assert pivots["current_price"] == round(float(df["Close"].iat[-1]), 2)
@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+import pandas as pd
+import pytest
+from app.services import yahoo
+from app.services.yahoo import BACKGROUND, INTERACTIVE, LIVE, YahooScheduler, YahooThrottled
+
+def make_scheduler(clock, **kwargs):
+    kwargs.setdefault("rate", 10.0)
+    kwargs.setdefault("burst", 1.0)
+    kwargs.setdefault("max_wait", (60.0, 60.0, 60.0))
+    return YahooScheduler(clock=clock, **kwargs)
+
+def grant_order(scheduler, clock, tickets):
+    """
+    Lanes in the order the scheduler serves `tickets`, advancing the clock
+    only as far as the head's next token.
+    """
+    order, pending = [], list(tickets)
+    while pending:
+        for ticket in pending:
+            with scheduler._cond:
+                wait = scheduler._try_grant(ticket, clock())
+            if wait == 0.0:
+                order.append(ticket[0])
+                pending.remove(ticket)
+                break
+            if wait is not None:
+                clock.advance(wait)
+                break
+    return order
+
+def enqueue(scheduler, clock, lanes):
+    with scheduler._cond:
+        return [scheduler._enqueue(lane, 1, clock()) for lane in lanes]
+
+# --- LANE FAIRNESS ---
+def test_busy_lanes_share_the_rate_by_weight(clock):
+    scheduler = make_scheduler(clock, weights=(6, 3, 1))
+    scheduler.tokens = 0
+    tickets = enqueue(scheduler, clock, [LIVE] * 60 + [INTERACTIVE] * 60 + [BACKGROUND] * 60)
+
+    first = grant_order(scheduler, clock, tickets)[:100]
+    assert [first.count(lane) for lane in (LIVE, INTERACTIVE, BACKGROUND)] == [60, 30, 10]
+
+def test_background_is_not_starved_by_live_polling(clock):
+    scheduler = make_scheduler(clock)
+    scheduler.tokens = 0
+    tickets = enqueue(scheduler, clock, [LIVE] * 50 + [BACKGROUND])
+
+    order = grant_order(scheduler, clock, tickets)
+    assert order.index(BACKGROUND) < 20
+
+def test_idle_lane_gets_no_credit_for_time_away(clock):
+    scheduler = make_scheduler(clock)
+    scheduler.tokens = 0
+    grant_order(scheduler, clock, enqueue(scheduler, clock, [LIVE] * 30))
+
+    # Interactive was idle meanwhile: it takes its share from now on
+    # instead of being served first for a backlog of credit
+    tickets = enqueue(scheduler, clock, [LIVE] * 20 + [INTERACTIVE] * 20)
+    order = grant_order(scheduler, clock, tickets)[:15]
+    assert abs(order.count(INTERACTIVE) - 5) <= 1
+
+def test_lane_is_fifo(clock):
+    scheduler = make_scheduler(clock)
+    tickets = enqueue(scheduler, clock, [INTERACTIVE] * 3)
+    with scheduler._cond:
+        assert scheduler._try_grant(tickets[1], clock()) is None
+        assert scheduler._try_grant(tickets[0], clock()) == 0.0
+
+# --- TOKEN ACCOUNTING ---
+def test_acquire_spends_cost_and_refills_at_rate(clock):
+    scheduler = make_scheduler(clock, rate=4.0, burst=8.0)
+    scheduler.acquire(INTERACTIVE, cost=5)
+    assert scheduler.tokens == pytest.approx(3.0)
+
+    clock.advance(0.5)
+    scheduler.acquire(INTERACTIVE, cost=5)
+    assert scheduler.tokens == pytest.approx(0.0)
+    assert scheduler.stats()["lanes"]["interactive"]["calls"] == 2
+
+def test_acquire_past_max_wait_raises_and_leaves_the_queue(clock):
+    scheduler = make_scheduler(clock, rate=0.1, max_wait=(1.0, 1.0, 1.0))
+    scheduler.tokens = 0
+    with pytest.raises(YahooThrottled):
+        scheduler.acquire(LIVE)
+    stats = scheduler.stats()
+    assert stats["queued"] == 0
+    assert stats["lanes"]["live"]["rejected"] == 1
+
+def test_prepaid_tokens_are_spent_before_queueing(clock):
+    scheduler = make_scheduler(clock, burst=4.0)
+    scheduler.tokens = 0
+    prepaid = [2]
+    token = yahoo.current_prepaid.set(prepaid)
+    try:
+        scheduler.acquire(INTERACTIVE)
+        scheduler.acquire(INTERACTIVE)
+    finally:
+        yahoo.current_prepaid.reset(token)
+    assert prepaid == [0]
+    assert scheduler.tokens == 0
+
+def test_refund_returns_unspent_tokens_up_to_burst(clock):
+    scheduler = make_scheduler(clock, burst=4.0)
+    scheduler.tokens = 1.0
+    prepaid = [2]
+    scheduler.refund(prepaid)
+    assert prepaid == [0]
+    assert scheduler.tokens == pytest.approx(3.0)
+
+    scheduler.refund([5])
+    assert scheduler.tokens == pytest.approx(4.0)
+
+def test_reserve_takes_tokens_without_a_thread():
+    scheduler = YahooScheduler(rate=100.0, burst=4.0)
+    assert asyncio.run(scheduler.reserve(INTERACTIVE, 3, timeout=1))
+    assert scheduler.tokens < 1.1
+    assert scheduler.stats()["queued"] == 0
+
+def test_reserve_gives_up_past_its_timeout():
+    scheduler = YahooScheduler(rate=0.1, burst=1.0)
+    scheduler.tokens = 0
+    assert not asyncio.run(scheduler.reserve(INTERACTIVE, 1, timeout=0.5))
+    assert scheduler.stats()["queued"] == 0
+
+@pytest.fixture
+def downloads(monkeypatch):
+    calls = []
+
+    def fake_download(tickers, session=None, **kwargs):
+        calls.append(list(tickers))
+        index = pd.date_range("2026-10-01", periods=2)
+        return pd.concat({t: pd.DataFrame({"Close": [1.0, 2.0]}, index=index) for t in tickers}, axis=1)
+
+    monkeypatch.setattr(yahoo.yf, "download", fake_download)
+    return calls
+
+def test_download_charges_a_token_per_ticker(monkeypatch, clock, downloads):
+    scheduler = make_scheduler(clock, burst=8.0)
+    monkeypatch.setattr(yahoo, "scheduler", scheduler)
+
+    yahoo.download([f"T{i}.NS" for i in range(6)], operation="batch_download", group_by="ticker")
+    assert scheduler.tokens == pytest.approx(2.0)
+
+def test_download_splits_lists_longer_than_the_burst(monkeypatch, downloads):
+    monkeypatch.setattr(yahoo, "scheduler", YahooScheduler(rate=1000.0, burst=8.0))
+
+    symbols = [f"S{i}.NS" for i in range(17)]
+    frame = yahoo.download(symbols, operation="batch_download", group_by="ticker")
+    assert [len(chunk) for chunk in downloads] == [6, 5, 6]
+    assert set(frame.columns.get_level_values(0)) == set(symbols)
+
+def test_download_returns_chunks_fetched_before_throttling(monkeypatch, clock, downloads):
+    monkeypatch.setattr(yahoo, "scheduler", make_scheduler(clock, rate=0.001, burst=8.0))
+
+    symbols = [f"S{i}.NS" for i in range(16)]
+    frame = yahoo.download(symbols, operation="batch_download", group_by="ticker")
+    assert len(downloads) == 1
+    assert set(frame.columns.get_level_values(0)) == set(symbols[:8])
+
+# --- 429 BACKOFF ---
+def test_429_pauses_halves_rate_and_doubles_backoff(clock):
+    scheduler = make_scheduler(clock, rate=4.0, burst=8.0)
+    scheduler.throttled(retry_after=5)
+    assert scheduler.rate == 2.0
+    assert scheduler.tokens <= 0
+    assert scheduler.paused_until == clock() + 5
+
+    first = scheduler.backoff
+    scheduler.throttled()
+    assert scheduler.backoff == 2 * first
+    assert scheduler.rate == 1.0
+
+def test_rate_never_drops_below_minimum(clock):
+    scheduler = make_scheduler(clock, rate=4.0, min_rate=0.5)
+    for _ in range(10):
+        scheduler.throttled(retry_after=1)
+    assert scheduler.rate == 0.5
+
+def test_successes_restore_rate_step_by_step(clock):
+    scheduler = make_scheduler(clock, rate=4.0)
+    scheduler.throttled(retry_after=1)
+    scheduler._succeeded()
+    assert 2.0 < scheduler.rate < 4.0
+    for _ in range(50):
+        scheduler._succeeded()
+    assert scheduler.rate == 4.0
+    assert scheduler.backoff == 0.0
+
+def test_paused_queue_waits_out_the_pause(clock):
+    scheduler = make_scheduler(clock, rate=10.0, burst=8.0)
+    scheduler.throttled(retry_after=3)
+    ticket = enqueue(scheduler, clock, [LIVE])[0]
+    with scheduler._cond:
+        assert scheduler._try_grant(ticket, clock()) == pytest.approx(3.0)
+
+def test_empty_answer_after_429_raises_and_is_not_marked_invalid(clock):
+    scheduler = make_scheduler(clock, burst=8.0)
+
+    def throttled_fetch():
+        scheduler.throttled(retry_after=0.01)
+        return pd.DataFrame()
+
+    with pytest.raises(YahooThrottled):
+        scheduler.call(("history", "X.NS"), throttled_fetch, "history")
+    scheduler.mark_invalid("X.NS")
+    assert not scheduler.is_invalid("X.NS")
+
+    clock.advance(yahoo.NEGATIVE_GRACE_SECONDS + 1)
+    scheduler.mark_invalid("X.NS")
+    assert scheduler.is_invalid("X.NS")
+
+def test_identical_calls_share_one_execution(clock):
+    scheduler = make_scheduler(clock, burst=8.0)
+    release = threading.Event()
+    runs = []
+
+    def fetch():
+        runs.append(1)
+        release.wait(2)
+        return "bars"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scheduler.call(("k",), fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while scheduler.flight.coalesced < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["bars"] * 5
+    assert len(runs) == 1
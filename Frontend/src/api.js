@@ -14,7 +14,16 @@ export const analyzeStock = async (ticker) => {
 
 export const askChatbot = async (ticker, question, contextData) => {
   try {
-    const response = await axios.post(`${VITE_API_URL}/api/chat`, {
+    // Prefer the server-side session opened by /api/analyze
+    if (contextData?.session_id) {
+      const response = await axios.post(`${API_URL}/api/chat`, {
+        session_id: contextData.session_id,
+        question
+      });
+      if (!response.data.error) return response.data.answer;
+    }
+
+    const response = await axios.post(`${API_URL}/api/chat`, {
       ticker,
       question,
       context_data: contextData
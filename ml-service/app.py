@@ -1,85 +1,251 @@
+import hashlib
+import itertools
 import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 import numpy as np
-import pandas as pd
-import tensorflow as tf
-import joblib
-from transformers import pipeline
-from sklearn.preprocessing import MinMaxScaler
 import os
+from features import FeatureStateCache, build_window_batch
+from runtimes import lstm_model, sentiment_model
 
-# --- 1. GLOBAL LOADING (Warm Start) ---
-print("⏳ Loading Models...")
+# --- 1. MODELS (loaded on first use, see runtimes.py) ---
+# A trend-only cold start never initializes FinBERT and vice versa.
+# ML_PRELOAD=lstm,sentiment restores eager loading for warm pools.
+PRELOAD = {"lstm": lstm_model, "sentiment": sentiment_model}
+for name in filter(None, (n.strip() for n in os.getenv("ML_PRELOAD", "").split(","))):
+    if name not in PRELOAD:
+        print(f"⚠️ Unknown ML_PRELOAD model '{name}' (expected one of: {', '.join(PRELOAD)}); skipping")
+        continue
+    PRELOAD[name].get()
 
-try:
-    lstm_model = tf.keras.models.load_model("lstm_model.h5")
-    print("✅ LSTM Model Loaded")
-except:
-    lstm_model = None
+# --- 2. LOGIC ---
+# Per-ticker rolling RSI state: a series that only gained a bar (or revised
+# the forming one) since the last request is updated in O(1)
+feature_states = FeatureStateCache(int(os.getenv("ML_FEATURE_STATES", "512")))
 
-try:
-    scaler = joblib.load("scaler.gz")
-    print("✅ Scaler Loaded")
-except:
-    scaler = None
+def _trend_from_prob(prob):
+    if prob > 0.5:
+        return {"signal": "BULLISH", "confidence": round(prob * 100, 2)}
+    else:
+        return {"signal": "BEARISH", "confidence": round((1 - prob) * 100, 2)}
 
-try:
-    sentiment_pipe = pipeline("text-classification", model="ProsusAI/finbert")
-    print("✅ FinBERT Loaded")
-except:
-    sentiment_pipe = None
+def _feature_windows(batch, state_keys):
+    """
+    Keys in `state_keys` reuse that ticker's rolling state; the rest are
+    built in one stateless pass.
+    """
+    stateless = {key: prices for key, prices in batch.items() if key not in state_keys}
+    windows = {}
+    if stateless:
+        try:
+            windows.update(build_window_batch(stateless))
+        except Exception:
+            windows.update({key: False for key in stateless})
 
-# --- 2. LOGIC ---
-def calculate_rsi(series, period=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+    for key, prices in batch.items():
+        if key in state_keys:
+            try:
+                windows[key] = feature_states.window_for(state_keys[key], prices)
+            except Exception:
+                windows[key] = False
+    return windows
+
+def predict_trends(batch, stateful=False, state_keys=None):
+    """
+    {key: closes} -> {key: trend}, with one model.predict over the
+    stacked (N, LOOKBACK, 2) tensor. With `stateful` every key is a real
+    ticker whose rolling feature state is kept between requests;
+    `state_keys` ({key: ticker}) does the same for a subset of keys.
+    """
+    model = lstm_model.get()
+    if model is None:
+        return {key: {"signal": "ERROR (Model Missing)", "confidence": 0} for key in batch}
+
+    results = {}
+    keys, windows = [], []
+    if stateful:
+        state_keys = {key: key for key in batch}
+    for key, window in _feature_windows(batch, state_keys or {}).items():
+        if window is False:
+            results[key] = {"signal": "ERROR", "confidence": 0}
+            continue
+        if window is None:
+            results[key] = {"signal": "INSUFFICIENT_DATA", "confidence": 0}
+            continue
+        keys.append(key)
+        windows.append(window)
+
+    if windows:
+        try:
+            X_input = np.stack(windows)
+            prediction = model(X_input)
+            for key, prob in zip(keys, prediction[:, 0]):
+                results[key] = _trend_from_prob(float(prob))
+        except Exception:
+            for key in keys:
+                results[key] = {"signal": "ERROR", "confidence": 0}
+
+    return {key: results[key] for key in batch}
 
 def predict_trend(historical_prices):
-    if lstm_model is None or scaler is None:
-        return {"signal": "ERROR (Model Missing)", "confidence": 0}
+    return predict_trends({"_": historical_prices})["_"]
 
-    try:
-        df = pd.DataFrame(historical_prices, columns=['Close'])
-        df['Return'] = df['Close'].pct_change()
-        df['RSI'] = calculate_rsi(df['Close'])
-        df.dropna(inplace=True)
-        
-        if len(df) < 60:
-            return {"signal": "INSUFFICIENT_DATA", "confidence": 0}
-            
-        data = df[['Return', 'RSI']].tail(60).values
-        
-        local_scaler = MinMaxScaler(feature_range=(-1, 1))
-        scaled_data = local_scaler.fit_transform(data)
-        X_input = np.array([scaled_data])
-        
-        prediction = lstm_model.predict(X_input, verbose=0)
-        prob = float(prediction[0][0])
-        
-        if prob > 0.5:
-            return {"signal": "BULLISH", "confidence": round(prob * 100, 2)}
-        else:
-            return {"signal": "BEARISH", "confidence": round((1 - prob) * 100, 2)}
-    except:
-        return {"signal": "ERROR", "confidence": 0}
+# --- 3. MICRO-BATCHING (long-lived process only) ---
+# Concurrent single-ticker requests arriving within ML_MICRO_BATCH_MS share one
+# predict call. Lambda serves one event per container, so it is off by default.
+MICRO_BATCH_MS = float(os.getenv("ML_MICRO_BATCH_MS", "0"))
+MICRO_BATCH_MAX = int(os.getenv("ML_MICRO_BATCH_MAX", "64"))
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads for up to `window_ms`
+    (or `max_size` items) and resolves them with one `batch_fn` call.
+    `batch_fn` maps {id: item} -> {id: result}.
+    """
+
+    def __init__(self, batch_fn, window_ms, max_size=MICRO_BATCH_MAX):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self._queue = queue.Queue()
+        self._ids = itertools.count()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((next(self._ids), item, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(pending) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.batch_fn({req_id: item for req_id, item, _ in pending})
+                for req_id, _, future in pending:
+                    future.set_result(results[req_id])
+            except Exception as e:
+                for _, _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+def _predict_submitted(items):
+    """
+    {request id: (ticker or None, closes)} -> {request id: trend}. Two
+    requests for one ticker stay separate entries sharing the ticker's state.
+    """
+    batch = {req_id: prices for req_id, (_, prices) in items.items()}
+    state_keys = {req_id: ticker for req_id, (ticker, _) in items.items() if ticker}
+    return predict_trends(batch, state_keys=state_keys)
 
-def analyze_news(headlines):
-    if sentiment_pipe is None or not headlines:
-        return "Neutral"
+trend_batcher = MicroBatcher(_predict_submitted, MICRO_BATCH_MS) if MICRO_BATCH_MS > 0 else None
+
+def predict_trend_shared(historical_prices, ticker=None):
+    """
+    Single-ticker prediction that joins an in-flight micro-batch when enabled.
+    With a ticker, the rolling feature state for it is used and updated.
+    """
+    if trend_batcher is None:
+        return _predict_submitted({0: (ticker, historical_prices)})[0]
+    return trend_batcher.submit((ticker, historical_prices)).result()
+
+# --- 4. HEADLINE CACHE ---
+# FinBERT labels keyed by a hash of the normalized headline. Most requests
+# repeat headlines scored moments ago, often for another ticker.
+HEADLINE_CACHE_SIZE = int(os.getenv("ML_HEADLINE_CACHE_SIZE", "4096"))
+HEADLINE_CACHE_TTL = float(os.getenv("ML_HEADLINE_CACHE_TTL", "21600"))
+
+def headline_key(headline):
+    normalized = " ".join(headline.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+class HeadlineCache:
+    """
+    Thread-safe LRU of {label, score} per headline with a fixed TTL.
+    """
+
+    def __init__(self, maxsize=HEADLINE_CACHE_SIZE, ttl=HEADLINE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._data.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+headline_cache = HeadlineCache()
+
+def score_headlines(headlines):
+    """
+    Per-headline FinBERT {label, score}; only unseen headlines reach the model
+    (and load it). None if the model is unavailable.
+    """
+    keys = [headline_key(h) for h in headlines]
+    scores = {key: headline_cache.get(key) for key in set(keys)}
+
+    unseen = {}
+    for key, headline in zip(keys, headlines):
+        if scores[key] is None and key not in unseen:
+            unseen[key] = headline
+
+    if unseen:
+        sentiment_pipe = sentiment_model.get()
+        if sentiment_pipe is None:
+            return None
+        results = sentiment_pipe(list(unseen.values()), truncation=True, max_length=512)
+        for key, res in zip(unseen, results):
+            scores[key] = {"label": res['label'], "score": round(float(res['score']), 4)}
+            headline_cache.set(key, scores[key])
+
+    return [scores[key] for key in keys]
+
+def aggregate_sentiment(scores):
+    score = 0
+    for i, res in enumerate(scores):
+        weight = 2 if i == 0 else 1
+        if res['label'] == 'positive': score += weight
+        elif res['label'] == 'negative': score -= weight
+    if score > 0: return "Positive 🟢"
+    elif score < 0: return "Negative 🔴"
+    else: return "Neutral ⚪"
+
+def analyze_news(headlines, with_scores=False):
+    if not headlines:
+        return ("Neutral", []) if with_scores else "Neutral"
     try:
-        results = sentiment_pipe(headlines, truncation=True, max_length=512)
-        score = 0
-        for i, res in enumerate(results):
-            weight = 2 if i == 0 else 1
-            if res['label'] == 'positive': score += weight
-            elif res['label'] == 'negative': score -= weight
-        if score > 0: return "Positive 🟢"
-        elif score < 0: return "Negative 🔴"
-        else: return "Neutral ⚪"
+        scores = score_headlines(headlines)
+        if scores is None:
+            return ("Neutral", []) if with_scores else "Neutral"
+        label = aggregate_sentiment(scores)
+        return (label, scores) if with_scores else label
     except:
-        return "Neutral"
+        return ("Neutral", []) if with_scores else "Neutral"
 
 def lambda_handler(event, context):
     try:
@@ -88,10 +254,21 @@ def lambda_handler(event, context):
         
         if 'closes' in body:
             prices = [float(x) for x in body['closes']]
-            response_data['trend'] = predict_trend(prices)
+            response_data['trend'] = predict_trend_shared(prices, body.get('ticker'))
+
+        if 'batch' in body:
+            response_data['trends'] = predict_trends({
+                ticker: [float(x) for x in closes]
+                for ticker, closes in body['batch'].items()
+            }, stateful=True)
             
         if 'headlines' in body:
-            response_data['sentiment'] = analyze_news(body['headlines'])
+            if body.get('scores'):
+                label, scores = analyze_news(body['headlines'], with_scores=True)
+                response_data['sentiment'] = label
+                response_data['headline_scores'] = scores
+            else:
+                response_data['sentiment'] = analyze_news(body['headlines'])
             
         return {
             'statusCode': 200,
@@ -99,4 +276,36 @@ def lambda_handler(event, context):
             'headers': {'Content-Type': 'application/json'}
         }
     except Exception as e:
-        return {'statusCode': 500, 'body': json.dumps({"error": str(e)})}
\ No newline at end of file
+        return {'statusCode': 500, 'body': json.dumps({"error": str(e)})}
+
+def handle_many(bodies):
+    """
+    Several requests in one call (HTTP server mode). Every single-ticker
+    trend request shares one predict call; the rest of each body goes
+    through lambda_handler. Returns one response per body, in order; a bad
+    body only fails its own response.
+    """
+    items = {}
+    for i, body in enumerate(bodies):
+        if isinstance(body, dict) and 'closes' in body:
+            try:
+                items[i] = (body.get('ticker'), [float(x) for x in body['closes']])
+            except (TypeError, ValueError):
+                pass    # lambda_handler reports it
+    try:
+        trends = _predict_submitted(items) if items else {}
+    except Exception:
+        trends = {}     # each body retries on its own below
+
+    responses = []
+    for i, body in enumerate(bodies):
+        try:
+            if i in trends:
+                body = {key: value for key, value in body.items() if key != 'closes'}
+            response = lambda_handler(body, None)
+            if i in trends and response['statusCode'] == 200:
+                response['body'] = json.dumps({'trend': trends[i], **json.loads(response['body'])})
+        except Exception as e:
+            response = {'statusCode': 500, 'body': json.dumps({"error": str(e)})}
+        responses.append(response)
+    return responses
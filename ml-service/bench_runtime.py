@@ -0,0 +1,186 @@
+"""
+Cold start, peak RSS and per-inference latency for each inference runtime.
+
+    python bench_runtime.py --tiny                  # small local models, every runtime
+    python bench_runtime.py --runtimes keras,onnx   # exported artifacts in --workdir
+
+Each (runtime, task) pair runs in a fresh interpreter, so cold start covers
+imports and model loading the way a new Lambda container pays for them.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name -> env overrides, relative to the work directory
+CONFIGS = {
+    "keras": {"ML_RUNTIME": "keras"},
+    "tflite": {"ML_RUNTIME": "tflite"},
+    "tflite-int8": {"ML_RUNTIME": "tflite", "ML_LSTM_PATH": "lstm_model.int8.tflite"},
+    "onnx": {"ML_RUNTIME": "onnx"},
+    "onnx-int8": {
+        "ML_RUNTIME": "onnx",
+        "ML_LSTM_PATH": "lstm_model.int8.onnx",
+        "ML_SENTIMENT_ONNX_DIR": "finbert-onnx-int8"
+    }
+}
+TASKS = ("trend", "news")
+HEAVY_MODULES = ("tensorflow", "tflite_runtime", "torch", "transformers", "onnxruntime")
+
+# --- CHILD: one cold process, one task ---
+def _closes(i, length=100):
+    rng = np.random.default_rng(i)
+    return (100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))).tolist()
+
+def _request(app, task, i):
+    if task == "trend":
+        return app.predict_trends({"_": _closes(i)})["_"]["signal"]
+    # Distinct headlines per call so the headline cache never answers
+    return app.analyze_news([
+        f"Shares rally after strong results #{i}",
+        f"Profit falls short of estimates #{i}",
+        f"Board meeting scheduled #{i}"
+    ])
+
+def _peak_rss_mb():
+    # VmHWM resets on exec; ru_maxrss would carry over the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_child(task, iterations):
+    sys.path.insert(0, HERE)
+    start = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    result = _request(app, task, 0)
+    first = time.perf_counter()
+
+    latencies = []
+    for i in range(1, iterations + 1):
+        t0 = time.perf_counter()
+        _request(app, task, i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    print(json.dumps({
+        "import_s": round(imported - start, 3),
+        "cold_start_s": round(first - start, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "modules": [m for m in HEAVY_MODULES if m in sys.modules],
+        "result": result
+    }))
+
+# --- TINY MODELS ---
+def build_tiny_models(workdir):
+    """
+    Untrained stand-ins with the serving models' interfaces, plus every
+    exported variant, so the harness runs without the production weights.
+    """
+    import tensorflow as tf
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+    from export_models import export_lstm, export_sentiment
+    from features import LOOKBACK
+
+    h5 = os.path.join(workdir, "lstm_model.h5")
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input((LOOKBACK, 2)),
+        tf.keras.layers.LSTM(32, return_sequences=True),
+        tf.keras.layers.LSTM(32),
+        tf.keras.layers.Dense(1, activation="sigmoid")
+    ])
+    model.save(h5)
+
+    export_lstm(h5, "tflite", os.path.join(workdir, "lstm_model.tflite"))
+    export_lstm(h5, "tflite", os.path.join(workdir, "lstm_model.int8.tflite"), int8=True)
+    export_lstm(h5, "onnx", os.path.join(workdir, "lstm_model.onnx"))
+    export_lstm(h5, "onnx", os.path.join(workdir, "lstm_model.int8.onnx"), int8=True)
+
+    words = "shares rally after strong results profit falls short of estimates board meeting scheduled".split()
+    vocab = os.path.join(workdir, "vocab.txt")
+    with open(vocab, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words + ["#", "##1", "##2"]))
+
+    tiny = os.path.join(workdir, "tiny-finbert")
+    labels = {0: "positive", 1: "negative", 2: "neutral"}
+    config = BertConfig(
+        vocab_size=len(words) + 8, hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=128, num_labels=3, id2label=labels, label2id={v: k for k, v in labels.items()}
+    )
+    BertForSequenceClassification(config).save_pretrained(tiny)
+    BertTokenizerFast(vocab_file=vocab).save_pretrained(tiny)
+
+    export_sentiment(tiny, os.path.join(workdir, "finbert-onnx"))
+    export_sentiment(tiny, os.path.join(workdir, "finbert-onnx-int8"), int8=True)
+    return {"ML_SENTIMENT_MODEL": tiny}
+
+# --- PARENT ---
+def bench(config, task, workdir, iterations, extra_env):
+    env = dict(os.environ, **extra_env, **CONFIGS[config])
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", task, "--iterations", str(iterations)],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1:]}
+    row = json.loads(proc.stdout.strip().splitlines()[-1])
+    row["process_s"] = round(elapsed, 3)
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runtimes", default=",".join(CONFIGS))
+    parser.add_argument("--tasks", default=",".join(TASKS))
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--workdir", default=HERE, help="directory holding the model artifacts")
+    parser.add_argument("--tiny", action="store_true", help="build small local models in a temp dir")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", choices=TASKS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args.iterations)
+
+    extra_env = {}
+    workdir = args.workdir
+    if args.tiny:
+        sys.path.insert(0, HERE)
+        workdir = tempfile.mkdtemp(prefix="ml-bench-")
+        print(f"⏳ Building tiny models in {workdir}")
+        extra_env = build_tiny_models(workdir)
+
+    results = {}
+    for config in args.runtimes.split(","):
+        for task in args.tasks.split(","):
+            row = bench(config, task, workdir, args.iterations, extra_env)
+            results[f"{config}/{task}"] = row
+            if "error" in row:
+                print(f"{config:12} {task:6} ❌ {row['error']}")
+                continue
+            print(
+                f"{config:12} {task:6} cold {row['cold_start_s']:7.3f}s  "
+                f"p50 {row['p50_ms']:8.3f}ms  p95 {row['p95_ms']:8.3f}ms  "
+                f"rss {row['peak_rss_mb']:7.1f}MB  [{', '.join(row['modules'])}]"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Converts the serving models to the lighter runtimes in runtimes.py.
+
+    python export_models.py lstm --format tflite --int8
+    python export_models.py lstm --format onnx
+    python export_models.py sentiment --int8
+
+Export needs the full toolchain (tensorflow, tf2onnx, torch, transformers,
+onnxruntime); the exported artifacts do not.
+"""
+import argparse
+import os
+import numpy as np
+from features import LOOKBACK, build_windows
+
+def calibration_windows(count=256, length=LOOKBACK + 40, seed=7):
+    """
+    Feature windows from synthetic random-walk closes, for int8 calibration.
+    """
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (count, length)), axis=1))
+    windows, ok = build_windows(closes)
+    return windows[ok].astype(np.float32)
+
+def _quantize_onnx(path):
+    # Dynamic int8: weights quantized offline, activations per batch at runtime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    fp32_path = path + ".fp32"
+    os.replace(path, fp32_path)
+    quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+def export_lstm(src="lstm_model.h5", fmt="tflite", out=None, int8=False):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(src)
+    out = out or os.path.splitext(src)[0] + "." + fmt
+
+    if fmt == "tflite":
+        # A static batch of 1 lets the converter fuse the LSTM into one builtin op
+        run = tf.function(lambda x: model(x))
+        concrete = run.get_concrete_function(tf.TensorSpec((1, LOOKBACK, 2), tf.float32))
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+        if int8:
+            # Float I/O is kept so callers need no quantization params
+            samples = calibration_windows()
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = lambda: ([w[None, ...]] for w in samples)
+        with open(out, "wb") as f:
+            f.write(converter.convert())
+
+    elif fmt == "onnx":
+        import tf2onnx
+        signature = [tf.TensorSpec((None, LOOKBACK, 2), tf.float32, name="windows")]
+        tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=out)
+        if int8:
+            _quantize_onnx(out)
+
+    else:
+        raise ValueError(f"unknown format: {fmt}")
+    return out
+
+def export_sentiment(model_id="ProsusAI/finbert", out="finbert-onnx", int8=False):
+    """
+    Writes model.onnx, tokenizer.json and config.json (labels) to `out`.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+    os.makedirs(out, exist_ok=True)
+
+    sample = tokenizer(["Shares rally after strong quarterly results"], return_tensors="pt")
+    # Positional inputs must follow forward()'s order, not the tokenizer's
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic["logits"] = {0: "batch"}
+
+    path = os.path.join(out, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), path,
+            input_names=names, output_names=["logits"],
+            dynamic_axes=dynamic, opset_version=14, dynamo=False
+        )
+    if int8:
+        _quantize_onnx(path)
+
+    tokenizer.backend_tokenizer.save(os.path.join(out, "tokenizer.json"))
+    model.config.save_pretrained(out)
+    return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", choices=["lstm", "sentiment"])
+    parser.add_argument("--src", help="lstm_model.h5 path or Hugging Face model id")
+    parser.add_argument("--format", default="tflite", choices=["tflite", "onnx"], help="LSTM target runtime")
+    parser.add_argument("--out", help="output file (lstm) or directory (sentiment)")
+    parser.add_argument("--int8", action="store_true", help="int8 weight quantization")
+    args = parser.parse_args()
+
+    if args.model == "lstm":
+        path = export_lstm(args.src or "lstm_model.h5", args.format, args.out, args.int8)
+    else:
+        path = export_sentiment(args.src or "ProsusAI/finbert", args.out or "finbert-onnx", args.int8)
+    print(f"✅ Exported {path}")
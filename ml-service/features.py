@@ -0,0 +1,272 @@
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+
+# --- TREND MODEL FEATURES (pure NumPy) ---
+# Same maths as the training notebook's pandas pipeline:
+#   Return = pct_change(Close), RSI = 100 - 100 / (1 + SMA14(gain) / SMA14(loss)),
+#   rows with any NaN dropped, last LOOKBACK rows min-max scaled to (-1, 1).
+# Every kernel works on 2-D (tickers, time) arrays.
+RSI_PERIOD = 14
+LOOKBACK = 60
+FEATURE_RANGE = (-1.0, 1.0)
+
+def pct_returns(closes):
+    closes = np.asarray(closes, dtype=float)
+    out = np.full_like(closes, np.nan)
+    out[:, 1:] = closes[:, 1:] / closes[:, :-1] - 1
+    return out
+
+def rolling_rsi(closes, period=RSI_PERIOD):
+    closes = np.asarray(closes, dtype=float)
+    delta = np.diff(closes, axis=1)
+    # pandas' where(delta > 0, 0) turns the leading NaN diff into a 0 gain/loss
+    gains = np.zeros_like(closes)
+    losses = np.zeros_like(closes)
+    gains[:, 1:] = np.where(delta > 0, delta, 0.0)
+    losses[:, 1:] = np.where(delta < 0, -delta, 0.0)
+
+    rsi = np.full_like(closes, np.nan)
+    if closes.shape[1] < period:
+        return rsi
+
+    windows = np.lib.stride_tricks.sliding_window_view
+    avg_gain = windows(gains, period, axis=1).mean(axis=-1)
+    avg_loss = windows(losses, period, axis=1).mean(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi[:, period - 1:] = 100 - (100 / (1 + avg_gain / avg_loss))
+    return rsi
+
+def minmax_scale(windows, feature_range=FEATURE_RANGE):
+    """
+    Per-window, per-feature min-max scaling of a (N, T, F) array
+    (MinMaxScaler.fit_transform applied to each window independently).
+    """
+    lo, hi = feature_range
+    data_min = windows.min(axis=1, keepdims=True)
+    data_range = windows.max(axis=1, keepdims=True) - data_min
+    data_range[data_range == 0.0] = 1.0
+    scale = (hi - lo) / data_range
+    return windows * scale + (lo - data_min * scale)
+
+def feature_rows(closes, period=RSI_PERIOD):
+    """
+    (N, T) closes -> (N, T, 2) [Return, RSI]; rows with NaN are not usable.
+    """
+    return np.stack([pct_returns(closes), rolling_rsi(closes, period)], axis=-1)
+
+def build_windows(closes, lookback=LOOKBACK, period=RSI_PERIOD):
+    """
+    Scaled (N, lookback, 2) windows for equal-length series.
+    Returns (windows, ok) where ok[i] is False if series i is too short.
+    """
+    rows = feature_rows(closes, period)
+    valid = ~np.isnan(rows).any(axis=-1)
+    n, t = valid.shape
+    windows = np.zeros((n, lookback, 2))
+    ok = np.zeros(n, dtype=bool)
+
+    # Fast path: nothing dropped after the RSI warm-up
+    if t >= lookback and valid[:, -lookback:].all():
+        return minmax_scale(rows[:, -lookback:]), np.ones(n, dtype=bool)
+
+    for i in range(n):
+        usable = np.flatnonzero(valid[i])
+        if len(usable) >= lookback:
+            windows[i] = rows[i, usable[-lookback:]]
+            ok[i] = True
+    windows[ok] = minmax_scale(windows[ok]) if ok.any() else windows[ok]
+    return windows, ok
+
+def build_window_batch(series, lookback=LOOKBACK, period=RSI_PERIOD):
+    """
+    Ragged {key: closes} -> {key: (lookback, 2) window or None}.
+    Series are grouped by length so each group is one vectorized pass.
+    """
+    groups = {}
+    for key, closes in series.items():
+        groups.setdefault(len(closes), []).append(key)
+
+    out = {}
+    for length, keys in groups.items():
+        if length < 2:
+            out.update({key: None for key in keys})
+            continue
+        windows, ok = build_windows(np.array([series[k] for k in keys], dtype=float), lookback, period)
+        for key, window, good in zip(keys, windows, ok):
+            out[key] = window if good else None
+    return out
+
+# --- INCREMENTAL MODE ---
+class RollingFeatures:
+    """
+    Per-ticker rolling gain/loss state. Appending a close updates Return and
+    RSI in O(1); amend() replaces the latest close (a still-forming bar).
+    """
+
+    def __init__(self, period=RSI_PERIOD, lookback=LOOKBACK):
+        self.period = period
+        self.lookback = lookback
+        self.gains = deque(maxlen=period)
+        self.losses = deque(maxlen=period)
+        self.sum_gain = 0.0
+        self.sum_loss = 0.0
+        self.rows = deque(maxlen=lookback)
+        self.closes = deque(maxlen=period + 2)
+        self._undo = None
+        self._pushes = 0
+
+    @classmethod
+    def from_closes(cls, closes, period=RSI_PERIOD, lookback=LOOKBACK):
+        closes = np.asarray(closes, dtype=float)
+        # Bulk-load all but the last close so that one stays amendable
+        state = cls._from_array(closes[:-1], period, lookback)
+        if len(closes):
+            state.push(closes[-1])
+        return state
+
+    @classmethod
+    def _from_array(cls, closes, period, lookback):
+        state = cls(period, lookback)
+        if len(closes) == 0:
+            return state
+
+        rows = feature_rows(closes[None, :], period)[0]
+        valid = ~np.isnan(rows).any(axis=-1)
+        state.rows.extend(map(tuple, rows[valid][-lookback:]))
+
+        gains = np.zeros(len(closes))
+        losses = np.zeros(len(closes))
+        delta = np.diff(closes)
+        gains[1:] = np.where(delta > 0, delta, 0.0)
+        losses[1:] = np.where(delta < 0, -delta, 0.0)
+        state.gains.extend(gains[-period:].tolist())
+        state.losses.extend(losses[-period:].tolist())
+        state.sum_gain = float(sum(state.gains))
+        state.sum_loss = float(sum(state.losses))
+        state.closes.extend(closes[-(period + 2):].tolist())
+        return state
+
+    def push(self, close):
+        close = float(close)
+        prev = self.closes[-1] if self.closes else None
+        delta = 0.0 if prev is None else close - prev
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+
+        evicted = None
+        if len(self.gains) == self.period:
+            evicted = (self.gains[0], self.losses[0])
+            self.sum_gain -= evicted[0]
+            self.sum_loss -= evicted[1]
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self.sum_gain += gain
+        self.sum_loss += loss
+
+        # Re-sum now and then so the running totals can't drift
+        self._pushes += 1
+        if self._pushes % self.period == 0:
+            self.sum_gain = float(sum(self.gains))
+            self.sum_loss = float(sum(self.losses))
+
+        row = None
+        if prev is not None and len(self.gains) == self.period:
+            ret = close / prev - 1
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rs = np.float64(self.sum_gain / self.period) / np.float64(self.sum_loss / self.period)
+                rsi = float(100 - (100 / (1 + rs)))
+            if not (np.isnan(ret) or np.isnan(rsi)):
+                row = (ret, rsi)
+
+        dropped_row = None
+        if row is not None:
+            if len(self.rows) == self.lookback:
+                dropped_row = self.rows[0]
+            self.rows.append(row)
+
+        dropped_close = self.closes[0] if len(self.closes) == self.closes.maxlen else None
+        self.closes.append(close)
+        self._undo = (gain, loss, evicted, row is not None, dropped_row, dropped_close)
+
+    def amend(self, close):
+        """
+        Replaces the most recent close.
+        """
+        if self._undo is None:
+            raise ValueError("nothing to amend")
+
+        gain, loss, evicted, appended_row, dropped_row, dropped_close = self._undo
+        self.gains.pop()
+        self.losses.pop()
+        self.sum_gain -= gain
+        self.sum_loss -= loss
+        if evicted is not None:
+            self.gains.appendleft(evicted[0])
+            self.losses.appendleft(evicted[1])
+            self.sum_gain += evicted[0]
+            self.sum_loss += evicted[1]
+        if appended_row:
+            self.rows.pop()
+            if dropped_row is not None:
+                self.rows.appendleft(dropped_row)
+        self.closes.pop()
+        if dropped_close is not None:
+            self.closes.appendleft(dropped_close)
+        self.push(close)
+
+    def sync(self, closes, max_new=5):
+        """
+        Brings the state in line with a full close series. Returns True when
+        it could be done incrementally (the series only appended up to
+        `max_new` closes and/or revised the last one), False if rebuilt.
+        """
+        tail = list(self.closes)
+        m = len(tail)
+        n = len(closes)
+        if m >= 2 and n >= m:
+            for k in range(max_new + 1):
+                end = n - k
+                if end < m:
+                    break
+                if list(closes[end - m:end - 1]) != tail[:-1]:
+                    continue
+                if closes[end - 1] != tail[-1]:
+                    self.amend(closes[end - 1])
+                for close in closes[end:]:
+                    self.push(close)
+                return True
+
+        fresh = RollingFeatures.from_closes(closes, self.period, self.lookback)
+        self.__dict__.update(fresh.__dict__)
+        return False
+
+    def window(self):
+        if len(self.rows) < self.lookback:
+            return None
+        return minmax_scale(np.array(self.rows)[None, :, :])[0]
+
+class FeatureStateCache:
+    """
+    Bounded, thread-safe LRU of RollingFeatures per ticker.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def window_for(self, ticker, closes):
+        with self._lock:
+            return self._window_for(ticker, closes)
+
+    def _window_for(self, ticker, closes):
+        state = self._states.get(ticker)
+        if state is None:
+            state = RollingFeatures.from_closes(closes)
+            self._states[ticker] = state
+            while len(self._states) > self.maxsize:
+                self._states.popitem(last=False)
+        else:
+            state.sync(closes)
+            self._states.move_to_end(ticker)
+        return state.window()
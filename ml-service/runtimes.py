@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# --- INFERENCE RUNTIMES ---
+# Models load on first use: a trend-only cold start never imports
+# transformers/torch and a sentiment-only one never imports TensorFlow.
+# ML_RUNTIME picks the backend (export_models.py produces the artifacts):
+#   keras  - lstm_model.h5 on TensorFlow, FinBERT on the transformers pipeline
+#   tflite - lstm_model.tflite on tflite-runtime (or tf.lite), FinBERT as keras
+#   onnx   - lstm_model.onnx and finbert-onnx/ on onnxruntime + tokenizers
+ML_RUNTIME = os.getenv("ML_RUNTIME", "keras")
+LSTM_RUNTIME = os.getenv("ML_LSTM_RUNTIME", ML_RUNTIME)
+SENTIMENT_RUNTIME = os.getenv("ML_SENTIMENT_RUNTIME", "onnx" if ML_RUNTIME == "onnx" else "transformers")
+
+LSTM_PATHS = {"keras": "lstm_model.h5", "tflite": "lstm_model.tflite", "onnx": "lstm_model.onnx"}
+LSTM_PATH = os.getenv("ML_LSTM_PATH", LSTM_PATHS.get(LSTM_RUNTIME, "lstm_model.h5"))
+SENTIMENT_MODEL = os.getenv("ML_SENTIMENT_MODEL", "ProsusAI/finbert")
+SENTIMENT_ONNX_DIR = os.getenv("ML_SENTIMENT_ONNX_DIR", "finbert-onnx")
+SENTIMENT_MAX_LENGTH = 512
+
+class LazyModel:
+    """
+    Loads a model on first get(), once even under concurrent first requests.
+    A failed load is remembered as None, like the old eager loader.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.load_seconds = None
+        self._model = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._model
+
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    self._model = self.loader()
+                    print(f"✅ {self.name} Loaded in {time.perf_counter() - start:.2f}s")
+                except Exception as e:
+                    print(f"⚠️ {self.name} unavailable: {e}")
+                    self._model = None
+                self.load_seconds = time.perf_counter() - start
+                self._loaded = True
+        return self._model
+
+# --- TREND MODEL ---
+# Every backend is a callable: float (N, LOOKBACK, 2) windows -> (N, 1) probabilities.
+def _keras_lstm(path):
+    import tensorflow as tf
+    model = tf.keras.models.load_model(path)
+    return lambda X: model.predict(X, verbose=0, batch_size=len(X))
+
+class TFLiteLSTM:
+    """
+    TFLite interpreter at the exported batch size of 1 (the fused LSTM op's
+    state is sized for it), invoked once per window. Interpreters are not
+    thread-safe, so calls are serialized.
+    """
+
+    def __init__(self, path):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=path)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._lock = threading.Lock()
+
+    def _quantize(self, X):
+        # Full-integer models take int8 input; float models pass straight through
+        scale, zero_point = self.input["quantization"]
+        if self.input["dtype"] == np.float32 or not scale:
+            return X.astype(np.float32)
+        return np.clip(np.round(X / scale + zero_point), -128, 127).astype(self.input["dtype"])
+
+    def _dequantize(self, y):
+        scale, zero_point = self.output["quantization"]
+        if self.output["dtype"] == np.float32 or not scale:
+            return y
+        return (y.astype(np.float32) - zero_point) * scale
+
+    def __call__(self, X):
+        X = self._quantize(X)
+        out = []
+        with self._lock:
+            for window in X:
+                self.interpreter.set_tensor(self.input["index"], window[None, ...])
+                self.interpreter.invoke()
+                out.append(self._dequantize(self.interpreter.get_tensor(self.output["index"]))[0])
+        return np.stack(out)
+
+def _onnx_session(path):
+    import onnxruntime as ort
+    return ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+
+def _onnx_lstm(path):
+    session = _onnx_session(path)
+    name = session.get_inputs()[0].name
+    return lambda X: session.run(None, {name: X.astype(np.float32)})[0]
+
+LSTM_LOADERS = {"keras": _keras_lstm, "tflite": TFLiteLSTM, "onnx": _onnx_lstm}
+
+def load_lstm(runtime=LSTM_RUNTIME, path=LSTM_PATH):
+    return LSTM_LOADERS[runtime](path)
+
+# --- SENTIMENT MODEL ---
+# Same contract as the transformers pipeline: texts -> [{label, score}].
+def _transformers_sentiment(model):
+    # FinBERT runs on torch; keep transformers from importing TensorFlow too
+    os.environ.setdefault("USE_TF", "0")
+    from transformers import pipeline
+    return pipeline("text-classification", model=model)
+
+class OnnxSentiment:
+    """
+    Exported sequence classifier on onnxruntime with a `tokenizers` fast
+    tokenizer; no torch or transformers at runtime.
+    """
+
+    def __init__(self, model_dir, max_length=SENTIMENT_MAX_LENGTH):
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+        with open(os.path.join(model_dir, "config.json")) as f:
+            id2label = json.load(f)["id2label"]
+        self.labels = [id2label[str(i)] for i in range(len(id2label))]
+
+        self.session = _onnx_session(os.path.join(model_dir, "model.onnx"))
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, texts, **_):
+        encodings = self.tokenizer.encode_batch(list(texts))
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        logits = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        best = probs.argmax(axis=1)
+        return [{"label": self.labels[i], "score": float(p[i])} for i, p in zip(best, probs)]
+
+def load_sentiment(runtime=SENTIMENT_RUNTIME):
+    if runtime == "onnx":
+        return OnnxSentiment(SENTIMENT_ONNX_DIR)
+    return _transformers_sentiment(SENTIMENT_MODEL)
+
+lstm_model = LazyModel(f"LSTM Model ({LSTM_RUNTIME})", load_lstm)
+sentiment_model = LazyModel(f"FinBERT ({SENTIMENT_RUNTIME})", load_sentiment)
@@ -0,0 +1,264 @@
+"""
+Long-running HTTP mode for the ML service (the Lambda entry point stays
+app.lambda_handler). Same JSON contract as the API Gateway endpoint, so it
+works as ML_SERVICE_URL for local runs and our own containers:
+
+    POST /         {"closes": [...], "ticker": ..., "headlines": [...]} -> lambda_handler
+    GET  /health   liveness and pool stats
+    GET  /ready    200 once every worker has loaded and warmed its models
+
+Requests run in a pool of model-holding worker processes. The front process
+hands a worker everything that queued up while it was busy as one job, so
+concurrent trend requests share one predict call. At most
+ML_SERVER_WORKERS + ML_SERVER_QUEUE requests are admitted at once (a
+timed-out request holds its slot until its job finishes, or until
+ML_SERVER_JOB_TIMEOUT writes the job off); the rest get 429 with Retry-After.
+"""
+import json
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HOST = os.getenv("ML_SERVER_HOST", "0.0.0.0")
+PORT = int(os.getenv("ML_SERVER_PORT", "8080"))
+# Each worker holds its own copy of the models, so size this by memory too
+WORKERS = int(os.getenv("ML_SERVER_WORKERS", "2"))
+QUEUE_SIZE = int(os.getenv("ML_SERVER_QUEUE", "32"))
+REQUEST_TIMEOUT = float(os.getenv("ML_SERVER_TIMEOUT", "30"))
+MAX_BODY_BYTES = int(os.getenv("ML_SERVER_MAX_BODY", str(1 << 20)))
+WARMUP_MODELS = os.getenv("ML_SERVER_WARMUP", "lstm,sentiment")
+# How long a batch waits for company once a worker is free, and its size cap
+BATCH_WINDOW_MS = float(os.getenv("ML_SERVER_BATCH_MS", "5"))
+BATCH_MAX = int(os.getenv("ML_SERVER_BATCH_MAX", "64"))
+# A job still unanswered after this is written off (its worker died or hung):
+# its requests fail and their worker and admission slots are freed
+JOB_TIMEOUT = float(os.getenv("ML_SERVER_JOB_TIMEOUT", str(REQUEST_TIMEOUT * 2)))
+
+# --- WORKER PROCESS ---
+def _warm_worker(ready, warmup):
+    """
+    Pool initializer: loads the models and runs one inference on each, so
+    first-call graph building happens before the worker is marked ready.
+    """
+    import numpy as np
+    import app
+    from features import LOOKBACK
+
+    if "lstm" in warmup:
+        closes = (100 + np.cumsum(np.random.default_rng(0).standard_normal(LOOKBACK + 20))).tolist()
+        app.predict_trends({"_warmup": closes})
+    if "sentiment" in warmup:
+        # Straight to the model: warmup text must not land in the headline cache
+        pipe = app.sentiment_model.get()
+        if pipe is not None:
+            pipe(["Markets open steady"], truncation=True, max_length=512)
+
+    with ready.get_lock():
+        ready.value += 1
+
+def _handle_many(bodies):
+    import app
+    return app.handle_many(bodies)
+
+# --- HTTP FRONT ---
+class MLServer(ThreadingHTTPServer):
+    # Let in-flight requests finish on shutdown
+    daemon_threads = False
+    # Bursts beyond capacity should get a 429, not a refused connection
+    request_queue_size = 128
+
+    def __init__(self, address, workers=WORKERS, queue_size=QUEUE_SIZE, warmup=WARMUP_MODELS,
+                 batch_window_ms=BATCH_WINDOW_MS, batch_max=BATCH_MAX, job_timeout=JOB_TIMEOUT):
+        super().__init__(address, MLRequestHandler)
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.batch_max = batch_max
+        self.job_timeout = job_timeout
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.lost_jobs = 0
+
+        # spawn: TensorFlow and torch are not fork-safe
+        ctx = mp.get_context("spawn")
+        self.ready_workers = ctx.Value("i", 0)
+        warm = {name.strip() for name in warmup.split(",") if name.strip()}
+        self.pool = ctx.Pool(workers, initializer=_warm_worker, initargs=(self.ready_workers, warm))
+
+        # One job per free worker: requests queue here (not in the pool) while
+        # every worker is busy, and leave together as the next batch
+        self._pending = queue.Queue()
+        self._idle_workers = threading.Semaphore(workers)
+        threading.Thread(target=self._dispatch, daemon=True).start()
+
+    def submit(self, body):
+        future = Future()
+        self._pending.put((body, future))
+        return future
+
+    def _dispatch(self):
+        while True:
+            batch = [self._pending.get()]
+            self._idle_workers.acquire()
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(self._pending.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            futures = [future for _, future in batch]
+            with self._lock:
+                self.batches += 1
+                self.batched_requests += len(batch)
+
+            # Whichever of done, failed or the watchdog comes first settles the job
+            settle = threading.Lock()
+            watchdog = []
+
+            def finish(resolve, futures=futures, settle=settle, watchdog=watchdog):
+                if not settle.acquire(blocking=False):
+                    return
+                watchdog[0].cancel()
+                self._idle_workers.release()
+                resolve()
+                for _ in futures:
+                    self.release()
+
+            def done(responses, futures=futures, finish=finish):
+                def resolve():
+                    for future, response in zip(futures, responses):
+                        future.set_result(response)
+                finish(resolve)
+
+            def failed(error, futures=futures, finish=finish):
+                def resolve():
+                    for future in futures:
+                        future.set_exception(error)
+                finish(resolve)
+
+            def lost(futures=futures, failed=failed):
+                with self._lock:
+                    self.lost_jobs += 1
+                print(f"⚠️ ML job of {len(futures)} requests unanswered after {self.job_timeout:.0f}s; freeing its slots")
+                failed(RuntimeError("inference worker lost"))
+
+            watchdog.append(threading.Timer(self.job_timeout, lost))
+            watchdog[0].daemon = True
+            watchdog[0].start()
+            try:
+                self.pool.apply_async(_handle_many, ([body for body, _ in batch],),
+                                      callback=done, error_callback=failed)
+            except Exception as e:
+                failed(e)
+
+    def is_ready(self):
+        return self.ready_workers.value >= self.workers
+
+    def admit(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self._in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "ready_workers": min(self.ready_workers.value, self.workers),
+            "in_flight": self._in_flight,
+            "capacity": self.capacity,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+            "lost_jobs": self.lost_jobs
+        }
+
+    def close(self):
+        self.server_close()
+        self.pool.close()
+        self.pool.join()
+
+class MLRequestHandler(BaseHTTPRequestHandler):
+    server_version = "TradeSentryML/1.0"
+
+    def _send(self, status, payload, headers=None):
+        body = payload if isinstance(payload, (bytes, str)) else json.dumps(payload)
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", **self.server.stats()})
+        elif self.path == "/ready":
+            ready = self.server.is_ready()
+            self._send(200 if ready else 503, {"ready": ready, **self.server.stats()})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self._send(413, {"error": "request too large"})
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, {"error": "invalid JSON"})
+        if not isinstance(body, dict):
+            return self._send(400, {"error": "request body must be a JSON object"})
+
+        if not self.server.admit():
+            return self._send(429, {"error": "server busy"}, {"Retry-After": "1"})
+        # The slot is released when the job finishes, not when we stop waiting
+        try:
+            result = self.server.submit(body).result(REQUEST_TIMEOUT)
+        except FutureTimeout:
+            return self._send(504, {"error": "inference timed out"})
+        except Exception as e:
+            return self._send(500, {"error": str(e)})
+
+        self._send(result.get("statusCode", 200), result.get("body", "{}"))
+
+    def log_message(self, format, *args):
+        # Keep the access log for errors only
+        if len(args) > 1 and str(args[1]).startswith(("4", "5")):
+            super().log_message(format, *args)
+
+def serve(host=HOST, port=PORT):
+    server = MLServer((host, port))
+    # shutdown() must come from another thread than serve_forever()
+    stop = lambda *_: threading.Thread(target=server.shutdown).start()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"⏳ ML server on {host}:{port}, warming {server.workers} workers...")
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+        print("👋 ML server stopped")
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,76 @@
+"""
+Parity of the NumPy feature pipeline with the original pandas + sklearn one.
+
+    cd ml-service && python -m pytest test_features.py
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+from features import LOOKBACK, FeatureStateCache, RollingFeatures, build_window_batch
+
+ATOL = 1e-9
+
+@pytest.fixture(scope="module")
+def pandas_window():
+    """
+    The training notebook's pipeline: pct_change + SMA-style RSI, NaNs
+    dropped, last LOOKBACK rows min-max scaled to (-1, 1).
+    """
+    def calculate_rsi(series, period=14):
+        delta = series.diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+    def window(prices):
+        df = pd.DataFrame(prices, columns=['Close'])
+        df['Return'] = df['Close'].pct_change()
+        df['RSI'] = calculate_rsi(df['Close'])
+        df.dropna(inplace=True)
+        if len(df) < LOOKBACK:
+            return None
+        return MinMaxScaler(feature_range=(-1, 1)).fit_transform(df[['Return', 'RSI']].tail(LOOKBACK).values)
+    return window
+
+@pytest.fixture(scope="module")
+def series():
+    rng = np.random.default_rng(7)
+    data = {f"T{i}": (100 + np.cumsum(rng.standard_normal(100))).tolist() for i in range(32)}
+    data["FLAT"] = [100.0] * 40 + (100 + np.cumsum(rng.standard_normal(60))).tolist()
+    data["SHORT"] = data["T0"][:50]
+    return data
+
+def test_window_batch_matches_pandas(series, pandas_window):
+    batch = build_window_batch(series)
+    for key, prices in series.items():
+        expected = pandas_window(prices)
+        if expected is None:
+            assert batch[key] is None, key
+        else:
+            np.testing.assert_allclose(batch[key], expected, atol=ATOL, err_msg=key)
+
+def test_rolling_push_matches_pandas(series, pandas_window):
+    closes = series["T1"]
+    state = RollingFeatures.from_closes(closes[:80])
+    for close in closes[80:]:
+        state.push(close)
+    np.testing.assert_allclose(state.window(), pandas_window(closes), atol=ATOL)
+
+def test_rolling_amend_matches_pandas(series, pandas_window):
+    closes = series["T1"]
+    state = RollingFeatures.from_closes(closes)
+    state.amend(closes[-1] * 1.01)
+    revised = closes[:-1] + [closes[-1] * 1.01]
+    np.testing.assert_allclose(state.window(), pandas_window(revised), atol=ATOL)
+
+def test_state_cache_syncs_new_and_revised_bars(series, pandas_window):
+    closes = series["T2"]
+    cache = FeatureStateCache()
+    cache.window_for("T2", closes[:98])
+    np.testing.assert_allclose(cache.window_for("T2", closes), pandas_window(closes), atol=ATOL)
+
+    revised = closes[:-1] + [closes[-1] - 0.5]
+    np.testing.assert_allclose(cache.window_for("T2", revised), pandas_window(revised), atol=ATOL)
+    assert cache._states["T2"].sync(revised + [revised[-1] + 1.0])